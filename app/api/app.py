@@ -1,19 +1,50 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import ORJSONResponse
 import logging
+import logging.handlers
+import queue
+
+import httpx
+import orjson
 
 from app.api.routes import router
+from app.services.cache_service import result_cache
+from app.services.pipeline_service import invoice_pipeline, set_http_client
 from app.core.config import config
 
-# Configure logging
+class JSONFormatter(logging.Formatter):
+    """Format log records as single-line JSON objects"""
+    
+    def format(self, record):
+        entry = {
+            "time": self.formatTime(record),
+            "logger": record.name,
+            "level": record.levelname,
+            "message": record.getMessage(),
+        }
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        return orjson.dumps(entry).decode()
+
+# Configure logging: request handlers only enqueue records, and a listener
+# thread does the console and file writes off the event loop
+log_formatter = JSONFormatter()
+stream_handler = logging.StreamHandler()
+stream_handler.setFormatter(log_formatter)
+file_handler = logging.FileHandler("app.log")
+file_handler.setFormatter(log_formatter)
+
+log_queue = queue.Queue(-1)
+log_listener = logging.handlers.QueueListener(log_queue, stream_handler, file_handler, respect_handler_level=True)
+
 logging.basicConfig(
     level=getattr(logging, config.LOG_LEVEL),
-    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
-    handlers=[
-        logging.StreamHandler(),
-        logging.FileHandler("app.log")
-    ]
+    handlers=[logging.handlers.QueueHandler(log_queue)],
+    force=True  # services imported above may already have configured logging
 )
+log_listener.start()
 logger = logging.getLogger(__name__)
 
 # Initialize FastAPI app
@@ -22,9 +53,13 @@ app = FastAPI(
     description="Process invoice images/PDFs and create Shiprocket orders using open source OCR + LLM",
     version="1.0.0",
     docs_url="/docs",
-    redoc_url="/redoc"
+    redoc_url="/redoc",
+    default_response_class=ORJSONResponse
 )
 
+# Compress large responses such as OCR text
+app.add_middleware(GZipMiddleware, minimum_size=1024, compresslevel=5)
+
 # Enable CORS
 app.add_middleware(
     CORSMiddleware,
@@ -41,13 +76,27 @@ app.include_router(router)
 @app.on_event("startup")
 async def startup_event():
     logger.info("Starting Invoice to Order Processing System")
-    logger.info(f"Configuration: {config.as_dict()}")
+    logger.info(f"Configuration: {config.as_dict_cached}")
     
     # Ensure required directories exist
-    config.UPLOAD_DIR.mkdir(exist_ok=True)
-    config.PROCESSED_DIR.mkdir(exist_ok=True)
+    config.ensure_dirs()
+    
+    # One pooled keep-alive client shared by every LLM request
+    app.state.http = httpx.AsyncClient(
+        timeout=httpx.Timeout(config.OLLAMA_TIMEOUT, connect=5.0),
+        limits=httpx.Limits(max_connections=100, max_keepalive_connections=50)
+    )
+    set_http_client(app.state.http)
+    
+    if config.STAGED_PIPELINE:
+        await invoice_pipeline.start()
 
 # Shutdown event
 @app.on_event("shutdown")
 async def shutdown_event():
-    logger.info("Shutting down Invoice to Order Processing System") 
\ No newline at end of file
+    logger.info("Shutting down Invoice to Order Processing System")
+    await invoice_pipeline.stop()
+    set_http_client(None)
+    await app.state.http.aclose()
+    await result_cache.close()
+    log_listener.stop() 
\ No newline at end of file
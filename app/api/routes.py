@@ -1,16 +1,27 @@
-from fastapi import APIRouter, UploadFile, File, HTTPException, Form, BackgroundTasks, Depends
-from fastapi.responses import JSONResponse, HTMLResponse
-import shutil
+from fastapi import APIRouter, UploadFile, File, HTTPException, Form, BackgroundTasks, Depends, Request
+from fastapi.responses import ORJSONResponse, Response
+import aiofiles.os
+import asyncio
+import hashlib
+import time
+from contextlib import AsyncExitStack, suppress
 import os
 from pathlib import Path
 import uuid
 import logging
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Tuple
 
-from app.services.ocr_service import MultiOCRService
-from app.services.llm_service import LLMInvoiceProcessor
-from app.services.validation_service import InvoiceValidator
-from app.services.shiprocket_service import ShiprocketAPI
+from app.services.pipeline_service import (
+    get_ocr_service,
+    get_llm_processor,
+    process_invoice_bytes,
+    process_invoice_job,
+    issue_shiprocket_auth,
+    InvoiceProcessingError,
+    OCR_ERROR_PREFIX,
+)
+from app.services.cache_service import result_cache
+from app.utils.file_io import open_for_write
 from app.core.config import config
 
 # Configure logging
@@ -19,22 +30,81 @@ logger = logging.getLogger(__name__)
 # Create router
 router = APIRouter()
 
-# Initialize services
-ocr_service = MultiOCRService()
-llm_processor = LLMInvoiceProcessor(model=config.OLLAMA_MODEL, ollama_url=config.OLLAMA_HOST)
-validator = InvoiceValidator()
+# File extensions accepted by the OCR pipeline
+_ALLOWED_EXT = frozenset({".jpg", ".jpeg", ".png", ".pdf", ".tiff", ".tif", ".bmp"})
 
-# In-memory cache for processing results
-processing_cache = {}
+# Uploads are read and streamed to disk in chunks of this size
+UPLOAD_CHUNK_SIZE = 1 << 20  # 1 MiB
 
-def get_shiprocket_api(email: str, password: str) -> ShiprocketAPI:
-    """Get a configured ShiprocketAPI instance"""
-    return ShiprocketAPI(email=email, password=password)
+# Seconds an Ollama health probe result is reused, so frequent probes from
+# load balancers do not each hit the LLM server
+HEALTH_PROBE_TTL = 10.0
+_last_llm_probe: Tuple[float, bool] = (float("-inf"), False)
 
-@router.get("/", response_class=HTMLResponse)
-async def root():
-    """Root endpoint that displays a simple UI"""
-    return """
+# Allowance for multipart boundaries and form fields on top of the file itself
+_MULTIPART_OVERHEAD = 64 * 1024
+
+def _upload_too_large() -> HTTPException:
+    return HTTPException(
+        status_code=413,
+        detail=f"File exceeds the {config.MAX_UPLOAD_BYTES} byte upload limit"
+    )
+
+def check_upload_size(request: Request, file: UploadFile) -> None:
+    """Reject oversized uploads up front using Content-Length and the parsed file size"""
+    content_length = request.headers.get("content-length", "")
+    if content_length.isdigit() and int(content_length) > config.MAX_UPLOAD_BYTES + _MULTIPART_OVERHEAD:
+        raise _upload_too_large()
+    if file.size is not None and file.size > config.MAX_UPLOAD_BYTES:
+        raise _upload_too_large()
+
+async def save_upload_file(file: UploadFile, file_path: Path) -> str:
+    """
+    Stream an uploaded file to disk without blocking the event loop
+    
+    Returns:
+        Hex digest of the file contents, used to deduplicate OCR/LLM work
+    """
+    hasher = hashlib.blake2b(digest_size=32)
+    written = 0
+    try:
+        async with open_for_write(file_path) as buffer:
+            while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+                written += len(chunk)
+                if written > config.MAX_UPLOAD_BYTES:
+                    raise _upload_too_large()
+                hasher.update(chunk)
+                await buffer.write(chunk)
+    except HTTPException:
+        await remove_upload_file(file_path)
+        raise
+    return hasher.hexdigest()
+
+async def remove_upload_file(file_path: Path) -> None:
+    """Delete a spooled upload, ignoring files that are already gone"""
+    with suppress(FileNotFoundError):
+        await aiofiles.os.remove(file_path)
+
+async def read_upload_file(file: UploadFile) -> Tuple[bytes, str]:
+    """
+    Read an uploaded file into memory
+    
+    Returns:
+        File contents and their hex digest
+    """
+    hasher = hashlib.blake2b(digest_size=32)
+    chunks = []
+    read = 0
+    while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+        read += len(chunk)
+        if read > config.MAX_UPLOAD_BYTES:
+            raise _upload_too_large()
+        hasher.update(chunk)
+        chunks.append(chunk)
+    return b"".join(chunks), hasher.hexdigest()
+
+# Root page markup, encoded once at import time
+_ROOT_HTML = """
     <!DOCTYPE html>
     <html>
     <head>
@@ -69,10 +139,20 @@ async def root():
         </div>
     </body>
     </html>
-    """
+""".encode("utf-8")
+
+@router.get("/")
+async def root():
+    """Root endpoint that displays a simple UI"""
+    return Response(
+        content=_ROOT_HTML,
+        media_type="text/html",
+        headers={"Cache-Control": "public, max-age=3600"}
+    )
 
 @router.post("/process-invoice/")
 async def process_invoice(
+    request: Request,
     file: UploadFile = File(...),
     shiprocket_email: Optional[str] = Form(None),
     shiprocket_password: Optional[str] = Form(None),
@@ -89,92 +169,72 @@ async def process_invoice(
     5. Optionally creates a Shiprocket order
     """
     try:
-        # Validate file type
-        if not file.content_type.startswith(('image/', 'application/pdf')):
+        # Validate file type before reading any of the body
+        file_extension = os.path.splitext(file.filename or "")[1].lower()
+        if file_extension not in _ALLOWED_EXT:
             raise HTTPException(
                 status_code=400, 
                 detail="Only image and PDF files are supported"
             )
+        check_upload_size(request, file)
         
-        # Save uploaded file
         file_id = str(uuid.uuid4())
-        file_extension = os.path.splitext(file.filename)[1].lower()
-        file_path = config.UPLOAD_DIR / f"{file_id}{file_extension}"
-        
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
         
-        logger.info(f"File uploaded: {file_path}")
+        # Hand the heavy OCR/LLM work to a background worker when enabled;
+        # the worker runs in another process, so the upload goes to disk
+        if config.QUEUE_PROCESSING and process_invoice_job is not None:
+            # Log in here so only an opaque reference, not the password, is queued
+            shiprocket_auth = None
+            if shiprocket_email and shiprocket_password:
+                try:
+                    shiprocket_auth = await asyncio.to_thread(
+                        issue_shiprocket_auth, shiprocket_email, shiprocket_password
+                    )
+                except InvoiceProcessingError as e:
+                    raise HTTPException(status_code=e.status_code, detail=e.detail)
+            
+            async with AsyncExitStack() as cleanup:
+                file_path = config.UPLOAD_DIR / f"{file_id}{file_extension}"
+                cleanup.push_async_callback(remove_upload_file, file_path)
+                
+                content_hash = await save_upload_file(file, file_path)
+                logger.info(f"File uploaded: {file_path}")
+                
+                await result_cache.set(file_id, {"status": "queued", "file_id": file_id, "filename": file.filename})
+                # send() is a blocking Redis round-trip
+                await asyncio.to_thread(
+                    process_invoice_job.send,
+                    str(file_path), file_id, file.filename, shiprocket_auth, content_hash
+                )
+                
+                # The worker owns the upload from here on
+                cleanup.pop_all()
+            
+            return ORJSONResponse(
+                status_code=202,
+                content={"status": "queued", "file_id": file_id, "results_url": f"/results/{file_id}"}
+            )
         
-        # Step 1: OCR Processing
-        logger.info("Starting OCR processing...")
+        # Process inline from memory; the file is only written once processing succeeds
+        data, content_hash = await read_upload_file(file)
+        logger.info(f"File uploaded: {file.filename} ({len(data)} bytes)")
         
         try:
-            # Select processing method based on file type
-            if file_extension == '.pdf':
-                ocr_text = ocr_service.extract_text_from_pdf(str(file_path))
-            else:
-                ocr_text = ocr_service.extract_text_multi_ocr(str(file_path))
-                
-            logger.info(f"OCR text extracted, length: {len(ocr_text)}")
-        except Exception as e:
-            logger.error(f"OCR processing failed: {e}")
-            raise HTTPException(status_code=500, detail=f"OCR processing failed: {str(e)}")
-        
-        if not ocr_text.strip():
-            raise HTTPException(
-                status_code=400, 
-                detail="No text could be extracted from the image"
+            result = await process_invoice_bytes(
+                data, file_extension, file_id, file.filename,
+                shiprocket_email, shiprocket_password, content_hash
             )
+        except InvoiceProcessingError as e:
+            raise HTTPException(status_code=e.status_code, detail=e.detail)
         
-        # Step 2: LLM Field Extraction
-        logger.info("Extracting fields using LLM...")
+        # Cache the results; the response does not depend on the cache
         try:
-            extracted_data = llm_processor.extract_invoice_fields(ocr_text)
-            extracted_data = llm_processor.refine_extraction(extracted_data, ocr_text)
-            logger.info(f"Fields extracted: {len(extracted_data)}")
+            await result_cache.set(file_id, result)
         except Exception as e:
-            logger.error(f"Field extraction failed: {e}")
-            raise HTTPException(status_code=500, detail=f"Field extraction failed: {str(e)}")
-        
-        # Step 3: Data Validation
-        logger.info("Validating extracted data...")
-        errors, warnings = validator.validate_invoice_data(extracted_data)
+            logger.warning(f"Result cache update failed: {e}")
         
-        # Save processed file to processed directory
-        processed_path = config.PROCESSED_DIR / f"{file_id}{file_extension}"
-        shutil.copy(file_path, processed_path)
-        
-        # Step 4: Create Shiprocket Order (if credentials provided)
-        order_response = None
-        if shiprocket_email and shiprocket_password:
-            logger.info("Creating Shiprocket order...")
-            try:
-                shiprocket_api = get_shiprocket_api(shiprocket_email, shiprocket_password)
-                order_response = shiprocket_api.create_order_from_invoice(extracted_data)
-                logger.info(f"Shiprocket order created: {order_response}")
-            except Exception as e:
-                logger.error(f"Shiprocket order creation failed: {e}")
-                warnings.append(f"Order creation failed: {str(e)}")
-        
-        # Cache the results
-        result = {
-            "status": "error" if errors else "success",
-            "file_id": file_id,
-            "filename": file.filename,
-            "extracted_data": extracted_data,
-            "validation_errors": errors,
-            "validation_warnings": warnings,
-            "shiprocket_order": order_response,
-            "ocr_text": ocr_text
-        }
-        processing_cache[file_id] = result
-        
-        # Clean up uploaded file
-        os.remove(file_path)
-        
-        if errors:
-            return JSONResponse(
+        if result["validation_errors"]:
+            return ORJSONResponse(
                 status_code=400,
                 content=result
             )
@@ -185,15 +245,11 @@ async def process_invoice(
         raise e
     except Exception as e:
         logger.error(f"Processing failed: {e}")
-        
-        # Cleanup file if exists
-        if 'file_path' in locals() and os.path.exists(file_path):
-            os.remove(file_path)
-        
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.post("/extract-text/")
 async def extract_text_only(
+    request: Request,
     file: UploadFile = File(...)
 ):
     """
@@ -205,37 +261,45 @@ async def extract_text_only(
     3. Returns the extracted text without further processing
     """
     try:
-        # Validate file type
-        if not file.content_type.startswith(('image/', 'application/pdf')):
+        # Validate file type before reading any of the body
+        file_extension = os.path.splitext(file.filename or "")[1].lower()
+        if file_extension not in _ALLOWED_EXT:
             raise HTTPException(
                 status_code=400, 
                 detail="Only image and PDF files are supported"
             )
+        check_upload_size(request, file)
         
-        # Save uploaded file
-        file_id = str(uuid.uuid4())
-        file_extension = os.path.splitext(file.filename)[1].lower()
-        file_path = config.UPLOAD_DIR / f"{file_id}{file_extension}"
-        
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
-        
-        logger.info(f"File uploaded for OCR: {file_path}")
+        # Read uploaded file into memory
+        data, content_hash = await read_upload_file(file)
         
-        # OCR Processing
-        try:
-            if file_extension == '.pdf':
-                ocr_text = ocr_service.extract_text_from_pdf(str(file_path))
-            else:
-                ocr_text = ocr_service.extract_text_multi_ocr(str(file_path))
-                
-            logger.info(f"OCR text extracted, length: {len(ocr_text)}")
-        except Exception as e:
-            logger.error(f"OCR processing failed: {e}")
-            raise HTTPException(status_code=500, detail=f"OCR processing failed: {str(e)}")
+        logger.info(f"File uploaded for OCR: {file.filename} ({len(data)} bytes)")
         
-        # Cleanup uploaded file
-        os.remove(file_path)
+        # Identical uploads reuse the OCR text from the content cache
+        cached = None
+        if config.ENABLE_CACHING:
+            try:
+                cached = await result_cache.get_content(content_hash)
+            except Exception as e:
+                logger.warning(f"Content cache lookup failed: {e}")
+        if cached and cached.get("ocr_text") is not None:
+            ocr_text = cached["ocr_text"]
+            logger.info("Reusing cached OCR text for identical upload")
+        else:
+            # OCR Processing
+            try:
+                ocr_text = await get_ocr_service().aextract_text_from_bytes(data, file_extension, use_cache=False)
+                logger.info(f"OCR text extracted, length: {len(ocr_text)}")
+            except Exception as e:
+                logger.error(f"OCR processing failed: {e}")
+                raise HTTPException(status_code=500, detail=f"OCR processing failed: {str(e)}")
+            
+            # Failed extractions are returned but never cached
+            if config.ENABLE_CACHING and not ocr_text.startswith(OCR_ERROR_PREFIX):
+                try:
+                    await result_cache.set_content(content_hash, {"ocr_text": ocr_text})
+                except Exception as e:
+                    logger.warning(f"Content cache update failed: {e}")
         
         return {
             "status": "success",
@@ -247,42 +311,58 @@ async def extract_text_only(
         raise e
     except Exception as e:
         logger.error(f"OCR processing failed: {e}")
-        
-        # Cleanup file if exists
-        if 'file_path' in locals() and os.path.exists(file_path):
-            os.remove(file_path)
-        
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/results/{file_id}")
 async def get_processing_results(file_id: str):
     """Get the results of a previously processed file"""
-    if file_id not in processing_cache:
+    try:
+        result = await result_cache.get(file_id)
+    except Exception as e:
+        logger.error(f"Result cache lookup failed: {e}")
+        raise HTTPException(status_code=503, detail="Result store is temporarily unavailable")
+    if result is None:
         raise HTTPException(status_code=404, detail=f"Results for file ID {file_id} not found")
     
-    return processing_cache[file_id]
+    return result
+
+async def probe_llm(request: Request) -> bool:
+    """Check that Ollama is reachable, reusing the last result for HEALTH_PROBE_TTL seconds"""
+    global _last_llm_probe
+    checked_at, reachable = _last_llm_probe
+    now = time.monotonic()
+    if now - checked_at < HEALTH_PROBE_TTL:
+        return reachable
+    
+    try:
+        client = getattr(request.app.state, "http", None)
+        if client is not None:
+            reachable = await get_llm_processor().atest_connection(client)
+        else:
+            reachable = await asyncio.to_thread(get_llm_processor().test_connection)
+    except Exception:
+        reachable = False
+    
+    _last_llm_probe = (now, reachable)
+    return reachable
 
 @router.get("/health")
-async def health_check():
+async def health_check(request: Request):
     """Health check endpoint"""
-    # Check if OCR service is working
-    ocr_status = "up"
-    try:
-        # Test OCR with a minimal initialization
-        ocr_service.logger.info("Health check")
-    except:
-        ocr_status = "down"
+    # Check if OCR service is working; it is only loaded by the first OCR request
+    ocr_status = "idle"
+    if get_ocr_service.cache_info().currsize:
+        ocr_status = "up"
+        try:
+            get_ocr_service().logger.info("Health check")
+        except:
+            ocr_status = "down"
     
     # Check if LLM service is working
-    llm_status = "up"
-    try:
-        # Test LLM connection
-        llm_processor.test_connection()
-    except:
-        llm_status = "down"
+    llm_status = "up" if await probe_llm(request) else "down"
     
     return {
-        "status": "healthy" if ocr_status == "up" and llm_status == "up" else "degraded",
+        "status": "healthy" if ocr_status in ("up", "idle") and llm_status == "up" else "degraded",
         "version": "1.0.0",
         "services": {
             "ocr": ocr_status,
@@ -2,39 +2,100 @@
 Configuration module for the Invoice to Order Processing System.
 """
 import os
+from dataclasses import dataclass, field
 from pathlib import Path
-from typing import List, Dict, Any
+from typing import Callable, Dict, Any, Tuple
 
+def _env_str(name: str, default: str) -> Callable[[], str]:
+    """Default factory reading a string setting from the environment."""
+    return lambda: os.getenv(name, default)
+
+def _env_int(name: str, default: int) -> Callable[[], int]:
+    """Default factory reading an integer setting from the environment."""
+    return lambda: int(os.getenv(name, str(default)))
+
+def _env_float(name: str, default: float) -> Callable[[], float]:
+    """Default factory reading a float setting from the environment."""
+    return lambda: float(os.getenv(name, str(default)))
+
+def _env_bool(name: str, default: bool) -> Callable[[], bool]:
+    """Default factory reading a boolean setting from the environment."""
+    return lambda: os.getenv(name, str(default)).lower() in ("true", "1", "t")
+
+def _env_tuple(name: str, default: str) -> Callable[[], Tuple[str, ...]]:
+    """Default factory reading a comma-separated setting from the environment."""
+    return lambda: tuple(item.strip() for item in os.getenv(name, default).split(",") if item.strip())
+
+@dataclass(frozen=True, slots=True)
 class Config:
     """
     Configuration class for the Invoice to Order Processing System.
     
     Loads configuration from environment variables with fallbacks to defaults.
+    Settings are read once when the instance is created and cannot be changed
+    afterwards.
     """
     # Base paths
-    BASE_DIR = Path(__file__).parent.parent.parent
-    UPLOAD_DIR = BASE_DIR / "app" / "uploads"
-    PROCESSED_DIR = BASE_DIR / "app" / "processed"
+    BASE_DIR: Path = Path(__file__).parent.parent.parent
+    UPLOAD_DIR: Path = BASE_DIR / "app" / "uploads"
+    PROCESSED_DIR: Path = BASE_DIR / "app" / "processed"
     
     # Core settings
-    DEBUG = os.getenv("DEBUG", "True").lower() in ("true", "1", "t")
-    LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
-    HOST = os.getenv("HOST", "0.0.0.0")
-    PORT = int(os.getenv("PORT", "8000"))
+    DEBUG: bool = field(default_factory=_env_bool("DEBUG", True))
+    LOG_LEVEL: str = field(default_factory=_env_str("LOG_LEVEL", "INFO"))
+    HOST: str = field(default_factory=_env_str("HOST", "0.0.0.0"))
+    PORT: int = field(default_factory=_env_int("PORT", 8000))
+    WORKERS: int = field(default_factory=_env_int("WORKERS", 0))  # 0 = one per CPU core
     
     # OCR settings
-    OCR_PREPROCESSOR = os.getenv("OCR_PREPROCESSOR", "standard")
-    OCR_ENGINES = os.getenv("OCR_ENGINES", "paddle,easy,tesseract").split(",")
-    OCR_CONFIDENCE_THRESHOLD = float(os.getenv("OCR_CONFIDENCE_THRESHOLD", "0.5"))
-    OCR_USE_GPU = os.getenv("OCR_USE_GPU", "False").lower() in ("true", "1", "t")
+    OCR_PREPROCESSOR: str = field(default_factory=_env_str("OCR_PREPROCESSOR", "standard"))
+    OCR_THRESHOLD_METHOD: str = field(default_factory=lambda: os.getenv("OCR_THRESHOLD_METHOD", "otsu").lower())
+    OCR_ENGINES: Tuple[str, ...] = field(
+        default_factory=lambda: tuple(engine.lower() for engine in _env_tuple("OCR_ENGINES", "paddle,easy,tesseract")())
+    )
+    OCR_CONFIDENCE_THRESHOLD: float = field(default_factory=_env_float("OCR_CONFIDENCE_THRESHOLD", 0.5))
+    OCR_USE_GPU: bool = field(default_factory=_env_bool("OCR_USE_GPU", False))
+    OCR_USE_TENSORRT: bool = field(default_factory=_env_bool("OCR_USE_TENSORRT", False))
+    MAX_WORKERS: int = field(default_factory=_env_int("MAX_WORKERS", 4))
+    OCR_PARALLEL_ENGINES: bool = field(default_factory=_env_bool("OCR_PARALLEL_ENGINES", True))
+    OCR_BATCH_SIZE: int = field(default_factory=_env_int("OCR_BATCH_SIZE", 8))
+    OCR_BATCH_TIMEOUT: float = field(default_factory=_env_float("OCR_BATCH_TIMEOUT", 0.15))
     
     # LLM settings
-    OLLAMA_HOST = os.getenv("OLLAMA_HOST", "http://localhost:11434")
-    OLLAMA_MODEL = os.getenv("OLLAMA_MODEL", "llama3")
+    OLLAMA_HOST: str = field(default_factory=_env_str("OLLAMA_HOST", "http://localhost:11434"))
+    OLLAMA_MODEL: str = field(default_factory=_env_str("OLLAMA_MODEL", "llama3"))
+    OLLAMA_KEEP_ALIVE: str = field(default_factory=_env_str("OLLAMA_KEEP_ALIVE", "30m"))
+    OLLAMA_TIMEOUT: float = field(default_factory=_env_float("OLLAMA_TIMEOUT", 120))
+    
+    # Background processing settings
+    REDIS_URL: str = field(default_factory=_env_str("REDIS_URL", "redis://localhost:6379/0"))
+    QUEUE_PROCESSING: bool = field(default_factory=_env_bool("QUEUE_PROCESSING", False))
+    STAGED_PIPELINE: bool = field(default_factory=_env_bool("STAGED_PIPELINE", False))
+    PIPELINE_OCR_WORKERS: int = field(default_factory=_env_int("PIPELINE_OCR_WORKERS", 2))
+    PIPELINE_ORDER_WORKERS: int = field(default_factory=_env_int("PIPELINE_ORDER_WORKERS", 4))
+    LLM_BATCH_SIZE: int = field(default_factory=_env_int("LLM_BATCH_SIZE", 4))
+    LLM_BATCH_TIMEOUT: float = field(default_factory=_env_float("LLM_BATCH_TIMEOUT", 0.05))
+    RESULT_TTL_SECONDS: int = field(default_factory=_env_int("RESULT_TTL_SECONDS", 3600))
+    CONTENT_CACHE_TTL_SECONDS: int = field(default_factory=_env_int("CONTENT_CACHE_TTL_SECONDS", 7 * 24 * 3600))
+    ENABLE_CACHING: bool = field(default_factory=_env_bool("ENABLE_CACHING", True))
     
     # API settings
-    CORS_ORIGINS = os.getenv("CORS_ORIGINS", "*").split(",")
-    API_KEY = os.getenv("API_KEY", "")
+    CORS_ORIGINS: Tuple[str, ...] = field(default_factory=_env_tuple("CORS_ORIGINS", "*"))
+    API_KEY: str = field(default_factory=_env_str("API_KEY", ""))
+    MAX_UPLOAD_BYTES: int = field(default_factory=_env_int("MAX_FILE_SIZE", 10 * 1024 * 1024))
+    
+    # Configuration dictionary built once, see __post_init__
+    as_dict_cached: Dict[str, Any] = field(init=False, repr=False, compare=False)
+    
+    def __post_init__(self):
+        # Settings never change after construction, so repeated callers can
+        # share one dictionary instead of rebuilding it. Treat it as read-only.
+        object.__setattr__(self, "as_dict_cached", self.as_dict())
+    
+    def ensure_dirs(self) -> None:
+        """Create the upload and processed directories if they are missing."""
+        self.UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
+        self.PROCESSED_DIR.mkdir(parents=True, exist_ok=True)
     
     def as_dict(self) -> Dict[str, Any]:
         """
@@ -48,13 +109,25 @@ class Config:
             "log_level": self.LOG_LEVEL,
             "host": self.HOST,
             "port": self.PORT,
+            "workers": self.WORKERS,
             "ocr_preprocessor": self.OCR_PREPROCESSOR,
+            "ocr_threshold_method": self.OCR_THRESHOLD_METHOD,
             "ocr_engines": self.OCR_ENGINES,
             "ocr_confidence_threshold": self.OCR_CONFIDENCE_THRESHOLD,
             "ocr_use_gpu": self.OCR_USE_GPU,
+            "ocr_use_tensorrt": self.OCR_USE_TENSORRT,
+            "ocr_parallel_engines": self.OCR_PARALLEL_ENGINES,
+            "ocr_batch_size": self.OCR_BATCH_SIZE,
+            "max_workers": self.MAX_WORKERS,
             "ollama_host": self.OLLAMA_HOST,
             "ollama_model": self.OLLAMA_MODEL,
+            "ollama_keep_alive": self.OLLAMA_KEEP_ALIVE,
+            "queue_processing": self.QUEUE_PROCESSING,
+            "staged_pipeline": self.STAGED_PIPELINE,
+            "llm_batch_size": self.LLM_BATCH_SIZE,
+            "enable_caching": self.ENABLE_CACHING,
             "cors_origins": self.CORS_ORIGINS,
+            "max_upload_bytes": self.MAX_UPLOAD_BYTES,
             "api_key": bool(self.API_KEY),  # Just show if it's set, not the actual value
         }
 
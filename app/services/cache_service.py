@@ -0,0 +1,141 @@
+"""
+Result cache for the Invoice to Order Processing System.
+Stores processing results in Redis with a TTL so every API worker and
+background job sees the same results without growing process memory.
+OCR text and extracted fields are also cached by upload content hash so
+re-uploaded invoices skip OCR and LLM work.
+"""
+import logging
+from typing import Optional, Dict, Any, Tuple
+
+import orjson
+import redis
+import redis.asyncio as aioredis
+
+from app.core.config import config
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+
+class ResultCache:
+    """Redis-backed store for invoice processing results"""
+
+    def __init__(
+        self,
+        redis_url: str = config.REDIS_URL,
+        ttl: int = config.RESULT_TTL_SECONDS,
+        content_ttl: int = config.CONTENT_CACHE_TTL_SECONDS
+    ):
+        """
+        Initialize the result cache.
+
+        Args:
+            redis_url: Redis connection URL
+            ttl: Seconds a result is kept before it expires
+            content_ttl: Seconds OCR/extraction output is kept per content hash
+        """
+        self.redis_url = redis_url
+        self.ttl = ttl
+        self.content_ttl = content_ttl
+        self._client = None
+        self._sync_client = None
+
+    @staticmethod
+    def _key(file_id: str) -> str:
+        return f"result:{file_id}"
+
+    @staticmethod
+    def _content_key(digest: str) -> str:
+        # The OCR text depends on the engines, so changing OCR_ENGINES starts afresh
+        return f"ocr:{','.join(config.OCR_ENGINES)}:{digest}"
+
+    @staticmethod
+    def _auth_key(ref: str) -> str:
+        return f"shiprocket_auth:{ref}"
+
+    @staticmethod
+    def _ocr_text_key(engines: Tuple[str, ...], digest: str) -> str:
+        return f"ocr_text:{','.join(engines)}:{digest}"
+
+    @property
+    def client(self) -> aioredis.Redis:
+        """Async Redis client, created on first use"""
+        if self._client is None:
+            self._client = aioredis.from_url(self.redis_url)
+        return self._client
+
+    @property
+    def sync_client(self) -> redis.Redis:
+        """Blocking Redis client for background workers, created on first use"""
+        if self._sync_client is None:
+            self._sync_client = redis.Redis.from_url(self.redis_url)
+        return self._sync_client
+
+    async def set(self, file_id: str, result: Dict[str, Any]) -> None:
+        """Store a processing result"""
+        await self.client.set(self._key(file_id), orjson.dumps(result, default=str), ex=self.ttl)
+
+    async def get(self, file_id: str) -> Optional[Dict[str, Any]]:
+        """Get a processing result, or None if it is unknown or expired"""
+        data = await self.client.get(self._key(file_id))
+        return orjson.loads(data) if data else None
+
+    def set_sync(self, file_id: str, result: Dict[str, Any]) -> None:
+        """Store a processing result from synchronous code"""
+        self.sync_client.set(self._key(file_id), orjson.dumps(result, default=str), ex=self.ttl)
+
+    def get_sync(self, file_id: str) -> Optional[Dict[str, Any]]:
+        """Get a processing result from synchronous code"""
+        data = self.sync_client.get(self._key(file_id))
+        return orjson.loads(data) if data else None
+
+    async def get_content(self, digest: str) -> Optional[Dict[str, Any]]:
+        """Get cached OCR/extraction output for an upload content hash"""
+        data = await self.client.get(self._content_key(digest))
+        return orjson.loads(data) if data else None
+
+    async def set_content(self, digest: str, content: Dict[str, Any]) -> None:
+        """Cache OCR/extraction output for an upload content hash"""
+        await self.client.set(self._content_key(digest), orjson.dumps(content, default=str), ex=self.content_ttl)
+
+    def get_content_sync(self, digest: str) -> Optional[Dict[str, Any]]:
+        """Get cached OCR/extraction output from synchronous code"""
+        data = self.sync_client.get(self._content_key(digest))
+        return orjson.loads(data) if data else None
+
+    def set_content_sync(self, digest: str, content: Dict[str, Any]) -> None:
+        """Cache OCR/extraction output from synchronous code"""
+        self.sync_client.set(self._content_key(digest), orjson.dumps(content, default=str), ex=self.content_ttl)
+
+    def set_auth_sync(self, ref: str, auth: Dict[str, Any]) -> None:
+        """Store a Shiprocket login for a background job under an opaque reference"""
+        self.sync_client.set(self._auth_key(ref), orjson.dumps(auth), ex=self.ttl)
+
+    def pop_auth_sync(self, ref: str) -> Optional[Dict[str, Any]]:
+        """Get and remove a stored Shiprocket login, or None if it is unknown or expired"""
+        with self.sync_client.pipeline() as pipe:
+            data, _ = pipe.get(self._auth_key(ref)).delete(self._auth_key(ref)).execute()
+        return orjson.loads(data) if data else None
+
+    def get_ocr_text_sync(self, engines: Tuple[str, ...], digest: str) -> Optional[str]:
+        """Get OCR text produced by the given engines for a file content hash"""
+        data = self.sync_client.get(self._ocr_text_key(engines, digest))
+        return data.decode("utf-8") if data is not None else None
+
+    def set_ocr_text_sync(self, engines: Tuple[str, ...], digest: str, text: str) -> None:
+        """Cache OCR text produced by the given engines for a file content hash"""
+        self.sync_client.set(self._ocr_text_key(engines, digest), text.encode("utf-8"), ex=self.content_ttl)
+
+    async def close(self) -> None:
+        """Close open Redis connections"""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+        if self._sync_client is not None:
+            self._sync_client.close()
+            self._sync_client = None
+
+
+# Shared cache instance
+result_cache = ResultCache()
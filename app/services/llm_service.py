@@ -1,11 +1,155 @@
 import requests
+import httpx
+import asyncio
 import json
 import logging
-from typing import Dict, Any, Optional
+import math
+from typing import Dict, Any, Optional, List
 import re
-from pydantic import BaseModel
+from dataclasses import dataclass, field
 
-class InvoiceFields(BaseModel):
+try:
+    import hyperscan
+except ImportError:  # optional; the fallback patterns are then searched one by one
+    hyperscan = None
+
+# Patterns used for regex fallback extraction, compiled once at import time
+_INV_RE = re.compile(r'(?:invoice|inv|bill)(?:\s+no[.:])?\s*[#:]?\s*([A-Z0-9-/]+)', re.IGNORECASE)
+_DATE_RE = re.compile(
+    r'(?:date|dt)[.:]\s*(\d{1,2}[-/]\d{1,2}[-/]\d{2,4}|\d{2,4}[-/]\d{1,2}[-/]\d{1,2})', re.IGNORECASE
+)
+_GSTIN_RE = re.compile(r'(?:GSTIN|GST IN|GST Number)[.:]\s*([0-9A-Z]{15})', re.IGNORECASE)
+_TOTAL_RE = re.compile(
+    r'(?:total|amount|grand total)[.:]\s*(?:Rs\.?|₹|INR)?\s*(\d+(?:,\d+)*(?:\.\d+)?)', re.IGNORECASE
+)
+_PHONE_RE = re.compile(
+    r'(?:phone|mobile|contact|tel)[.:]\s*(\+?\d{1,3}[-.\s]?)?\(?(\d{3})\)?[-.\s]?(\d{3})[-.\s]?(\d{4})',
+    re.IGNORECASE
+)
+_NAME_RE = re.compile(r'(?:bill to|customer|client|buyer)[.:]\s*([A-Za-z\s]+)', re.IGNORECASE)
+_PAYMENT_RE = re.compile(
+    r'(?P<prepaid>paid|prepaid|credit card|debit card|upi|online)|(?P<cod>cod|cash on delivery|collect)',
+    re.IGNORECASE
+)
+_CURRENCY_STRIP_RE = re.compile(r'[₹$,]')
+
+# Shipping fields filled from their billing counterpart when missing
+_SHIP_BILL_FIELDS = tuple(
+    (f'shipping_{name}', f'billing_{name}')
+    for name in ('address', 'customer_name', 'city', 'state', 'pincode', 'phone', 'email')
+)
+
+# Fallback field patterns, in the order their matches are returned
+_FALLBACK_PATTERNS = (_INV_RE, _DATE_RE, _GSTIN_RE, _TOTAL_RE, _PHONE_RE, _NAME_RE)
+
+def _build_fallback_db():
+    """Compile the fallback patterns into one Hyperscan database, if available"""
+    if hyperscan is None:
+        return None
+    flags = hyperscan.HS_FLAG_CASELESS | hyperscan.HS_FLAG_UTF8 | hyperscan.HS_FLAG_SOM_LEFTMOST
+    try:
+        db = hyperscan.Database()
+        db.compile(
+            expressions=[p.pattern.encode('utf-8') for p in _FALLBACK_PATTERNS],
+            ids=list(range(len(_FALLBACK_PATTERNS))),
+            elements=len(_FALLBACK_PATTERNS),
+            flags=[flags] * len(_FALLBACK_PATTERNS),
+        )
+    except Exception:
+        return None
+    return db
+
+_FALLBACK_DB = _build_fallback_db()
+
+def _fallback_matches(text: str) -> List[Optional[re.Match]]:
+    """
+    Return the first match of each fallback pattern in text
+    
+    With Hyperscan the text is scanned once for all patterns to find where
+    each first matches; the compiled pattern is then matched at that offset
+    to recover its groups. Without it, each pattern is searched in turn.
+    """
+    if _FALLBACK_DB is None:
+        return [pattern.search(text) for pattern in _FALLBACK_PATTERNS]
+    
+    data = text.encode('utf-8')
+    starts: Dict[int, int] = {}
+    
+    def on_match(pattern_id, start, end, flags, context):
+        if start < starts.get(pattern_id, len(data) + 1):
+            starts[pattern_id] = start
+    
+    _FALLBACK_DB.scan(data, match_event_handler=on_match)
+    
+    matches = []
+    for pattern_id, pattern in enumerate(_FALLBACK_PATTERNS):
+        start = starts.get(pattern_id)
+        # Hyperscan reports byte offsets; convert back to a character offset
+        matches.append(None if start is None else pattern.match(text, len(data[:start].decode('utf-8'))))
+    return matches
+
+# Bulk extraction groups invoices of similar OCR text length into this many
+# bins, so a bin is not held up by one much longer invoice
+EXTRACTION_BIN_COUNT = 4
+# Upper bound on the estimated prompt tokens sent to Ollama at once
+OLLAMA_MAX_BATCH_TOKENS = 16384
+# Rough characters-per-token ratio used to estimate prompt size
+_CHARS_PER_TOKEN = 4
+
+def length_bins(texts: List[str], bin_count: int = EXTRACTION_BIN_COUNT,
+                max_batch_tokens: int = OLLAMA_MAX_BATCH_TOKENS) -> List[List[int]]:
+    """
+    Group text indices into bins of similar length, shortest first
+    
+    Each bin is capped so that its longest text times its size stays
+    within max_batch_tokens (a bin always holds at least one text).
+    """
+    order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+    bin_size = max(1, math.ceil(len(order) / max(1, bin_count)))
+    bins = []
+    for start in range(0, len(order), bin_size):
+        chunk = order[start:start + bin_size]
+        # The chunk is sorted, so its last text is the longest
+        longest = max(1, len(texts[chunk[-1]]) // _CHARS_PER_TOKEN)
+        fit = max(1, max_batch_tokens // longest)
+        bins.extend(chunk[i:i + fit] for i in range(0, len(chunk), fit))
+    return bins
+
+def _extract_first_json_object(text: str) -> Optional[str]:
+    """
+    Return the first balanced {...} object in text, or None if there is none
+    
+    A single linear scan that tracks brace depth and skips braces inside
+    JSON strings (including escaped quotes).
+    """
+    start = text.find('{')
+    if start < 0:
+        return None
+    
+    depth = 0
+    in_string = False
+    escaped = False
+    for i in range(start, len(text)):
+        c = text[i]
+        if in_string:
+            if escaped:
+                escaped = False
+            elif c == '\\':
+                escaped = True
+            elif c == '"':
+                in_string = False
+        elif c == '"':
+            in_string = True
+        elif c == '{':
+            depth += 1
+        elif c == '}':
+            depth -= 1
+            if depth == 0:
+                return text[start:i + 1]
+    return None
+
+@dataclass(slots=True)
+class InvoiceFields:
     """Data model for invoice fields"""
     # Billing Information
     billing_customer_name: Optional[str] = None
@@ -29,7 +173,7 @@ class InvoiceFields(BaseModel):
     # Order Information
     order_date: Optional[str] = None
     invoice_number: Optional[str] = None
-    order_items: list = []
+    order_items: list = field(default_factory=list)
     sub_total: Optional[float] = None
     tax_amount: Optional[float] = None
     total_amount: Optional[float] = None
@@ -38,9 +182,14 @@ class InvoiceFields(BaseModel):
 class LLMInvoiceProcessor:
     """Process invoice text using local LLM via Ollama"""
     
-    def __init__(self, model="llama3:8b", ollama_url="http://localhost:11434"):
+    def __init__(self, model="llama3:8b", ollama_url="http://localhost:11434", keep_alive="30m"):
         self.model = model
         self.ollama_url = ollama_url
+        # How long Ollama keeps the model loaded between requests
+        self.keep_alive = keep_alive
+        
+        # Reuse one keep-alive connection to Ollama across blocking calls
+        self.session = requests.Session()
         
         # Configure logging
         logging.basicConfig(level=logging.INFO)
@@ -49,23 +198,55 @@ class LLMInvoiceProcessor:
         # Test connection to Ollama
         self.test_connection()
     
-    def test_connection(self):
+    def test_connection(self) -> bool:
         """Test connection to Ollama server"""
         try:
-            response = requests.get(f"{self.ollama_url}/api/tags")
-            if response.status_code == 200:
-                models = response.json().get('models', [])
-                model_names = [model.get('name') for model in models]
-                self.logger.info(f"Connected to Ollama. Available models: {model_names}")
-                
-                # Check if our model is available
-                if self.model.split(':')[0] not in [m.split(':')[0] for m in model_names]:
-                    self.logger.warning(f"Model {self.model} not found in available models. You may need to pull it.")
-            else:
-                self.logger.warning(f"Ollama returned status code {response.status_code}")
+            response = self.session.get(f"{self.ollama_url}/api/tags")
+            return self._check_tags_response(response.status_code, response)
         except Exception as e:
             self.logger.error(f"Failed to connect to Ollama at {self.ollama_url}: {str(e)}")
             self.logger.info("Make sure Ollama is running and accessible.")
+            return False
+    
+    async def atest_connection(self, client: httpx.AsyncClient, timeout: float = 5.0) -> bool:
+        """Test connection to Ollama server without blocking the event loop"""
+        try:
+            response = await client.get(f"{self.ollama_url}/api/tags", timeout=timeout)
+            return self._check_tags_response(response.status_code, response)
+        except Exception as e:
+            self.logger.error(f"Failed to connect to Ollama at {self.ollama_url}: {str(e)}")
+            return False
+    
+    def _check_tags_response(self, status_code, response) -> bool:
+        """Log the outcome of an /api/tags call and report whether Ollama is reachable"""
+        if status_code != 200:
+            self.logger.warning(f"Ollama returned status code {status_code}")
+            return False
+        
+        models = response.json().get('models', [])
+        model_names = [model.get('name') for model in models]
+        self.logger.info(f"Connected to Ollama. Available models: {model_names}")
+        
+        # Check if our model is available
+        if self.model.split(':')[0] not in [m.split(':')[0] for m in model_names]:
+            self.logger.warning(f"Model {self.model} not found in available models. You may need to pull it.")
+        return True
+    
+    def _add_stream_line(self, parts, line) -> bool:
+        """
+        Append the text of one streamed /api/generate chunk to parts
+        
+        Returns True once generation is done or a complete JSON object has
+        arrived, so the caller can stop reading.
+        """
+        if not line:
+            return False
+        chunk = json.loads(line)
+        text = chunk.get('response', '')
+        parts.append(text)
+        if chunk.get('done'):
+            return True
+        return '}' in text and _extract_first_json_object(''.join(parts)) is not None
     
     def query_ollama(self, prompt, system_prompt=None):
         """Send a query to Ollama LLM API"""
@@ -75,28 +256,63 @@ class LLMInvoiceProcessor:
             payload = {
                 "model": self.model,
                 "prompt": prompt,
-                "stream": False
+                "stream": True,
+                "keep_alive": self.keep_alive
             }
             
             if system_prompt:
                 payload["system"] = system_prompt
                 
-            response = requests.post(url, json=payload)
+            # Closing the response as soon as the JSON object is complete
+            # drops the connection, which stops Ollama generating the tail
+            with self.session.post(url, json=payload, stream=True) as response:
+                if response.status_code != 200:
+                    self.logger.error(f"Ollama API error: {response.status_code} - {response.text}")
+                    return ""
+                
+                parts = []
+                for line in response.iter_lines():
+                    if self._add_stream_line(parts, line):
+                        break
+                return ''.join(parts)
+                
+        except Exception as e:
+            self.logger.error(f"Error querying Ollama: {str(e)}")
+            return ""
+    
+    async def aquery_ollama(self, client: httpx.AsyncClient, prompt, system_prompt=None):
+        """Send a query to Ollama LLM API through a shared httpx.AsyncClient"""
+        try:
+            url = f"{self.ollama_url}/api/generate"
             
-            if response.status_code == 200:
-                return response.json().get('response', '')
-            else:
-                self.logger.error(f"Ollama API error: {response.status_code} - {response.text}")
-                return ""
+            payload = {
+                "model": self.model,
+                "prompt": prompt,
+                "stream": True,
+                "keep_alive": self.keep_alive
+            }
+            
+            if system_prompt:
+                payload["system"] = system_prompt
+                
+            async with client.stream("POST", url, json=payload) as response:
+                if response.status_code != 200:
+                    await response.aread()
+                    self.logger.error(f"Ollama API error: {response.status_code} - {response.text}")
+                    return ""
+                
+                parts = []
+                async for line in response.aiter_lines():
+                    if self._add_stream_line(parts, line):
+                        break
+                return ''.join(parts)
                 
         except Exception as e:
             self.logger.error(f"Error querying Ollama: {str(e)}")
             return ""
     
-    def extract_invoice_fields(self, ocr_text: str) -> Dict[str, Any]:
-        """Extract invoice fields from OCR text using local LLM"""
-        self.logger.info("Extracting invoice fields using local LLM")
-        
+    def build_extraction_prompt(self, ocr_text: str):
+        """Build the (prompt, system_prompt) pair for invoice field extraction"""
         system_prompt = """
         You are an expert invoice data extraction AI. Your task is to extract structured information from the text of an invoice.
         
@@ -156,17 +372,16 @@ class LLMInvoiceProcessor:
         Only return the JSON object, nothing else.
         """
         
-        # Query LLM
-        self.logger.info("Sending invoice text to LLM for extraction")
-        response = self.query_ollama(prompt, system_prompt)
-        
+        return prompt, system_prompt
+    
+    def parse_extraction_response(self, response: str, ocr_text: str) -> Dict[str, Any]:
+        """Parse the LLM response into invoice fields, falling back to regex extraction"""
         # Extract JSON from response
         try:
             # Try to find JSON in the response
-            json_match = re.search(r'({[\s\S]*})', response)
+            json_str = _extract_first_json_object(response)
             
-            if json_match:
-                json_str = json_match.group(1)
+            if json_str is not None:
                 # Parse the JSON
                 result = json.loads(json_str)
                 return result
@@ -183,21 +398,82 @@ class LLMInvoiceProcessor:
             self.logger.error(f"Error extracting fields: {str(e)}")
             return self.create_empty_result()
     
+    def extract_invoice_fields(self, ocr_text: str) -> Dict[str, Any]:
+        """Extract invoice fields from OCR text using local LLM"""
+        self.logger.info("Extracting invoice fields using local LLM")
+        
+        prompt, system_prompt = self.build_extraction_prompt(ocr_text)
+        
+        # Query LLM
+        self.logger.info("Sending invoice text to LLM for extraction")
+        response = self.query_ollama(prompt, system_prompt)
+        
+        return self.parse_extraction_response(response, ocr_text)
+    
+    async def aextract_invoice_fields(self, ocr_text: str, client: httpx.AsyncClient) -> Dict[str, Any]:
+        """Async variant of extract_invoice_fields using a shared httpx client"""
+        self.logger.info("Extracting invoice fields using local LLM")
+        
+        prompt, system_prompt = self.build_extraction_prompt(ocr_text)
+        
+        # Query LLM
+        self.logger.info("Sending invoice text to LLM for extraction")
+        response = await self.aquery_ollama(client, prompt, system_prompt)
+        
+        return self.parse_extraction_response(response, ocr_text)
+    
+    async def extract_invoice_fields_batch(
+        self, texts: List[str], client: Optional[httpx.AsyncClient] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Extract invoice fields for several OCR texts concurrently
+        
+        Ollama serves up to OLLAMA_NUM_PARALLEL generations at once, so the
+        requests overlap instead of queueing behind each other.
+        """
+        if client is None:
+            async with httpx.AsyncClient(timeout=None) as own_client:
+                return await self.extract_invoice_fields_batch(texts, own_client)
+        return list(await asyncio.gather(*(self.aextract_invoice_fields(text, client) for text in texts)))
+    
+    async def aextract_invoice_fields_many(
+        self, ocr_texts: List[str], client: Optional[httpx.AsyncClient] = None,
+        bin_count: int = EXTRACTION_BIN_COUNT, max_batch_tokens: int = OLLAMA_MAX_BATCH_TOKENS
+    ) -> List[Dict[str, Any]]:
+        """Extract fields for many invoices, sending length-binned groups to Ollama together"""
+        if client is None:
+            async with httpx.AsyncClient(timeout=None) as own_client:
+                return await self.aextract_invoice_fields_many(ocr_texts, own_client, bin_count, max_batch_tokens)
+        
+        results: List[Optional[Dict[str, Any]]] = [None] * len(ocr_texts)
+        for indices in length_bins(ocr_texts, bin_count, max_batch_tokens):
+            extracted = await self.extract_invoice_fields_batch([ocr_texts[i] for i in indices], client)
+            for i, fields in zip(indices, extracted):
+                results[i] = fields
+        return results
+    
+    def extract_invoice_fields_many(
+        self, ocr_texts: List[str],
+        bin_count: int = EXTRACTION_BIN_COUNT, max_batch_tokens: int = OLLAMA_MAX_BATCH_TOKENS
+    ) -> List[Dict[str, Any]]:
+        """Blocking variant of aextract_invoice_fields_many for bulk ingestion scripts"""
+        return asyncio.run(self.aextract_invoice_fields_many(
+            ocr_texts, bin_count=bin_count, max_batch_tokens=max_batch_tokens
+        ))
+    
     def extract_fields_fallback(self, ocr_text: str) -> Dict[str, Any]:
         """Fallback method using regex and heuristics to extract invoice fields"""
         self.logger.info("Using fallback extraction method")
         
         result = self.create_empty_result()
         
+        inv_match, date_match, gstin_match, total_match, phone_match, name_match = _fallback_matches(ocr_text)
+        
         # Extract invoice number (common formats)
-        inv_match = re.search(r'(?:invoice|inv|bill)(?:\s+no[.:])?\s*[#:]?\s*([A-Z0-9-/]+)', 
-                            ocr_text, re.IGNORECASE)
         if inv_match:
             result['invoice_number'] = inv_match.group(1).strip()
         
         # Extract date (various formats)
-        date_match = re.search(r'(?:date|dt)[.:]\s*(\d{1,2}[-/]\d{1,2}[-/]\d{2,4}|\d{2,4}[-/]\d{1,2}[-/]\d{1,2})', 
-                             ocr_text, re.IGNORECASE)
         if date_match:
             date_str = date_match.group(1)
             # Convert to YYYY-MM-DD (simplified)
@@ -205,14 +481,10 @@ class LLMInvoiceProcessor:
             result['order_date'] = date_str
         
         # Extract GSTIN
-        gstin_match = re.search(r'(?:GSTIN|GST IN|GST Number)[.:]\s*([0-9A-Z]{15})', 
-                              ocr_text, re.IGNORECASE)
         if gstin_match:
             result['billing_gstin'] = gstin_match.group(1).upper()
         
         # Extract total amount
-        total_match = re.search(r'(?:total|amount|grand total)[.:]\s*(?:Rs\.?|₹|INR)?\s*(\d+(?:,\d+)*(?:\.\d+)?)', 
-                              ocr_text, re.IGNORECASE)
         if total_match:
             # Remove commas and convert to float
             amount_str = total_match.group(1).replace(',', '')
@@ -222,14 +494,10 @@ class LLMInvoiceProcessor:
                 pass
         
         # Extract phone number
-        phone_match = re.search(r'(?:phone|mobile|contact|tel)[.:]\s*(\+?\d{1,3}[-.\s]?)?\(?(\d{3})\)?[-.\s]?(\d{3})[-.\s]?(\d{4})', 
-                              ocr_text, re.IGNORECASE)
         if phone_match:
             result['billing_phone'] = ''.join(g for g in phone_match.groups() if g)
         
         # Basic extraction of customer name
-        name_match = re.search(r'(?:bill to|customer|client|buyer)[.:]\s*([A-Za-z\s]+)', 
-                             ocr_text, re.IGNORECASE)
         if name_match:
             result['billing_customer_name'] = name_match.group(1).strip()
         
@@ -262,6 +530,16 @@ class LLMInvoiceProcessor:
             "payment_method": None
         }
     
+    def extract_and_refine(self, ocr_text: str) -> Dict[str, Any]:
+        """Extract invoice fields with a single LLM call and refine them locally"""
+        extracted_data = self.extract_invoice_fields(ocr_text)
+        return self.refine_extraction(extracted_data, ocr_text)
+    
+    async def aextract_and_refine(self, ocr_text: str, client: httpx.AsyncClient) -> Dict[str, Any]:
+        """Async variant of extract_and_refine using a shared httpx client"""
+        extracted_data = await self.aextract_invoice_fields(ocr_text, client)
+        return self.refine_extraction(extracted_data, ocr_text)
+    
     def refine_extraction(self, extracted_data: Dict[str, Any], ocr_text: str) -> Dict[str, Any]:
         """Refine extracted data with additional processing"""
         self.logger.info("Refining extracted data")
@@ -275,7 +553,7 @@ class LLMInvoiceProcessor:
                 try:
                     # Remove currency symbols and commas
                     value = str(refined[field])
-                    value = re.sub(r'[₹$,]', '', value)
+                    value = _CURRENCY_STRIP_RE.sub('', value)
                     refined[field] = float(value)
                 except:
                     refined[field] = None
@@ -284,33 +562,18 @@ class LLMInvoiceProcessor:
         if not isinstance(refined.get('order_items'), list):
             refined['order_items'] = []
         
-        # If shipping address is missing but billing is present, use billing
-        if not refined.get('shipping_address') and refined.get('billing_address'):
-            refined['shipping_address'] = refined['billing_address']
-            
-        if not refined.get('shipping_customer_name') and refined.get('billing_customer_name'):
-            refined['shipping_customer_name'] = refined['billing_customer_name']
-            
-        if not refined.get('shipping_city') and refined.get('billing_city'):
-            refined['shipping_city'] = refined['billing_city']
-            
-        if not refined.get('shipping_state') and refined.get('billing_state'):
-            refined['shipping_state'] = refined['billing_state']
-            
-        if not refined.get('shipping_pincode') and refined.get('billing_pincode'):
-            refined['shipping_pincode'] = refined['billing_pincode']
-            
-        if not refined.get('shipping_phone') and refined.get('billing_phone'):
-            refined['shipping_phone'] = refined['billing_phone']
-            
-        if not refined.get('shipping_email') and refined.get('billing_email'):
-            refined['shipping_email'] = refined['billing_email']
+        # Fill missing shipping details from the billing details
+        for shipping_field, billing_field in _SHIP_BILL_FIELDS:
+            if not refined.get(shipping_field) and refined.get(billing_field):
+                refined[shipping_field] = refined[billing_field]
         
         # Try to infer payment method
         if not refined.get('payment_method'):
-            if re.search(r'paid|prepaid|credit card|debit card|upi|online', ocr_text, re.IGNORECASE):
-                refined['payment_method'] = 'prepaid'
-            elif re.search(r'cod|cash on delivery|collect', ocr_text, re.IGNORECASE):
+            # Any prepaid hint wins over a COD hint, wherever it appears
+            for match in _PAYMENT_RE.finditer(ocr_text):
+                if match.lastgroup == 'prepaid':
+                    refined['payment_method'] = 'prepaid'
+                    break
                 refined['payment_method'] = 'cod'
         
         return refined 
\ No newline at end of file
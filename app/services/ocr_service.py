@@ -8,33 +8,317 @@ import pytesseract
 import logging
 from PIL import Image
 import os
-from pathlib import Path
-import io
-import re
+import asyncio
+import collections
+import hashlib
+import multiprocessing
+import queue
+import threading
+import time
+import math
+from contextlib import suppress
+from functools import lru_cache, partial
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, wait, FIRST_COMPLETED
+from concurrent.futures.process import BrokenProcessPool
+
+from app.core.config import config
+from app.services.cache_service import result_cache
+
+try:
+    import tesserocr
+except ImportError:
+    tesserocr = None
 
 # Set up logging
 logger = logging.getLogger(__name__)
 
+# One single-worker process pool per OCR engine, so each engine's models are
+# loaded in exactly one process and the engines run on their own cores
+_engine_pools = {}
+
+# Guards creating and replacing the shared pools, which callers reach from
+# several threads at once through asyncio.to_thread
+_pool_lock = threading.Lock()
+
+# Thread pool for running engines concurrently when not using the process pool
+_engine_threads = None
+
+# Process pool that OCRs whole PDF pages in parallel on CPU-only hosts
+_page_pool = None
+
+# Per-engine services living inside pool worker processes
+_worker_services = {}
+
+# Services living inside page pool worker processes, keyed by engine tuple
+_page_services = {}
+
+# Engine instances shared by every MultiOCRService in the process; False marks
+# an engine that failed to load so it is not retried on every access
+_PADDLE_OCR = None
+_EASY_READER = None
+_engine_lock = threading.Lock()
+
+# CPU threads each PaddleOCR instance uses; page pool workers drop to one
+_paddle_cpu_threads = config.MAX_WORKERS
+
+def _get_engine_pool(engine):
+    """Get the process pool dedicated to an OCR engine, starting it on first use."""
+    with _pool_lock:
+        pool = _engine_pools.get(engine)
+        if pool is None:
+            # spawn keeps CUDA and the server's threads out of the workers
+            pool = _engine_pools[engine] = ProcessPoolExecutor(
+                max_workers=1,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        return pool
+
+def _get_engine_threads():
+    """Get the thread pool used to overlap engines inside one process."""
+    global _engine_threads
+    with _pool_lock:
+        if _engine_threads is None:
+            _engine_threads = ThreadPoolExecutor(max_workers=config.MAX_WORKERS, thread_name_prefix="ocr-engine")
+        return _engine_threads
+
+def _discard_pool(pool):
+    """Forget a process pool broken by a dead worker so the next caller starts a fresh one."""
+    global _page_pool
+    with _pool_lock:
+        for engine, engine_pool in list(_engine_pools.items()):
+            if engine_pool is pool:
+                del _engine_pools[engine]
+        if _page_pool is pool:
+            _page_pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+def _submit_to_pool(get_pool, fn, *args):
+    """
+    Submit a call to the pool returned by get_pool.
+    
+    A worker killed mid-task (e.g. by the OOM killer) leaves the pool broken
+    for good, so a broken pool is replaced once instead of failing every
+    later call until restart.
+    """
+    pool = get_pool()
+    try:
+        return pool.submit(fn, *args)
+    except BrokenProcessPool:
+        logger.warning("OCR process pool lost a worker, starting a new one")
+        _discard_pool(pool)
+        return get_pool().submit(fn, *args)
+
+def _broke_pool(future):
+    """Whether a finished future failed because its process pool lost a worker."""
+    return not future.cancelled() and isinstance(future.exception(), BrokenProcessPool)
+
+def _page_pool_size():
+    """
+    Page pool workers per API process.
+    
+    Every API process has its own page pool and each worker loads every
+    engine, so the pools are sized to share the cores between the API
+    processes: WORKERS of them, or one per core when WORKERS is 0, as in
+    main.py. With no spare cores the pool is not used at all.
+    """
+    cores = os.cpu_count() or 1
+    api_processes = config.WORKERS or cores
+    return max(1, min(config.MAX_WORKERS, cores // api_processes))
+
+def _get_page_pool():
+    """Get the PDF page process pool, starting it on first use."""
+    global _page_pool
+    with _pool_lock:
+        if _page_pool is None:
+            _page_pool = ProcessPoolExecutor(
+                max_workers=_page_pool_size(),
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_page_worker,
+                initargs=(config.OCR_ENGINES,)
+            )
+        return _page_pool
+
+def _get_page_service(engines):
+    """Get the in-process service a page pool worker uses for these engines."""
+    service = _page_services.get(engines)
+    if service is None:
+        service = _page_services[engines] = MultiOCRService(engines=engines, parallel=False)
+    return service
+
+def _init_page_worker(engines):
+    """Load the OCR engines once when a page pool worker starts."""
+    global _paddle_cpu_threads
+    # The pool already runs one page per core; engine threads would oversubscribe them
+    _paddle_cpu_threads = 1
+    cv2.setNumThreads(1)
+    try:
+        import torch
+        torch.set_num_threads(1)
+    except ImportError:
+        pass
+    service = _get_page_service(engines)
+    service.paddle_ocr
+    service.easy_reader
+
+def _ocr_page_in_worker(engines, img, preprocessed):
+    """OCR one PDF page with every engine inside a page pool worker process."""
+    return _get_page_service(engines)._ocr_image(img, preprocessed)
+
+def _run_engine_in_worker(engine, imgs, preprocessed=False):
+    """Run a single OCR engine on a batch of images inside a pool worker process."""
+    service = _worker_services.get(engine)
+    if service is None:
+        service = _worker_services[engine] = MultiOCRService(engines=(engine,), parallel=False)
+    return service.run_engine_batch(engine, imgs, preprocessed)
+
+# Longest image side the PaddleOCR detector works on; larger pages are downscaled
+_DETECTION_MAX_SIDE = 960
+
+# EasyOCR detection canvas; mag_ratio=1.0 stops small pages being upscaled
+_EASYOCR_DETECTION_OPTIONS = {"canvas_size": 1280, "mag_ratio": 1.0}
+
+# Characters Tesseract may recognize on invoices
+_TESSERACT_WHITELIST = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz@.-:,/()"
+
+# tesserocr API handles are not thread-safe, so each engine thread keeps its own
+_tess_local = threading.local()
+
+def _get_tess_api():
+    """Get this thread's Tesseract API handle, initializing it on first use."""
+    api = getattr(_tess_local, "api", None)
+    if api is None:
+        api = tesserocr.PyTessBaseAPI(psm=tesserocr.PSM.SINGLE_BLOCK, oem=tesserocr.OEM.DEFAULT)
+        api.SetVariable("tessedit_char_whitelist", _TESSERACT_WHITELIST)
+        _tess_local.api = api
+    return api
+
+# Pages rasterized per poppler call, each rendered on its own thread
+_PDF_RENDER_BATCH = max(config.MAX_WORKERS, 1)
+
+# pdftocairo renders text-heavy pages faster than pdftoppm; ppm output is
+# read straight from poppler's stdout without an encode/decode roundtrip
+_PDF_RENDER_OPTIONS = {
+    "thread_count": _PDF_RENDER_BATCH,
+    "use_pdftocairo": True,
+    "fmt": "ppm",
+}
+
+@lru_cache(maxsize=1)
+def _cuda_opencv_available():
+    """Whether OpenCV was built with CUDA and can see a device."""
+    try:
+        return cv2.cuda.getCudaEnabledDeviceCount() > 0
+    except (AttributeError, cv2.error):
+        return False
+
+def _binarize(gray):
+    """
+    Binarize a contrast-enhanced grayscale image.
+    
+    After CLAHE a single global Otsu threshold is usually as good as an
+    adaptive one at a fraction of the cost; OCR_THRESHOLD_METHOD=adaptive
+    keeps the per-pixel Gaussian threshold for unevenly lit scans.
+    """
+    if config.OCR_THRESHOLD_METHOD == "adaptive":
+        return cv2.adaptiveThreshold(gray, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY, 11, 2)
+    _, binary = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+    return binary
+
+# Longest side of the downsampled edge map used for skew detection
+_SKEW_DETECT_SIZE = 1000
+
+def _detect_skew_angle(gray):
+    """
+    Estimate document skew from text lines found by a Hough transform.
+    
+    Args:
+        gray: Grayscale image as numpy array
+        
+    Returns:
+        Angle in degrees to rotate the image by, 0.0 if no lines were found
+    """
+    h, w = gray.shape[:2]
+    scale = min(1.0, _SKEW_DETECT_SIZE / max(h, w))
+    small = cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA) if scale < 1.0 else gray
+    
+    edges = cv2.Canny(small, 50, 150)
+    min_length = max(small.shape[1] // 8, 20)
+    lines = cv2.HoughLinesP(edges, 1, np.pi / 180, 100, minLineLength=min_length, maxLineGap=20)
+    if lines is None:
+        return 0.0
+    
+    x1, y1, x2, y2 = lines[:, 0].T
+    angles = np.degrees(np.arctan2(y2 - y1, x2 - x1))
+    # Text lines are near horizontal; ignore vertical rules and table borders
+    angles = angles[np.abs(angles) < 45]
+    return float(np.median(angles)) if angles.size else 0.0
+
 class MultiOCRService:
     """
     Multi-engine OCR service that combines PaddleOCR, EasyOCR, and Tesseract
     with advanced image preprocessing for maximum accuracy.
     """
     
-    def __init__(self):
-        """Initialize the OCR service with multiple engines."""
+    def __init__(self, engines=None, parallel=None):
+        """
+        Initialize the OCR service with multiple engines.
+        
+        Args:
+            engines: Engine names to run, defaults to config.OCR_ENGINES
+            parallel: Run engines concurrently in a process pool, defaults to
+                config.OCR_PARALLEL_ENGINES
+        """
         logger.info("Initializing MultiOCRService")
         
-        # Initialize OCR engines
-        self.paddle_ocr = self._init_paddle_ocr()
-        self.easy_reader = self._init_easy_ocr()
+        self.engines = tuple(engines) if engines is not None else config.OCR_ENGINES
+        self.parallel = config.OCR_PARALLEL_ENGINES if parallel is None else parallel
+        
+        # Engines and their libraries are loaded on first use, so engines left
+        # out of OCR_ENGINES are never imported
         self.logger = logger
+    
+    @property
+    def paddle_ocr(self):
+        """Shared PaddleOCR engine, or None when not used by this service."""
+        global _PADDLE_OCR
+        if self.parallel or 'paddle' not in self.engines:
+            return None
+        if _PADDLE_OCR is None:
+            with _engine_lock:
+                if _PADDLE_OCR is None:
+                    _PADDLE_OCR = self._init_paddle_ocr() or False
+        return _PADDLE_OCR or None
+    
+    @property
+    def easy_reader(self):
+        """Shared EasyOCR reader, or None when not used by this service."""
+        global _EASY_READER
+        if self.parallel or 'easy' not in self.engines:
+            return None
+        if _EASY_READER is None:
+            with _engine_lock:
+                if _EASY_READER is None:
+                    _EASY_READER = self._init_easy_ocr() or False
+        return _EASY_READER or None
         
     def _init_paddle_ocr(self):
         """Initialize PaddleOCR engine."""
         try:
             from paddleocr import PaddleOCR
-            return PaddleOCR(use_angle_cls=True, lang='en')
+            use_tensorrt = config.OCR_USE_GPU and config.OCR_USE_TENSORRT
+            return PaddleOCR(
+                use_angle_cls=True,
+                lang='en',
+                use_gpu=config.OCR_USE_GPU,
+                use_tensorrt=use_tensorrt,
+                # FP16 needs TensorRT; MKL-DNN accelerates the CPU path
+                precision='fp16' if use_tensorrt else 'fp32',
+                enable_mkldnn=not config.OCR_USE_GPU,
+                cpu_threads=_paddle_cpu_threads,
+                # Detection gains nothing past ~1000px; cap the long side of large scans
+                det_limit_side_len=_DETECTION_MAX_SIDE,
+                det_limit_type='max',
+            )
         except ImportError:
             logger.warning("PaddleOCR not available. Continuing without it.")
             return None
@@ -46,7 +330,8 @@ class MultiOCRService:
         """Initialize EasyOCR engine."""
         try:
             import easyocr
-            return easyocr.Reader(['en'])
+            # quantize only applies on CPU, where it uses int8 dynamic quantization
+            return easyocr.Reader(['en'], gpu=config.OCR_USE_GPU, quantize=True)
         except ImportError:
             logger.warning("EasyOCR not available. Continuing without it.")
             return None
@@ -54,6 +339,16 @@ class MultiOCRService:
             logger.error(f"Error initializing EasyOCR: {e}")
             return None
     
+    @property
+    def _imread_flags(self):
+        """
+        Decode mode for input images.
+        
+        PaddleOCR and EasyOCR read colour images; when only Tesseract runs,
+        decoding straight to grayscale skips the 3-channel buffer entirely.
+        """
+        return cv2.IMREAD_COLOR if {'paddle', 'easy'} & set(self.engines) else cv2.IMREAD_GRAYSCALE
+    
     def preprocess_image(self, image_path):
         """
         Advanced image preprocessing for better OCR accuracy.
@@ -64,151 +359,280 @@ class MultiOCRService:
         Returns:
             Preprocessed image as numpy array
         """
-        try:
-            # Read the image
-            img = cv2.imread(str(image_path))
-            if img is None:
-                raise ValueError(f"Could not read image at {image_path}")
+        # Decode straight to one channel; preprocessing only needs grayscale
+        img = cv2.imread(str(image_path), cv2.IMREAD_GRAYSCALE)
+        if img is None:
+            logger.error(f"Error preprocessing image: Could not read image at {image_path}")
+            return None
+        return self.preprocess_image_array(img)
+    
+    def preprocess_image_array(self, img):
+        """
+        Advanced image preprocessing for an already decoded image.
+        
+        Args:
+            img: BGR or grayscale image as numpy array
             
+        Returns:
+            Preprocessed image as numpy array
+        """
+        if config.OCR_USE_GPU and _cuda_opencv_available():
+            try:
+                return self.preprocess_image_cuda(img)
+            except Exception as e:
+                logger.warning(f"CUDA preprocessing failed, falling back to CPU: {e}")
+        
+        try:
             # Convert to grayscale
-            gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+            gray = img if img.ndim == 2 else cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
             
-            # Noise removal
-            denoised = cv2.fastNlMeansDenoising(gray, h=10)
+            # Noise removal; non-local means is only worth its cost in advanced mode,
+            # CLAHE and adaptive thresholding already suppress most noise
+            if config.OCR_PREPROCESSOR == "advanced":
+                denoised = cv2.fastNlMeansDenoising(gray, h=10, templateWindowSize=7, searchWindowSize=11)
+            else:
+                denoised = cv2.GaussianBlur(gray, (3, 3), 0)
             
             # Contrast enhancement
-            clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8,8))
+            clahe = cv2.createCLAHE(clipLimit=1.0, tileGridSize=(8,8))
             enhanced = clahe.apply(denoised)
             
             # Deskewing (if needed)
-            coords = np.column_stack(np.where(enhanced > 0))
-            if len(coords) > 0:  # Ensure we have non-zero pixels
-                angle = cv2.minAreaRect(coords)[-1]
-                if angle < -45:
-                    angle = -(90 + angle)
-                else:
-                    angle = -angle
-                    
-                if abs(angle) > 0.5:  # Only deskew if angle is significant
-                    (h, w) = enhanced.shape[:2]
-                    center = (w // 2, h // 2)
-                    M = cv2.getRotationMatrix2D(center, angle, 1.0)
-                    enhanced = cv2.warpAffine(enhanced, M, (w, h), flags=cv2.INTER_CUBIC, borderMode=cv2.BORDER_REPLICATE)
+            angle = _detect_skew_angle(enhanced)
+            if abs(angle) > 0.5:  # Only deskew if angle is significant
+                (h, w) = enhanced.shape[:2]
+                center = (w // 2, h // 2)
+                M = cv2.getRotationMatrix2D(center, angle, 1.0)
+                enhanced = cv2.warpAffine(enhanced, M, (w, h), flags=cv2.INTER_CUBIC, borderMode=cv2.BORDER_REPLICATE)
             
-            # Adaptive thresholding
-            binary = cv2.adaptiveThreshold(enhanced, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY, 11, 2)
-            
-            return binary
+            # Binarization
+            return _binarize(enhanced)
         except Exception as e:
             logger.error(f"Error preprocessing image: {e}")
             # Return the original image if preprocessing fails
-            return cv2.imread(str(image_path))
+            return img
+    
+    def preprocess_image_cuda(self, img):
+        """
+        Preprocess a decoded BGR image on the GPU with OpenCV's CUDA modules.
+        
+        The image is uploaded once and grayscale conversion, denoising, CLAHE
+        and deskew rotation run on the device. Skew detection and
+        thresholding have no CUDA kernels and run on the downloaded image.
+        
+        Args:
+            img: BGR or grayscale image as numpy array
+            
+        Returns:
+            Preprocessed image as numpy array
+        """
+        stream = cv2.cuda.Stream()
+        gpu_img = cv2.cuda_GpuMat()
+        gpu_img.upload(img, stream)
+        
+        gpu_gray = gpu_img if img.ndim == 2 else cv2.cuda.cvtColor(gpu_img, cv2.COLOR_BGR2GRAY, stream=stream)
+        
+        # Same denoising choice as the CPU path
+        if config.OCR_PREPROCESSOR == "advanced":
+            gpu_denoised = cv2.cuda.fastNlMeansDenoising(gpu_gray, 10, search_window=11, block_size=7, stream=stream)
+        else:
+            gaussian = cv2.cuda.createGaussianFilter(cv2.CV_8UC1, cv2.CV_8UC1, (3, 3), 0)
+            gpu_denoised = gaussian.apply(gpu_gray, stream=stream)
+        
+        clahe = cv2.cuda.createCLAHE(clipLimit=1.0, tileGridSize=(8, 8))
+        gpu_enhanced = clahe.apply(gpu_denoised, stream)
+        enhanced = gpu_enhanced.download(stream)
+        stream.waitForCompletion()
+        
+        angle = _detect_skew_angle(enhanced)
+        if abs(angle) > 0.5:
+            (h, w) = enhanced.shape[:2]
+            M = cv2.getRotationMatrix2D((w // 2, h // 2), angle, 1.0)
+            gpu_rotated = cv2.cuda.warpAffine(
+                gpu_enhanced, M, (w, h), flags=cv2.INTER_CUBIC, borderMode=cv2.BORDER_REPLICATE, stream=stream
+            )
+            enhanced = gpu_rotated.download(stream)
+            stream.waitForCompletion()
+        
+        return _binarize(enhanced)
     
     def parse_paddle_result(self, result):
         """
-        Parse PaddleOCR result into plain text.
+        Parse PaddleOCR result into lines of text.
         
         Args:
             result: PaddleOCR result object
             
         Returns:
-            Extracted text as string
+            List of (text, confidence) tuples, one per detected line
         """
-        text = ""
-        for line in result:
-            for word_info in line:
+        lines = []
+        for page in result:
+            # PaddleOCR returns None for pages without detections
+            for word_info in page or ():
                 if len(word_info) >= 2:
-                    text += word_info[1][0] + " "
-            text += "\n"
-        return text
+                    text, confidence = word_info[1]
+                    lines.append((text, float(confidence)))
+        return lines
     
     def parse_easy_result(self, result):
         """
-        Parse EasyOCR result into plain text.
+        Parse EasyOCR result into lines of text.
         
         Args:
             result: EasyOCR result object
             
         Returns:
-            Extracted text as string
+            List of (text, confidence) tuples, one per line; a line's
+            confidence is the mean of its detections
         """
-        text = ""
-        current_line_y = -1
-        line_text = ""
+        if not result:
+            return []
         
-        # Sort by y-coordinate first, then by x-coordinate
-        sorted_result = sorted(result, key=lambda x: (x[0][0][1] + x[0][2][1]) / 2)
+        # Sort detections by the center y-coordinate of their boxes
+        boxes = np.array([detection[0] for detection in result], dtype=np.float32)
+        ys = (boxes[:, 0, 1] + boxes[:, 2, 1]) * 0.5
+        order = np.argsort(ys, kind="stable")
+        texts = [result[i][1] for i in order]
+        confidences = np.array([result[i][2] for i in order], dtype=np.float32)
         
-        for detection in sorted_result:
-            box, text_detected, confidence = detection
-            
-            # Calculate center y-coordinate of the current text box
-            curr_y = (box[0][1] + box[2][1]) / 2
-            
-            # If y-coordinate is significantly different, start a new line
-            if current_line_y != -1 and abs(curr_y - current_line_y) > 20:
-                text += line_text + "\n"
-                line_text = text_detected + " "
-            else:
-                line_text += text_detected + " "
+        # Start a new line wherever the y-coordinate jumps significantly
+        line_breaks = (np.flatnonzero(np.abs(np.diff(ys[order])) > 20) + 1).tolist()
+        bounds = zip([0] + line_breaks, line_breaks + [len(texts)])
+        
+        return [
+            (" ".join(texts[start:end]), float(confidences[start:end].mean()))
+            for start, end in bounds
+        ]
+    
+    def run_tesserocr(self, img):
+        """
+        Run Tesseract through its C API with tesserocr.
+        
+        Unlike pytesseract this needs no subprocess or temporary image file,
+        and the initialized API is reused for every page on this thread.
+        
+        Args:
+            img: Preprocessed image as numpy array
             
-            current_line_y = curr_y
+        Returns:
+            List of (text, confidence) tuples, one per line
+        """
+        api = _get_tess_api()
+        api.SetImage(Image.fromarray(img))
+        api.Recognize()
         
-        # Add the last line
-        if line_text:
-            text += line_text
+        level = tesserocr.RIL.TEXTLINE
+        lines = []
+        for line in tesserocr.iterate_level(api.GetIterator(), level):
+            text = line.GetUTF8Text(level)
+            if text and text.strip():
+                lines.append((text.strip(), line.Confidence(level) / 100))
+        return lines
+    
+    def parse_tesseract_result(self, data):
+        """
+        Parse Tesseract image_to_data output into lines of text.
         
-        return text
+        Args:
+            data: Dictionary returned by pytesseract.image_to_data
+            
+        Returns:
+            List of (text, confidence) tuples, one per line; a line's
+            confidence is the mean of its word confidences
+        """
+        words = {}
+        for i, word in enumerate(data["text"]):
+            # Tesseract reports -1 for layout entries that are not words
+            confidence = float(data["conf"][i])
+            if confidence < 0 or not word.strip():
+                continue
+            key = (data["block_num"][i], data["par_num"][i], data["line_num"][i])
+            words.setdefault(key, []).append((word, confidence / 100))
+        
+        return [
+            (" ".join(word for word, _ in line), sum(conf for _, conf in line) / len(line))
+            for line in words.values()
+        ]
     
     def consolidate_ocr_results(self, results):
         """
-        Combine results from multiple OCR engines intelligently.
+        Combine results from multiple OCR engines by confidence-weighted voting.
+        
+        Lines are matched by position. For each position the candidate with
+        the highest confidence times log length wins, so a confident reading
+        beats a longer but noisier one.
         
         Args:
-            results: Dictionary of OCR results from different engines
+            results: Dictionary mapping engine name to (text, confidence) lines
             
         Returns:
             Consolidated text as string
         """
+        lines_by_engine = {}
+        for engine, lines in results.items():
+            lines = [(text.strip(), confidence) for text, confidence in lines if text.strip()]
+            if lines:
+                lines_by_engine[engine] = lines
+        
         # If only one engine worked, return its result
-        non_empty_results = {k: v for k, v in results.items() if v.strip()}
-        if len(non_empty_results) == 0:
+        if len(lines_by_engine) == 0:
             return ""
-        elif len(non_empty_results) == 1:
-            return list(non_empty_results.values())[0]
-        
-        # Split all results into lines for comparison
-        lines_by_engine = {
-            engine: text.split('\n') 
-            for engine, text in non_empty_results.items()
-        }
+        elif len(lines_by_engine) == 1:
+            return '\n'.join(text for text, _ in next(iter(lines_by_engine.values())))
         
         # Consolidate line by line
         max_lines = max(len(lines) for lines in lines_by_engine.values())
         consolidated = []
         
         for i in range(max_lines):
-            line_candidates = []
-            for engine, lines in lines_by_engine.items():
-                if i < len(lines):
-                    line = lines[i].strip()
-                    if line:
-                        line_candidates.append((engine, line))
-            
-            if not line_candidates:
-                continue
-                
-            # Choose the best line based on heuristics
-            if len(line_candidates) == 1:
-                consolidated.append(line_candidates[0][1])
-            else:
-                # Simple heuristic: prefer the longer line, which likely has more information
-                # Could be improved with more sophisticated voting or confidence-based selection
-                best_line = max(line_candidates, key=lambda x: len(x[1]))[1]
-                consolidated.append(best_line)
+            line_candidates = [lines[i] for lines in lines_by_engine.values() if i < len(lines)]
+            best_line = max(line_candidates, key=lambda line: line[1] * math.log1p(len(line[0])))[0]
+            consolidated.append(best_line)
         
         return '\n'.join(consolidated)
     
+    def _get_cached_text(self, digest):
+        """Look up OCR text for a content hash, None on a miss or cache error."""
+        try:
+            return result_cache.get_ocr_text_sync(self.engines, digest)
+        except Exception as e:
+            logger.warning(f"OCR cache lookup failed: {e}")
+            return None
+    
+    def _set_cached_text(self, digest, text):
+        """Store OCR text for a content hash; failed extractions are not cached."""
+        if text.startswith("ERROR:"):
+            return
+        try:
+            result_cache.set_ocr_text_sync(self.engines, digest, text)
+        except Exception as e:
+            logger.warning(f"OCR cache update failed: {e}")
+    
+    def _cached_extract(self, data, extract):
+        """
+        Run an extraction, reusing cached text for identical file contents.
+        
+        Args:
+            data: Raw file contents the text is extracted from
+            extract: Callable performing the extraction on a cache miss
+            
+        Returns:
+            Extracted text as string
+        """
+        if not config.ENABLE_CACHING:
+            return extract()
+        
+        digest = hashlib.blake2b(data, digest_size=32).hexdigest()
+        cached = self._get_cached_text(digest)
+        if cached is not None:
+            logger.info("Reusing cached OCR text for identical file contents")
+            return cached
+        
+        text = extract()
+        self._set_cached_text(digest, text)
+        return text
+    
     def extract_text_multi_ocr(self, image_path):
         """
         Extract text from an image using multiple OCR engines.
@@ -221,64 +645,488 @@ class MultiOCRService:
         """
         logger.info(f"Extracting text from image: {image_path}")
         
-        # Preprocess image for better OCR accuracy
-        preprocessed_img = self.preprocess_image(image_path)
+        img = cv2.imread(str(image_path), self._imread_flags)
+        if img is None:
+            raise ValueError(f"Could not read image at {image_path}")
         
-        # Use a temporary file for the preprocessed image
-        preprocessed_path = str(Path(image_path).with_suffix('.preproc.jpg'))
-        cv2.imwrite(preprocessed_path, preprocessed_img)
+        return self.extract_text_from_array(img)
+    
+    def extract_text_from_array(self, img):
+        """
+        Extract text from a decoded BGR image using multiple OCR engines.
         
-        results = {}
+        Args:
+            img: Image as numpy array
+            
+        Returns:
+            Extracted text as string
+        """
+        return self._ocr_image(img)
+    
+    def extract_text_from_bytes(self, data, ext, use_cache=True):
+        """
+        Extract text from an in-memory image or PDF without touching disk.
         
-        # PaddleOCR
-        if self.paddle_ocr:
+        Args:
+            data: Raw file contents
+            ext: File extension including the dot, e.g. '.png' or '.pdf'
+            use_cache: Reuse text cached for identical contents; callers that
+                keep their own content cache pass False
+            
+        Returns:
+            Extracted text as string
+        """
+        if not use_cache:
+            return self._extract_text_from_bytes(data, ext)
+        return self._cached_extract(data, lambda: self._extract_text_from_bytes(data, ext))
+    
+    def _extract_text_from_bytes(self, data, ext):
+        """Uncached implementation of extract_text_from_bytes."""
+        ext = ext.lower()
+        if ext == '.pdf':
+            logger.info(f"Extracting text from in-memory PDF ({len(data)} bytes)")
+            try:
+                from pdf2image import convert_from_bytes, pdfinfo_from_bytes
+            except ImportError:
+                logger.error("pdf2image not available. Cannot process PDF.")
+                return "ERROR: pdf2image library not available. Please install it to process PDFs."
             try:
-                logger.info("Running PaddleOCR")
-                paddle_result = self.paddle_ocr.ocr(preprocessed_path, cls=True)
-                results['paddle'] = self.parse_paddle_result(paddle_result)
-                logger.info(f"PaddleOCR extracted {len(results['paddle'])} characters")
+                page_count = pdfinfo_from_bytes(data)["Pages"]
+                return self._extract_text_from_pdf_pages(
+                    page_count,
+                    lambda first, last: convert_from_bytes(data, first_page=first, last_page=last, **_PDF_RENDER_OPTIONS)
+                )
             except Exception as e:
-                logger.error(f"PaddleOCR failed: {e}")
-                results['paddle'] = ""
-        else:
-            results['paddle'] = ""
+                logger.error(f"Error processing PDF: {e}")
+                return f"ERROR: Failed to process PDF: {e}"
+        
+        logger.info(f"Extracting text from in-memory image ({len(data)} bytes)")
+        img = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), self._imread_flags)
+        if img is None:
+            raise ValueError("Could not decode uploaded image")
+        
+        return self.extract_text_from_array(img)
+    
+    def run_engine(self, engine, img, preprocessed=False):
+        """
+        Run one OCR engine on an image.
+        
+        PaddleOCR and EasyOCR normalize and deskew internally and read the
+        decoded image as is. Tesseract needs the binarized image, so the
+        image is preprocessed here first unless that was already done.
+        
+        Args:
+            engine: Engine name ('paddle', 'easy' or 'tesseract')
+            img: Decoded image as numpy array
+            preprocessed: Whether img is already preprocessed for Tesseract
+            
+        Returns:
+            List of (text, confidence) tuples, one per line
+        """
+        if engine == 'paddle':
+            if not self.paddle_ocr:
+                return []
+            logger.info("Running PaddleOCR")
+            return self.parse_paddle_result(self.paddle_ocr.ocr(img, cls=True))
+        
+        if engine == 'easy':
+            if not self.easy_reader:
+                return []
+            logger.info("Running EasyOCR")
+            return self.parse_easy_result(self.easy_reader.readtext(img, **_EASYOCR_DETECTION_OPTIONS))
+        
+        if engine == 'tesseract':
+            logger.info("Running Tesseract OCR")
+            if not preprocessed:
+                img = self.preprocess_image_array(img)
+            if tesserocr is not None:
+                return self.run_tesserocr(img)
+            custom_config = f'--oem 3 --psm 6 -c tessedit_char_whitelist={_TESSERACT_WHITELIST}'
+            data = pytesseract.image_to_data(
+                Image.fromarray(img), config=custom_config, output_type=pytesseract.Output.DICT
+            )
+            return self.parse_tesseract_result(data)
         
-        # EasyOCR
-        if self.easy_reader:
+        logger.warning(f"Unknown OCR engine: {engine}")
+        return []
+    
+    def run_engine_batch(self, engine, imgs, preprocessed=False):
+        """
+        Run one OCR engine on a batch of images.
+        
+        EasyOCR recognizes same-sized images in a single batched call, which
+        amortizes model launch overhead across PDF pages. Other engines, and
+        batches of mixed sizes, run image by image.
+        
+        Args:
+            engine: Engine name ('paddle', 'easy' or 'tesseract')
+            imgs: List of images as accepted by run_engine
+            preprocessed: Whether imgs are already preprocessed for Tesseract
+            
+        Returns:
+            List with the (text, confidence) lines of each image
+        """
+        if (
+            engine == 'easy' and len(imgs) > 1 and self.easy_reader
+            and all(img.shape == imgs[0].shape for img in imgs)
+        ):
+            logger.info(f"Running EasyOCR on a batch of {len(imgs)} images")
+            batch = self.easy_reader.readtext_batched(imgs, batch_size=len(imgs), **_EASYOCR_DETECTION_OPTIONS)
+            return [self.parse_easy_result(result) for result in batch]
+        
+        return [self.run_engine(engine, img, preprocessed) for img in imgs]
+    
+    @staticmethod
+    def _engine_future_result(engine, future, count):
+        """Get the per-image lines from a finished engine future, logging failures."""
+        try:
+            pages = future.result()
+            logger.info(f"{engine} extracted {sum(len(lines) for lines in pages)} lines")
+            return pages
+        except Exception as e:
+            logger.error(f"{engine} OCR failed: {e}")
+            return [[] for _ in range(count)]
+    
+    def _is_confident(self, engine, pages):
+        """Whether PaddleOCR read the images well enough to skip the other engines."""
+        lines = [line for page in pages for line in page]
+        if engine != 'paddle' or not lines:
+            return False
+        mean_confidence = sum(confidence for _, confidence in lines) / len(lines)
+        if mean_confidence > config.OCR_CONFIDENCE_THRESHOLD + 0.3:
+            logger.info(f"PaddleOCR confidence {mean_confidence:.2f}, skipping the remaining engines")
+            return True
+        return False
+    
+    def _ocr_image(self, img, preprocessed=None):
+        """
+        Run every configured OCR engine on an image and consolidate.
+        
+        Args:
+            img: Decoded image as numpy array
+            preprocessed: Preprocessed image for Tesseract; computed by the
+                Tesseract task itself when omitted
+            
+        Returns:
+            Extracted text as string
+        """
+        return self._ocr_images([img], None if preprocessed is None else [preprocessed])[0]
+    
+    def _ocr_images(self, imgs, preprocessed=None):
+        """
+        Run every configured OCR engine on a batch of images and consolidate.
+        
+        The engines accept numpy arrays directly, so no temporary file is written.
+        In parallel mode the engines run concurrently in the process pool,
+        otherwise they run concurrently on a thread pool. When PaddleOCR
+        finishes with high confidence the other engines' results are dropped.
+        
+        Args:
+            imgs: Decoded images as numpy arrays
+            preprocessed: Preprocessed images for Tesseract, or None to have
+                the Tesseract task compute them
+            
+        Returns:
+            Extracted text of each image
+        """
+        def engine_inputs(engine):
+            # Only Tesseract reads the preprocessed images
+            if engine == 'tesseract' and preprocessed is not None:
+                return preprocessed, True
+            return imgs, False
+        
+        if len(self.engines) == 1 and not self.parallel:
+            engine = self.engines[0]
             try:
-                logger.info("Running EasyOCR")
-                easy_result = self.easy_reader.readtext(preprocessed_path)
-                results['easy'] = self.parse_easy_result(easy_result)
-                logger.info(f"EasyOCR extracted {len(results['easy'])} characters")
+                pages = self.run_engine_batch(engine, *engine_inputs(engine))
+                logger.info(f"{engine} extracted {sum(len(lines) for lines in pages)} lines")
             except Exception as e:
-                logger.error(f"EasyOCR failed: {e}")
-                results['easy'] = ""
+                logger.error(f"{engine} OCR failed: {e}")
+                pages = [[] for _ in imgs]
+            results = {engine: pages}
         else:
-            results['easy'] = ""
+            if self.parallel:
+                def submit(engine):
+                    return _submit_to_pool(
+                        partial(_get_engine_pool, engine), _run_engine_in_worker, engine, *engine_inputs(engine)
+                    )
+            else:
+                # The engines spend their time in native code that releases the
+                # GIL, so threads overlap them within this process
+                def submit(engine):
+                    return _get_engine_threads().submit(self.run_engine_batch, engine, *engine_inputs(engine))
+            
+            futures = {submit(engine): engine for engine in self.engines}
+            retried = set()
+            results = {}
+            pending = set(futures)
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    engine = futures[future]
+                    if engine not in retried and _broke_pool(future):
+                        # Run the engine once more on a fresh pool
+                        retried.add(engine)
+                        retry = submit(engine)
+                        futures[retry] = engine
+                        pending.add(retry)
+                        continue
+                    results[engine] = self._engine_future_result(engine, future, len(imgs))
+                    if self._is_confident(engine, results[engine]):
+                        # Engines still running finish in the background and are ignored
+                        for other in pending:
+                            other.cancel()
+                        pending = ()
+                        results = {engine: results[engine]}
+                        break
+            
+            # Keep the configured engine order for consolidation
+            results = {engine: results[engine] for engine in self.engines if engine in results}
         
-        # Tesseract (with custom config)
-        try:
-            logger.info("Running Tesseract OCR")
-            custom_config = r'--oem 3 --psm 6 -c tessedit_char_whitelist=0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz@.-:,/() '
-            tess_result = pytesseract.image_to_string(Image.open(preprocessed_path), config=custom_config)
-            results['tesseract'] = tess_result
-            logger.info(f"Tesseract extracted {len(results['tesseract'])} characters")
-        except Exception as e:
-            logger.error(f"Tesseract failed: {e}")
-            results['tesseract'] = ""
+        # Consolidate results from all engines, image by image
+        texts = [
+            self.consolidate_ocr_results({engine: pages[i] for engine, pages in results.items()})
+            for i in range(len(imgs))
+        ]
+        logger.info(f"Consolidated text: {sum(len(text) for text in texts)} characters")
         
-        # Clean up temporary file
-        try:
-            os.remove(preprocessed_path)
-        except:
-            pass
+        return texts
+    
+    async def aextract_text_from_bytes(self, data, ext, use_cache=True):
+        """
+        Async variant of extract_text_from_bytes.
+        
+        Decoding runs in a thread, then the engines are awaited together on
+        the process pool so the wall time is that of the slowest engine rather
+        than the sum, or of PaddleOCR alone when it reads the page confidently.
+        
+        Args:
+            data: Raw file contents
+            ext: File extension including the dot
+            use_cache: Reuse text cached for identical contents; callers that
+                keep their own content cache pass False
+            
+        Returns:
+            Extracted text as string
+        """
+        if not self.parallel or ext.lower() == '.pdf':
+            return await asyncio.to_thread(self.extract_text_from_bytes, data, ext, use_cache)
+        
+        digest = None
+        if use_cache and config.ENABLE_CACHING:
+            digest = hashlib.blake2b(data, digest_size=32).hexdigest()
+            cached = await asyncio.to_thread(self._get_cached_text, digest)
+            if cached is not None:
+                logger.info("Reusing cached OCR text for identical file contents")
+                return cached
+        
+        def decode():
+            img = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), self._imread_flags)
+            if img is None:
+                raise ValueError("Could not decode uploaded image")
+            return img
+        
+        img = await asyncio.to_thread(decode)
+        
+        def submit(engine):
+            return asyncio.wrap_future(
+                _submit_to_pool(partial(_get_engine_pool, engine), _run_engine_in_worker, engine, [img])
+            )
+        
+        futures = {submit(engine): engine for engine in self.engines}
+        retried = set()
+        results = {}
+        pending = set(futures)
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for future in done:
+                engine = futures[future]
+                if engine not in retried and _broke_pool(future):
+                    # Run the engine once more on a fresh pool
+                    retried.add(engine)
+                    retry = submit(engine)
+                    futures[retry] = engine
+                    pending.add(retry)
+                    continue
+                results[engine] = self._engine_future_result(engine, future, 1)
+                if self._is_confident(engine, results[engine]):
+                    for other in pending:
+                        other.cancel()
+                    pending = ()
+                    results = {engine: results[engine]}
+                    break
+        
+        # Keep the configured engine order for consolidation
+        results = {engine: results[engine][0] for engine in self.engines if engine in results}
         
-        # Consolidate results from all engines
         consolidated = self.consolidate_ocr_results(results)
         logger.info(f"Consolidated text: {len(consolidated)} characters")
         
+        if digest is not None:
+            await asyncio.to_thread(self._set_cached_text, digest, consolidated)
+        
         return consolidated
     
+    def _extract_text_from_pdf_pages(self, page_count, render_pages):
+        """
+        Extract text from PDF pages with a three-stage thread pipeline.
+        
+        A rasterizer thread renders pages, a preprocessing thread prepares
+        Tesseract's input and the calling thread runs OCR, so the next pages
+        are rendered and preprocessed while the engines work on the current
+        ones. The OCR stage collects pages until OCR_BATCH_SIZE are waiting or
+        OCR_BATCH_TIMEOUT seconds pass and hands them to the engines as a batch.
+        
+        Without a GPU the engines are CPU bound and Tesseract is single
+        threaded, so multi-page PDFs are instead OCRed a page per core in a
+        process pool whose workers load the engines once at startup.
+        
+        Args:
+            page_count: Number of pages in the PDF
+            render_pages: Callable returning the PIL images of an inclusive
+                1-based page range
+            
+        Returns:
+            Extracted text with page separators
+        """
+        batch_size = max(config.OCR_BATCH_SIZE, 1)
+        raster_queue = queue.Queue(maxsize=2)
+        preproc_queue = queue.Queue(maxsize=batch_size)
+        errors = []
+        grayscale = self._imread_flags == cv2.IMREAD_GRAYSCALE
+        # Set when the OCR stage stops, so the other stages stop producing pages
+        cancelled = threading.Event()
+        
+        def rasterize():
+            try:
+                # Render a few pages per call so poppler can use several threads
+                for first in range(1, page_count + 1, _PDF_RENDER_BATCH):
+                    last = min(first + _PDF_RENDER_BATCH - 1, page_count)
+                    for page_no, image in enumerate(render_pages(first, last), start=first):
+                        if cancelled.is_set():
+                            return
+                        if grayscale:
+                            page = np.array(image.convert('L'))
+                        else:
+                            page = cv2.cvtColor(np.array(image.convert('RGB')), cv2.COLOR_RGB2BGR)
+                        raster_queue.put((page_no, page))
+            except Exception as e:
+                errors.append(e)
+            finally:
+                raster_queue.put(None)
+        
+        # Only Tesseract reads the preprocessed page
+        needs_preprocessing = 'tesseract' in self.engines
+        
+        def preprocess():
+            try:
+                while (item := raster_queue.get()) is not None and not cancelled.is_set():
+                    page_no, page = item
+                    preprocessed = self.preprocess_image_array(page) if needs_preprocessing else None
+                    preproc_queue.put((page_no, page, preprocessed))
+            finally:
+                preproc_queue.put(None)
+        
+        stages = [
+            threading.Thread(target=rasterize, name="pdf-rasterize", daemon=True),
+            threading.Thread(target=preprocess, name="pdf-preprocess", daemon=True),
+        ]
+        for stage in stages:
+            stage.start()
+        
+        try:
+            if not config.OCR_USE_GPU and _page_pool_size() > 1 and page_count > 1:
+                all_text = self._ocr_pages_in_pool(preproc_queue)
+            else:
+                all_text = self._ocr_page_batches(preproc_queue, batch_size, needs_preprocessing)
+        finally:
+            # If OCR failed the stages may be blocked on a full queue; drop the
+            # pages still queued until both have exited
+            cancelled.set()
+            while any(stage.is_alive() for stage in stages):
+                for stage_queue in (raster_queue, preproc_queue):
+                    with suppress(queue.Empty):
+                        while True:
+                            stage_queue.get_nowait()
+                for stage in stages:
+                    stage.join(timeout=0.05)
+        
+        if errors:
+            raise errors[0]
+        
+        return "\n\n".join(all_text)
+    
+    def _ocr_pages_in_pool(self, preproc_queue):
+        """
+        OCR queued PDF pages in parallel on the page process pool.
+        
+        At most two pages per worker are in flight, so a long PDF does not
+        pile up rendered pages in the pool's call queue.
+        
+        Returns:
+            Page texts with page headers, in page order
+        """
+        max_in_flight = _page_pool_size() * 2
+        in_flight = collections.deque()
+        all_text = []
+        
+        def submit(args):
+            return _submit_to_pool(_get_page_pool, _ocr_page_in_worker, *args)
+        
+        def collect_oldest():
+            page_no, args, future = in_flight.popleft()
+            try:
+                try:
+                    page_text = future.result()
+                except BrokenProcessPool:
+                    # A worker died; OCR the page once more on a fresh pool
+                    page_text = submit(args).result()
+            except Exception as e:
+                logger.error(f"OCR failed for page {page_no}: {e}")
+                page_text = ""
+            all_text.append(f"--- Page {page_no} ---\n{page_text}")
+        
+        while (item := preproc_queue.get()) is not None:
+            page_no, page, preprocessed = item
+            if len(in_flight) >= max_in_flight:
+                collect_oldest()
+            args = (self.engines, page, preprocessed)
+            in_flight.append((page_no, args, submit(args)))
+        while in_flight:
+            collect_oldest()
+        
+        return all_text
+    
+    def _ocr_page_batches(self, preproc_queue, batch_size, needs_preprocessing):
+        """
+        OCR queued PDF pages in batches on the engines.
+        
+        Returns:
+            Page texts with page headers, in page order
+        """
+        all_text = []
+        finished = False
+        while not finished and (item := preproc_queue.get()) is not None:
+            batch = [item]
+            deadline = time.monotonic() + config.OCR_BATCH_TIMEOUT
+            while len(batch) < batch_size:
+                try:
+                    item = preproc_queue.get(timeout=max(deadline - time.monotonic(), 0))
+                except queue.Empty:
+                    break
+                if item is None:
+                    finished = True
+                    break
+                batch.append(item)
+            
+            page_nos, pages, preprocessed = zip(*batch)
+            page_texts = self._ocr_images(list(pages), list(preprocessed) if needs_preprocessing else None)
+            all_text.extend(
+                f"--- Page {page_no} ---\n{page_text}" for page_no, page_text in zip(page_nos, page_texts)
+            )
+        
+        return all_text
+    
     def extract_text_from_pdf(self, pdf_path):
         """
         Extract text from a PDF file by converting to images and using OCR.
@@ -292,29 +1140,14 @@ class MultiOCRService:
         logger.info(f"Extracting text from PDF: {pdf_path}")
         
         try:
-            from pdf2image import convert_from_path
+            from pdf2image import convert_from_path, pdfinfo_from_path
             
-            # Convert PDF to images
-            images = convert_from_path(pdf_path)
-            
-            # Process each page
-            all_text = []
-            for i, image in enumerate(images):
-                # Save image temporarily
-                temp_image_path = f"{pdf_path}_page_{i+1}.jpg"
-                image.save(temp_image_path, 'JPEG')
-                
-                # Extract text using OCR
-                page_text = self.extract_text_multi_ocr(temp_image_path)
-                all_text.append(f"--- Page {i+1} ---\n{page_text}")
-                
-                # Clean up temporary image
-                try:
-                    os.remove(temp_image_path)
-                except:
-                    pass
-            
-            return "\n\n".join(all_text)
+            # Render, preprocess and OCR pages in memory, a few pages at a time
+            page_count = pdfinfo_from_path(pdf_path)["Pages"]
+            return self._extract_text_from_pdf_pages(
+                page_count,
+                lambda first, last: convert_from_path(pdf_path, first_page=first, last_page=last, **_PDF_RENDER_OPTIONS)
+            )
         
         except ImportError:
             logger.error("pdf2image not available. Cannot process PDF.")
@@ -331,6 +1164,14 @@ class MultiOCRService:
         _, ext = os.path.splitext(file_path)
         ext = ext.lower()
         
+        if config.ENABLE_CACHING:
+            with open(file_path, 'rb') as f:
+                data = f.read()
+            return self._cached_extract(data, lambda: self._process_document(file_path, ext))
+        return self._process_document(file_path, ext)
+    
+    def _process_document(self, file_path, ext):
+        """Uncached implementation of process_document."""
         if ext in ['.pdf']:
             return self.extract_text_from_pdf(file_path)
         elif ext in ['.jpg', '.jpeg', '.png', '.bmp', '.tiff', '.tif']:
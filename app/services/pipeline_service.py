@@ -0,0 +1,575 @@
+"""
+Invoice processing pipeline for the Invoice to Order Processing System.
+Runs OCR, LLM extraction, validation and Shiprocket order creation, either
+inline from the API or as a Dramatiq background job.
+"""
+import asyncio
+import errno
+import hashlib
+import logging
+import os
+import secrets
+import shutil
+import threading
+from collections import OrderedDict
+from functools import partial, lru_cache
+from pathlib import Path
+from typing import Optional, Dict, Any, Callable, Awaitable, List, Tuple
+
+from app.services.validation_service import InvoiceValidator
+from app.services.shiprocket_service import ShiprocketAPI
+from app.services.cache_service import result_cache
+from app.utils.file_io import open_for_write
+from app.core.config import config
+
+try:
+    import dramatiq
+    from dramatiq.brokers.redis import RedisBroker
+except ImportError:
+    dramatiq = None
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+# Services are created on first use so importing the API (and /health or /)
+# does not pull in OpenCV/OCR models or probe Ollama
+
+
+@lru_cache(maxsize=1)
+def get_ocr_service():
+    """Get the shared MultiOCRService, loading the OCR stack on first call"""
+    from app.services.ocr_service import MultiOCRService
+    return MultiOCRService()
+
+
+@lru_cache(maxsize=1)
+def get_llm_processor():
+    """Get the shared LLMInvoiceProcessor"""
+    from app.services.llm_service import LLMInvoiceProcessor
+    return LLMInvoiceProcessor(
+        model=config.OLLAMA_MODEL,
+        ollama_url=config.OLLAMA_HOST,
+        keep_alive=config.OLLAMA_KEEP_ALIVE
+    )
+
+
+@lru_cache(maxsize=1)
+def get_validator() -> InvoiceValidator:
+    """Get the shared InvoiceValidator"""
+    return InvoiceValidator()
+
+
+# Shared async HTTP client for Ollama, installed by the API at startup
+_http_client = None
+
+# Shiprocket clients keyed by (email, password hash), least recently used first
+_shiprocket_clients: "OrderedDict[Tuple[str, str], ShiprocketAPI]" = OrderedDict()
+SHIPROCKET_CLIENT_CACHE_SIZE = 128
+
+# The OCR service reports some failures (e.g. a PDF that cannot be rendered)
+# as text starting with this prefix instead of raising
+OCR_ERROR_PREFIX = "ERROR:"
+
+# Guards _shiprocket_clients, used from Dramatiq and asyncio.to_thread worker threads
+_shiprocket_clients_lock = threading.Lock()
+
+
+class InvoiceProcessingError(Exception):
+    """Raised when an invoice cannot be processed, with the HTTP status to report."""
+
+    def __init__(self, status_code: int, detail: str):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+
+
+def set_http_client(client) -> None:
+    """Use a shared httpx.AsyncClient for LLM calls instead of blocking requests in a thread"""
+    global _http_client
+    _http_client = client
+
+
+def get_shiprocket_api(email: str, password: str) -> ShiprocketAPI:
+    """
+    Get a ShiprocketAPI client for the given credentials.
+
+    Clients are reused per account so the auth token survives across
+    invoices instead of logging in again for every order.
+    """
+    key = (email, hashlib.sha256(password.encode()).hexdigest())
+    with _shiprocket_clients_lock:
+        client = _shiprocket_clients.get(key)
+        if client is None:
+            client = _shiprocket_clients[key] = ShiprocketAPI(email=email, password=password)
+            if len(_shiprocket_clients) > SHIPROCKET_CLIENT_CACHE_SIZE:
+                _shiprocket_clients.popitem(last=False)[1].close()
+        else:
+            _shiprocket_clients.move_to_end(key)
+        return client
+
+
+def issue_shiprocket_auth(email: str, password: str) -> str:
+    """
+    Log in to Shiprocket and store the token for a background job.
+
+    Only the returned opaque reference goes into the queue message, so the
+    password never reaches the broker. The reference is resolved once by
+    resolve_shiprocket_auth and expires with the result TTL.
+
+    Raises:
+        InvoiceProcessingError: If Shiprocket rejects the credentials
+    """
+    client = get_shiprocket_api(email, password)
+    try:
+        client.ensure_authenticated()
+    except Exception as e:
+        logger.error(f"Shiprocket authentication failed: {e}")
+        raise InvoiceProcessingError(401, "Shiprocket authentication failed")
+
+    ref = secrets.token_urlsafe(32)
+    result_cache.set_auth_sync(ref, {
+        "email": email,
+        "token": client.auth_token,
+        "expires_at": client.token_expires_at
+    })
+    return ref
+
+
+def resolve_shiprocket_auth(ref: str) -> Optional[ShiprocketAPI]:
+    """Client for a reference from issue_shiprocket_auth, or None if it expired"""
+    auth = result_cache.pop_auth_sync(ref)
+    if auth is None:
+        return None
+    return ShiprocketAPI.from_token(auth["email"], auth["token"], auth["expires_at"])
+
+
+def move_to_processed(src: Path, dst: Path) -> None:
+    """
+    Move an upload into the processed directory.
+
+    A rename on the same filesystem copies no bytes; across devices the
+    copy falls back to shutil.copyfile, which uses os.sendfile on Linux.
+    """
+    try:
+        os.replace(src, dst)
+    except OSError as e:
+        if e.errno != errno.EXDEV:
+            raise
+        shutil.copyfile(src, dst)
+        os.remove(src)
+
+
+class InvoiceJob:
+    """State of one invoice as it moves through the pipeline stages."""
+
+    def __init__(
+        self,
+        extract_text: Callable[[], str],
+        persist: Callable[[Path], Awaitable[None]],
+        file_extension: str,
+        file_id: str,
+        filename: str,
+        shiprocket_api: Optional[ShiprocketAPI] = None,
+        content_hash: Optional[str] = None
+    ):
+        """
+        Args:
+            extract_text: Blocking callable returning the OCR text of the invoice
+            persist: Coroutine function storing the invoice at the given processed path
+            file_extension: Extension of the upload, including the dot
+            file_id: Identifier assigned to the upload
+            filename: Original filename of the upload
+            shiprocket_api: Optional Shiprocket client the order is created with
+            content_hash: Digest of the upload bytes; when set, OCR and LLM output
+                is reused from (and stored in) the content cache
+        """
+        self.extract_text = extract_text
+        self.persist = persist
+        self.file_extension = file_extension
+        self.file_id = file_id
+        self.filename = filename
+        self.shiprocket_api = shiprocket_api
+        self.content_hash = content_hash
+        self.ocr_text: Optional[str] = None
+        self.extracted_data: Optional[Dict[str, Any]] = None
+        self.future: Optional[asyncio.Future] = None
+
+
+def _get_cached_content(digest: str) -> Dict[str, Any]:
+    """Cached OCR/extraction output for an upload; empty on a miss, a cache error or with caching disabled."""
+    if not config.ENABLE_CACHING:
+        return {}
+    try:
+        return result_cache.get_content_sync(digest) or {}
+    except Exception as e:
+        logger.warning(f"Content cache lookup failed: {e}")
+        return {}
+
+
+def _set_cached_content(digest: str, content: Dict[str, Any]) -> None:
+    """Cache OCR/extraction output for an upload; cache errors never fail the pipeline."""
+    if not config.ENABLE_CACHING:
+        return
+    try:
+        result_cache.set_content_sync(digest, content)
+    except Exception as e:
+        logger.warning(f"Content cache update failed: {e}")
+
+
+async def _ocr_stage(job: InvoiceJob) -> None:
+    """Step 1: fill in job.ocr_text, reusing cached output for identical uploads."""
+    if job.content_hash:
+        cached = await asyncio.to_thread(_get_cached_content, job.content_hash)
+        job.ocr_text = cached.get("ocr_text")
+        job.extracted_data = cached.get("extracted_data")
+
+    if job.ocr_text is not None:
+        logger.info("Reusing cached OCR text for identical upload")
+        return
+
+    # Step 1: OCR Processing
+    logger.info("Starting OCR processing...")
+
+    try:
+        job.ocr_text = await asyncio.to_thread(job.extract_text)
+        logger.info(f"OCR text extracted, length: {len(job.ocr_text)}")
+    except Exception as e:
+        logger.error(f"OCR processing failed: {e}")
+        raise InvoiceProcessingError(500, f"OCR processing failed: {str(e)}")
+
+    # Failed extractions must not reach the LLM or the content cache
+    if job.ocr_text.startswith(OCR_ERROR_PREFIX):
+        logger.error(f"OCR processing failed: {job.ocr_text}")
+        raise InvoiceProcessingError(
+            500, f"OCR processing failed: {job.ocr_text[len(OCR_ERROR_PREFIX):].strip()}"
+        )
+
+    if not job.ocr_text.strip():
+        raise InvoiceProcessingError(400, "No text could be extracted from the image")
+
+
+async def _llm_stage(job: InvoiceJob) -> None:
+    """Step 2: fill in job.extracted_data from the OCR text."""
+    if job.extracted_data is not None:
+        logger.info("Reusing cached extracted fields for identical upload")
+        return
+
+    # Step 2: LLM Field Extraction
+    logger.info("Extracting fields using LLM...")
+    try:
+        if _http_client is not None:
+            job.extracted_data = await get_llm_processor().aextract_and_refine(job.ocr_text, _http_client)
+        else:
+            job.extracted_data = await asyncio.to_thread(get_llm_processor().extract_and_refine, job.ocr_text)
+        logger.info(f"Fields extracted: {len(job.extracted_data)}")
+    except Exception as e:
+        logger.error(f"Field extraction failed: {e}")
+        raise InvoiceProcessingError(500, f"Field extraction failed: {str(e)}")
+
+    if job.content_hash:
+        await asyncio.to_thread(
+            _set_cached_content,
+            job.content_hash,
+            {"ocr_text": job.ocr_text, "extracted_data": job.extracted_data}
+        )
+
+
+async def _order_stage(job: InvoiceJob) -> Dict[str, Any]:
+    """Steps 3-4: validate, store the invoice and optionally create the order."""
+    extracted_data = job.extracted_data
+
+    # Step 3: Data Validation
+    logger.info("Validating extracted data...")
+    errors, warnings = get_validator().validate_invoice_data(extracted_data)
+
+    # Store the invoice in the processed directory
+    await job.persist(config.PROCESSED_DIR / f"{job.file_id}{job.file_extension}")
+
+    # Step 4: Create Shiprocket Order (if credentials provided)
+    order_response = None
+    if job.shiprocket_api is not None:
+        logger.info("Creating Shiprocket order...")
+        try:
+            order_response = await asyncio.to_thread(job.shiprocket_api.create_order_from_invoice, extracted_data)
+            logger.info(f"Shiprocket order created: {order_response}")
+        except Exception as e:
+            logger.error(f"Shiprocket order creation failed: {e}")
+            warnings.append(f"Order creation failed: {str(e)}")
+
+    return {
+        "status": "error" if errors else "success",
+        "file_id": job.file_id,
+        "filename": job.filename,
+        "extracted_data": extracted_data,
+        "validation_errors": errors,
+        "validation_warnings": warnings,
+        "shiprocket_order": order_response,
+        "ocr_text": job.ocr_text
+    }
+
+
+async def _run_pipeline(job: InvoiceJob) -> Dict[str, Any]:
+    """
+    Run the OCR -> LLM -> validation -> Shiprocket chain for one invoice.
+
+    Blocking OCR, LLM and HTTP calls run in worker threads so the event loop
+    stays free while an invoice is being processed.
+
+    Raises:
+        InvoiceProcessingError: If OCR or field extraction fails
+    """
+    await _ocr_stage(job)
+    await _llm_stage(job)
+    return await _order_stage(job)
+
+
+class InvoicePipeline:
+    """
+    Three-stage OCR -> LLM -> order pipeline connected by asyncio queues.
+
+    Each stage has its own worker tasks, so under load one invoice can be in
+    OCR while others are waiting on the LLM or on Shiprocket. The LLM stage
+    collects jobs until LLM_BATCH_SIZE are waiting or LLM_BATCH_TIMEOUT
+    seconds pass and sends the batch to Ollama concurrently.
+    """
+
+    def __init__(
+        self,
+        ocr_workers: int = config.PIPELINE_OCR_WORKERS,
+        order_workers: int = config.PIPELINE_ORDER_WORKERS,
+        batch_size: int = config.LLM_BATCH_SIZE,
+        batch_timeout: float = config.LLM_BATCH_TIMEOUT
+    ):
+        self.ocr_workers = ocr_workers
+        self.order_workers = order_workers
+        self.batch_size = batch_size
+        self.batch_timeout = batch_timeout
+        self._ocr_queue: Optional[asyncio.Queue] = None
+        self._llm_queue: Optional[asyncio.Queue] = None
+        self._order_queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+
+    @property
+    def running(self) -> bool:
+        return bool(self._tasks)
+
+    async def start(self) -> None:
+        """Create the stage queues and spawn the worker tasks."""
+        if self.running:
+            return
+        self._ocr_queue = asyncio.Queue()
+        self._llm_queue = asyncio.Queue()
+        self._order_queue = asyncio.Queue()
+        self._tasks = [asyncio.create_task(self._ocr_worker()) for _ in range(self.ocr_workers)]
+        self._tasks.append(asyncio.create_task(self._llm_worker()))
+        self._tasks += [asyncio.create_task(self._order_worker()) for _ in range(self.order_workers)]
+        logger.info(
+            f"Invoice pipeline started: {self.ocr_workers} OCR, 1 LLM (batch {self.batch_size}), "
+            f"{self.order_workers} order workers"
+        )
+
+    async def stop(self) -> None:
+        """Cancel the worker tasks."""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def submit(self, job: InvoiceJob) -> Dict[str, Any]:
+        """Queue a job and wait for its result."""
+        job.future = asyncio.get_running_loop().create_future()
+        await self._ocr_queue.put(job)
+        return await job.future
+
+    @staticmethod
+    def _fail(job: InvoiceJob, exc: BaseException) -> None:
+        if not job.future.done():
+            job.future.set_exception(exc)
+
+    async def _ocr_worker(self) -> None:
+        while True:
+            job = await self._ocr_queue.get()
+            try:
+                if job.future.done():
+                    continue
+                await _ocr_stage(job)
+                await self._llm_queue.put(job)
+            except Exception as e:
+                self._fail(job, e)
+            finally:
+                self._ocr_queue.task_done()
+
+    async def _collect_llm_batch(self) -> List[InvoiceJob]:
+        """Wait for one job, then gather more until the batch is full or times out."""
+        batch = [await self._llm_queue.get()]
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.batch_timeout
+        while len(batch) < self.batch_size:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._llm_queue.get(), timeout=remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _llm_worker(self) -> None:
+        while True:
+            batch = await self._collect_llm_batch()
+            live = [job for job in batch if not job.future.done()]
+            outcomes = await asyncio.gather(*(_llm_stage(job) for job in live), return_exceptions=True)
+            for job, outcome in zip(live, outcomes):
+                if isinstance(outcome, BaseException):
+                    self._fail(job, outcome)
+                else:
+                    await self._order_queue.put(job)
+            for _ in batch:
+                self._llm_queue.task_done()
+
+    async def _order_worker(self) -> None:
+        while True:
+            job = await self._order_queue.get()
+            try:
+                if job.future.done():
+                    continue
+                result = await _order_stage(job)
+                if not job.future.done():
+                    job.future.set_result(result)
+            except Exception as e:
+                self._fail(job, e)
+            finally:
+                self._order_queue.task_done()
+
+
+# Shared staged pipeline, started by the API when STAGED_PIPELINE is enabled
+invoice_pipeline = InvoicePipeline()
+
+
+async def process_invoice_file(
+    file_path: Path,
+    file_id: str,
+    filename: str,
+    shiprocket_api: Optional[ShiprocketAPI] = None,
+    content_hash: Optional[str] = None
+) -> Dict[str, Any]:
+    """
+    Process an invoice saved in UPLOAD_DIR.
+    On success the upload is moved from UPLOAD_DIR to PROCESSED_DIR.
+
+    Args:
+        file_path: Path to the uploaded invoice file
+        file_id: Identifier assigned to the upload
+        filename: Original filename of the upload
+        shiprocket_api: Optional Shiprocket client the order is created with
+        content_hash: Digest of the upload bytes, used for the content cache
+
+    Returns:
+        Processing result dictionary
+    """
+    file_path = Path(file_path)
+    file_extension = file_path.suffix.lower()
+
+    # Select processing method based on file type
+    if file_extension == '.pdf':
+        extract_text = partial(get_ocr_service().extract_text_from_pdf, str(file_path))
+    else:
+        extract_text = partial(get_ocr_service().extract_text_multi_ocr, str(file_path))
+
+    async def persist(processed_path: Path) -> None:
+        await asyncio.to_thread(move_to_processed, file_path, processed_path)
+
+    return await _run_pipeline(InvoiceJob(
+        extract_text, persist, file_extension, file_id, filename,
+        shiprocket_api, content_hash
+    ))
+
+
+async def process_invoice_bytes(
+    data: bytes,
+    file_extension: str,
+    file_id: str,
+    filename: str,
+    shiprocket_email: Optional[str] = None,
+    shiprocket_password: Optional[str] = None,
+    content_hash: Optional[str] = None
+) -> Dict[str, Any]:
+    """
+    Process an invoice held in memory.
+    The bytes are only written to PROCESSED_DIR once OCR and extraction succeed.
+    Runs through the staged pipeline when it has been started.
+
+    Args:
+        data: Raw contents of the uploaded invoice
+        file_extension: Extension of the upload, including the dot
+        file_id: Identifier assigned to the upload
+        filename: Original filename of the upload
+        shiprocket_email: Optional Shiprocket account email
+        shiprocket_password: Optional Shiprocket account password
+        content_hash: Digest of the upload bytes, used for the content cache
+
+    Returns:
+        Processing result dictionary
+    """
+    # With a content hash the pipeline's content cache covers OCR, so the
+    # OCR service does not hash and cache the same bytes a second time
+    extract_text = partial(
+        get_ocr_service().extract_text_from_bytes, data, file_extension, use_cache=content_hash is None
+    )
+    shiprocket_api = None
+    if shiprocket_email and shiprocket_password:
+        shiprocket_api = await asyncio.to_thread(get_shiprocket_api, shiprocket_email, shiprocket_password)
+
+    async def persist(processed_path: Path) -> None:
+        async with open_for_write(processed_path) as buffer:
+            await buffer.write(data)
+
+    job = InvoiceJob(
+        extract_text, persist, file_extension, file_id, filename,
+        shiprocket_api, content_hash
+    )
+    if invoice_pipeline.running:
+        return await invoice_pipeline.submit(job)
+    return await _run_pipeline(job)
+
+
+if dramatiq is not None:
+    dramatiq.set_broker(RedisBroker(url=config.REDIS_URL))
+
+    @dramatiq.actor(max_retries=0)
+    def process_invoice_job(
+        file_path: str,
+        file_id: str,
+        filename: str,
+        shiprocket_auth: Optional[str] = None,
+        content_hash: Optional[str] = None
+    ):
+        """
+        Background job that processes an uploaded invoice and stores the result.
+
+        shiprocket_auth is a reference from issue_shiprocket_auth, never the
+        credentials themselves.
+        """
+        try:
+            shiprocket_api = None
+            if shiprocket_auth:
+                shiprocket_api = resolve_shiprocket_auth(shiprocket_auth)
+            result = asyncio.run(process_invoice_file(
+                file_path, file_id, filename, shiprocket_api, content_hash
+            ))
+            if shiprocket_auth and shiprocket_api is None:
+                result["validation_warnings"].append(
+                    "Order creation failed: Shiprocket login expired before the job ran"
+                )
+        except InvoiceProcessingError as e:
+            result = {"status": "error", "file_id": file_id, "filename": filename, "error": e.detail}
+        except Exception as e:
+            logger.error(f"Processing job {file_id} failed: {e}")
+            result = {"status": "error", "file_id": file_id, "filename": filename, "error": str(e)}
+        finally:
+            if os.path.exists(file_path):
+                os.remove(file_path)
+
+        result_cache.set_sync(file_id, result)
+else:
+    process_invoice_job = None
@@ -1,25 +1,477 @@
+import asyncio
+import atexit
+import httpx
+import numpy as np
+import orjson
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import json
 import logging
-from typing import Dict, Any, Optional
+import base64
+import hashlib
+import hmac
+import os
+import threading
+import time
+from functools import lru_cache
+from itertools import islice
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Any, List, Optional, Tuple
 from datetime import datetime
 
-class ShiprocketAPI:
-    """Integration with Shiprocket API for order creation"""
+try:
+    import fcntl
+except ImportError:  # not available on Windows; the token cache then works unlocked
+    fcntl = None
+
+try:
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
+except ImportError:  # httpx only speaks HTTP/2 with the h2 package installed
+    HTTP2_AVAILABLE = False
+
+# Logging is configured by the application, not by this module
+logger = logging.getLogger(__name__)
+logger.addHandler(logging.NullHandler())
+
+# Shiprocket tokens are valid for 240 hours; used when the token carries no exp claim
+TOKEN_LIFETIME_SECONDS = 240 * 3600
+
+# Refresh the token this long before it actually expires
+TOKEN_EXPIRY_MARGIN_SECONDS = 60
+
+# Directory holding one cached bearer token per account, so short-lived
+# processes reuse a valid token instead of logging in again
+TOKEN_CACHE_DIR = Path(os.environ.get("SHIPROCKET_TOKEN_CACHE_DIR", Path.home() / ".cache" / "shiprocket"))
+
+# PBKDF2 rounds for the salted password digest stored next to a cached
+# token; a cached token is only used by a client holding the same password
+TOKEN_CACHE_KDF_ITERATIONS = 100_000
+
+# Most orders Shiprocket accepts in one bulk-create request
+BULK_ORDER_LIMIT = 100
+
+# Connections kept open to Shiprocket, shared by all synchronous clients
+HTTP_POOL_MAXSIZE = 32
+
+# Transient server errors are retried with exponential backoff. Only
+# idempotent methods (urllib3's default set, which excludes POST) are
+# retried, so an order that reached Shiprocket is never created twice
+SHIPROCKET_RETRY = Retry(total=3, backoff_factor=0.5, status_forcelist=(500, 502, 503, 504))
+
+# Item counts below this are summed in plain Python; numpy setup costs more
+WEIGHT_VECTORIZE_MIN_ITEMS = 64
+
+# Address fields present on both the billing and shipping side of an order
+_ADDRESS_FIELDS = ('customer_name', 'address', 'city', 'state', 'pincode', 'email', 'phone')
+
+# (payload key, invoice key, default) for the billing address
+_BILLING_FIELDS = tuple((f'billing_{name}', f'billing_{name}', '') for name in _ADDRESS_FIELDS)
+
+# (payload key, invoice key, payload key to fall back to) for the shipping address
+_SHIPPING_FIELDS = tuple((f'shipping_{name}', f'shipping_{name}', f'billing_{name}') for name in _ADDRESS_FIELDS)
+
+# Order payload fields that do not depend on the invoice
+_STATIC_ORDER_FIELDS = {
+    "channel_id": "",
+    "billing_country": "India",
+    "billing_isd_code": "+91",
+    "shipping_country": "India",
+    "total_discount": 0,
+    "shipping_charges": 0,
+    "giftwrap_charges": 0,
+    "transaction_charges": 0,
+    "length": 10,  # Default package dimensions
+    "breadth": 10,
+    "height": 10,
+    "pickup_location": "Primary",  # Should be configured based on requirements
+    "is_order_revamp": 1,
+    "is_document": 0,
+    "is_web": 1,
+    "is_send_notification": True,
+    "is_insurance_opt": 0,
+    "currency": "INR"
+}
+
+# Shiprocket order item with the fields format_order_items does not vary
+_ORDER_ITEM_TEMPLATE = {
+    "name": None,
+    "selling_price": None,
+    "units": 1,
+    "sku": None,
+    "hsn": "",
+    "weight": 0.5,
+    "category_name": None,
+    "tax": None,
+    "discount": None,
+    "product_description": None
+}
+
+# Placeholder item sent when no items were found in the invoice
+_DEFAULT_ORDER_ITEM = {
+    **_ORDER_ITEM_TEMPLATE,
+    "name": "Default Item",
+    "selling_price": "100",
+    "sku": "DEFAULT001",
+    "product_description": "Default product when no items found in invoice"
+}
+
+# The LLM usually returns JSON numbers and plain digit strings; exact type
+# checks return those without entering the try/except path
+
+def _safe_float(value, default):
+    """float(value), or default when value is not numeric"""
+    cls = type(value)
+    if cls is float:
+        return value
+    if cls is int:
+        return float(value)
+    try:
+        return float(value)
+    except (ValueError, TypeError):
+        return default
+
+def _safe_int(value, default):
+    """int(value), or default when value is not an integer"""
+    cls = type(value)
+    if cls is int:
+        return value
+    if cls is str and value.isdecimal():
+        return int(value)
+    try:
+        return int(value)
+    except (ValueError, TypeError):
+        return default
+
+# Distinct order items remembered by _build_order_item; catalogs are small
+# and the same SKUs recur across many invoices
+ORDER_ITEM_CACHE_SIZE = 4096
+
+@lru_cache(maxsize=ORDER_ITEM_CACHE_SIZE, typed=True)
+def _build_order_item(name, selling_price, units, sku, hsn, weight, tax) -> Dict[str, Any]:
+    """Shiprocket order item for the given invoice item fields; callers must copy the result"""
+    units = _safe_int(units, 1)
+    formatted_item = _ORDER_ITEM_TEMPLATE.copy()
+    formatted_item["name"] = name
+    formatted_item["selling_price"] = str(_safe_float(selling_price, 0))
+    formatted_item["units"] = units if units > 0 else 1
+    formatted_item["sku"] = sku
+    formatted_item["hsn"] = hsn
+    formatted_item["weight"] = weight
+    formatted_item["tax"] = tax
+    return formatted_item
+
+def _weight_and_units(item: Dict[str, Any]) -> Tuple[float, int]:
+    """Per-unit weight and unit count of an item; unparseable items count as one 0.5 kg unit"""
+    weight = _safe_float(item.get('weight', 0.5), None)
+    units = _safe_int(item.get('units', 1), None)
+    if weight is None or units is None:
+        return 0.5, 1
+    return weight, units
+
+class ShiprocketClientBase:
+    """Payload building and token handling shared by the Shiprocket clients"""
     
-    def __init__(self, email: str, password: str):
-        """Initialize with Shiprocket credentials"""
+    def __init__(self, email: str, password: str, auth_headers):
+        """
+        Initialize with Shiprocket credentials
+        
+        Args:
+            email: Shiprocket account email
+            password: Shiprocket account password
+            auth_headers: Mutable headers sent with this client's requests,
+                where the bearer token is installed
+        """
         self.base_url = "https://apiv2.shiprocket.in/v1"
         self.email = email
         self.password = password
         self.auth_token = None
+        self.token_expires_at = 0.0
+        self._auth_headers = auth_headers
+        
+        self.logger = logger
+    
+    @classmethod
+    def from_token(cls, email: str, token: str, expires_at: float):
+        """
+        Client using a token obtained by another process, without the password
+        
+        The client cannot log in again, so requests fail once the token expires.
+        """
+        client = cls(email, "")
+        client._set_token(token, expires_at)
+        return client
+    
+    def _set_token(self, token: Optional[str], expires_at: float) -> None:
+        """Use a bearer token for all subsequent requests"""
+        self.auth_token = token
+        self.token_expires_at = expires_at
+        self._auth_headers["Authorization"] = f"Bearer {token}"
+    
+    @property
+    def _token_cache_path(self) -> Path:
+        """Token cache file for this account, named by a hash of the email"""
+        return TOKEN_CACHE_DIR / f"token_{hashlib.sha256(self.email.encode()).hexdigest()[:16]}.json"
+    
+    def _password_digest(self, salt: bytes) -> str:
+        """Salted PBKDF2 digest of the password, stored with the cached token"""
+        return hashlib.pbkdf2_hmac(
+            "sha256", self.password.encode(), salt, TOKEN_CACHE_KDF_ITERATIONS
+        ).hex()
+    
+    @contextmanager
+    def _token_cache_lock(self, exclusive: bool):
+        """Hold a lock on the token cache across concurrent worker processes"""
+        if fcntl is None:
+            yield
+            return
+        with open(self._token_cache_path.with_suffix(".lock"), "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+    
+    def _load_cached_token(self) -> None:
+        """Adopt the cached token for this account if it is still valid"""
+        if not self.password or not self._token_cache_path.exists():
+            return
+        try:
+            with self._token_cache_lock(exclusive=False):
+                cached = json.loads(self._token_cache_path.read_text())
+        except (OSError, ValueError):
+            return
+        
+        expires_at = float(cached.get("expires_at", 0))
+        if cached.get("email") != self.email or time.time() >= expires_at - TOKEN_EXPIRY_MARGIN_SECONDS:
+            return
+        
+        # The file is keyed by email only, so a token is only trusted by a
+        # client holding the password it was issued for
+        try:
+            matches = hmac.compare_digest(
+                self._password_digest(bytes.fromhex(cached["salt"])),
+                cached["password_hash"]
+            )
+        except (KeyError, TypeError, ValueError):
+            return
+        if not matches:
+            self.logger.info("Ignoring cached Shiprocket token issued for a different password")
+            return
+        
+        self._set_token(cached.get("token"), expires_at)
+        self.logger.info("Using cached Shiprocket token")
+    
+    def _save_cached_token(self) -> None:
+        """Write the current token to the cache, readable only by this user"""
+        path = self._token_cache_path
+        temp_path = path.with_suffix(f".{os.getpid()}.tmp")
+        salt = os.urandom(16)
+        data = json.dumps({
+            "token": self.auth_token,
+            "expires_at": self.token_expires_at,
+            "email": self.email,
+            "salt": salt.hex(),
+            "password_hash": self._password_digest(salt)
+        })
+        try:
+            TOKEN_CACHE_DIR.mkdir(mode=0o700, parents=True, exist_ok=True)
+            with self._token_cache_lock(exclusive=True):
+                fd = os.open(temp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+                with os.fdopen(fd, "w") as f:
+                    f.write(data)
+                os.replace(temp_path, path)
+        except OSError as e:
+            self.logger.warning("Failed to cache Shiprocket token: %s", e)
+    
+    def _clear_cached_token(self) -> None:
+        """Drop the cached token after Shiprocket rejected it"""
+        try:
+            with self._token_cache_lock(exclusive=True):
+                self._token_cache_path.unlink(missing_ok=True)
+        except OSError as e:
+            self.logger.warning("Failed to clear cached Shiprocket token: %s", e)
+    
+    @staticmethod
+    def _token_expiry(token: Optional[str]) -> float:
+        """Read the expiry time from the token's JWT exp claim"""
+        try:
+            payload = token.split('.')[1]
+            payload += '=' * (-len(payload) % 4)
+            return float(json.loads(base64.urlsafe_b64decode(payload))['exp'])
+        except Exception:
+            return time.time() + TOKEN_LIFETIME_SECONDS
+    
+    def _token_is_fresh(self) -> bool:
+        """Whether the current token is valid for at least TOKEN_EXPIRY_MARGIN_SECONDS more"""
+        return bool(self.auth_token) and time.time() < self.token_expires_at - TOKEN_EXPIRY_MARGIN_SECONDS
+    
+    def build_order_payload(self, invoice_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Build the Shiprocket adhoc order payload for extracted invoice data"""
+        get = invoice_data.get
+        
+        # Generate order ID if not provided
+        order_id = get('invoice_number')
+        if not order_id:
+            order_id = f"INV-{datetime.now().strftime('%Y%m%d%H%M%S')}"
+            
+        # Get order date or use current date
+        order_date = get('order_date')
+        if not order_date:
+            order_date = datetime.now().strftime('%Y-%m-%d')
+            
+        # Only dict items are usable; filter once for both item helpers
+        items = [item for item in get('order_items') or [] if isinstance(item, dict)]
+        
+        # Start from the fields that are the same for every order, so only
+        # the invoice-specific fields are set one by one
+        order_payload = _STATIC_ORDER_FIELDS.copy()
+        order_payload["order_id"] = order_id
+        order_payload["order_date"] = order_date
+        
+        # Billing Information
+        for key, invoice_key, default in _BILLING_FIELDS:
+            order_payload[key] = get(invoice_key, default)
+        
+        # Shipping Information, falling back to billing field by field
+        for key, invoice_key, fallback_key in _SHIPPING_FIELDS:
+            order_payload[key] = get(invoice_key) or order_payload[fallback_key]
+        
+        # The order ships to the billing address when the identifying fields
+        # match (trivially so after a fallback, since the same objects are compared)
+        order_payload["shipping_is_billing"] = int(
+            order_payload["shipping_address"] == order_payload["billing_address"] and
+            order_payload["shipping_pincode"] == order_payload["billing_pincode"] and
+            order_payload["shipping_customer_name"] == order_payload["billing_customer_name"]
+        )
         
-        # Configure logging
-        logging.basicConfig(level=logging.INFO)
-        self.logger = logging.getLogger(__name__)
+        # Order Items, Payment and Totals, Package Details (estimated)
+        order_payload["order_items"] = self.format_order_items(items)
+        order_payload["payment_method"] = get('payment_method', 'prepaid').lower()
+        order_payload["sub_total"] = get('sub_total', 0)
+        order_payload["weight"] = self.calculate_total_weight(items)
+        order_payload["customer_gstin"] = get('billing_gstin', '')
+        
+        return order_payload
+    
+    def format_order_items(self, items: list) -> list:
+        """Format order items for Shiprocket API; items must all be dicts"""
+        formatted_items = []
+        
+        if not items:
+            # Add a default item if none provided
+            return [_DEFAULT_ORDER_ITEM.copy()]
+        
+        for item in items:
+            # Ensure required fields
+            name = item.get('name', 'Product')
+            if not name:
+                name = "Unnamed Product"
+                
+            fields = (
+                name,
+                item.get('selling_price', 0),
+                item.get('units', 1),
+                item.get('sku', name.replace(' ', '_')[:15]),
+                item.get('hsn', ''),
+                item.get('weight', 0.5),
+                item.get('tax_rate', None)
+            )
+            
+            try:
+                formatted_item = _build_order_item(*fields)
+            except TypeError:
+                # Unhashable values from the LLM (lists, dicts) bypass the cache
+                formatted_item = _build_order_item.__wrapped__(*fields)
+            
+            # Copy so callers never mutate a cached item
+            formatted_items.append(formatted_item.copy())
+        
+        return formatted_items
+    
+    def calculate_total_weight(self, items: list) -> float:
+        """Calculate total weight of all items; items must all be dicts"""
+        pairs = [_weight_and_units(item) for item in items]
+        
+        if len(pairs) < WEIGHT_VECTORIZE_MIN_ITEMS:
+            total_weight = sum(weight * units for weight, units in pairs)
+        else:
+            # Large B2B invoices: one dot product instead of a Python sum
+            weights, units = zip(*pairs)
+            total_weight = float(np.dot(
+                np.fromiter(weights, dtype=np.float64, count=len(pairs)),
+                np.fromiter(units, dtype=np.float64, count=len(pairs))
+            ))
+        
+        # Ensure minimum weight
+        return max(total_weight, 0.5)
+
+class ShiprocketAPI(ShiprocketClientBase):
+    """Integration with Shiprocket API for order creation"""
+    
+    # Keep-alive sessions shared by every client talking to the same host;
+    # only the connection pool is shared, tokens stay per client
+    _sessions: Dict[str, requests.Session] = {}
+    _sessions_lock = threading.Lock()
+    
+    def __init__(self, email: str, password: str):
+        """Initialize with Shiprocket credentials"""
+        # Sent with every request; holds this account's bearer token
+        self.headers = {"Content-Type": "application/json"}
+        super().__init__(email, password, self.headers)
+        self.session = self._get_session(self.base_url)
+        
+        # Reuse a token cached by an earlier process for this account
+        self._load_cached_token()
+        
+        # Threads that hit an expired token log in only once
+        self._auth_lock = threading.Lock()
+    
+    @classmethod
+    def _get_session(cls, base_url: str) -> requests.Session:
+        """Pooled session for base_url, created on first use"""
+        with cls._sessions_lock:
+            session = cls._sessions.get(base_url)
+            if session is None:
+                session = cls._sessions[base_url] = requests.Session()
+                session.mount("https://", HTTPAdapter(
+                    pool_connections=1,
+                    pool_maxsize=HTTP_POOL_MAXSIZE,
+                    max_retries=SHIPROCKET_RETRY
+                ))
+            return session
+    
+    @classmethod
+    def close_sessions(cls) -> None:
+        """Close the shared connection pools"""
+        with cls._sessions_lock:
+            for session in cls._sessions.values():
+                session.close()
+            cls._sessions.clear()
+    
+    def close(self) -> None:
+        """
+        Release this client
+        
+        The connection pool is shared with other clients and is closed at
+        interpreter exit by close_sessions.
+        """
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
     
     def authenticate(self) -> bool:
         """Authenticate with Shiprocket API and get token"""
+        if not self.password:
+            # Clients built with from_token have no password to log in with
+            self.logger.error("Cannot authenticate with Shiprocket: client has no password")
+            return False
+        
         self.logger.info("Authenticating with Shiprocket API")
         
         url = f"{self.base_url}/auth/login"
@@ -27,264 +479,326 @@ class ShiprocketAPI:
             "email": self.email,
             "password": self.password
         }
-        headers = {
-            "Content-Type": "application/json"
-        }
         
         try:
-            response = requests.post(url, json=payload, headers=headers)
+            response = self.session.post(url, data=orjson.dumps(payload), headers=self.headers)
             
             if response.status_code == 200:
                 data = response.json()
-                self.auth_token = data.get('token')
+                self._set_token(data.get('token'), self._token_expiry(data.get('token')))
+                self._save_cached_token()
                 self.logger.info("Authentication successful")
                 return True
             else:
-                self.logger.error(f"Authentication failed: {response.status_code} - {response.text}")
+                self.logger.error("Authentication failed: %s - %s", response.status_code, response.text)
                 return False
                 
         except Exception as e:
-            self.logger.error(f"Authentication error: {str(e)}")
+            self.logger.error("Authentication error: %s", e)
             return False
     
-    def create_order_from_invoice(self, invoice_data: Dict[str, Any]) -> Dict[str, Any]:
-        """Create Shiprocket order from invoice data"""
-        self.logger.info("Creating Shiprocket order from invoice data")
-        
-        # Ensure we have an auth token
-        if not self.auth_token:
+    def ensure_authenticated(self) -> None:
+        """Authenticate unless the cached token is still valid"""
+        if self._token_is_fresh():
+            return
+        with self._auth_lock:
+            if self._token_is_fresh():
+                return
             if not self.authenticate():
                 raise Exception("Failed to authenticate with Shiprocket")
+    
+    def _request_with_auth(self, method: str, path: str, **kwargs) -> requests.Response:
+        """
+        Send an authenticated request, logging in again once if the token is rejected
         
-        # Generate order ID if not provided
-        order_id = invoice_data.get('invoice_number')
-        if not order_id:
-            order_id = f"INV-{datetime.now().strftime('%Y%m%d%H%M%S')}"
-            
-        # Get order date or use current date
-        order_date = invoice_data.get('order_date')
-        if not order_date:
-            order_date = datetime.now().strftime('%Y-%m-%d')
-            
-        # Prepare order payload
-        order_payload = {
-            "order_id": order_id,
-            "order_date": order_date,
-            "channel_id": "",
-            
-            # Billing Information
-            "billing_customer_name": invoice_data.get('billing_customer_name', ''),
-            "billing_address": invoice_data.get('billing_address', ''),
-            "billing_city": invoice_data.get('billing_city', ''),
-            "billing_state": invoice_data.get('billing_state', ''),
-            "billing_country": "India",
-            "billing_pincode": invoice_data.get('billing_pincode', ''),
-            "billing_email": invoice_data.get('billing_email', ''),
-            "billing_phone": invoice_data.get('billing_phone', ''),
-            "billing_isd_code": "+91",
-            
-            # Shipping Information (default to billing if not provided)
-            "shipping_is_billing": 0,  # Default to separate shipping address
-            "shipping_customer_name": invoice_data.get('shipping_customer_name') or invoice_data.get('billing_customer_name', ''),
-            "shipping_address": invoice_data.get('shipping_address') or invoice_data.get('billing_address', ''),
-            "shipping_city": invoice_data.get('shipping_city') or invoice_data.get('billing_city', ''),
-            "shipping_state": invoice_data.get('shipping_state') or invoice_data.get('billing_state', ''),
-            "shipping_country": "India",
-            "shipping_pincode": invoice_data.get('shipping_pincode') or invoice_data.get('billing_pincode', ''),
-            "shipping_email": invoice_data.get('shipping_email') or invoice_data.get('billing_email', ''),
-            "shipping_phone": invoice_data.get('shipping_phone') or invoice_data.get('billing_phone', ''),
-            
-            # Order Items
-            "order_items": self.format_order_items(invoice_data.get('order_items', [])),
-            
-            # Payment and Totals
-            "payment_method": invoice_data.get('payment_method', 'prepaid').lower(),
-            "sub_total": invoice_data.get('sub_total', 0),
-            "total_discount": 0,
-            "shipping_charges": 0,
-            "giftwrap_charges": 0,
-            "transaction_charges": 0,
-            
-            # Package Details (estimated)
-            "weight": self.calculate_total_weight(invoice_data.get('order_items', [])),
-            "length": 10,  # Default values
-            "breadth": 10,
-            "height": 10,
-            
-            # Additional Fields
-            "pickup_location": "Primary",  # Should be configured based on requirements
-            "customer_gstin": invoice_data.get('billing_gstin', ''),
-            "is_order_revamp": 1,
-            "is_document": 0,
-            "is_web": 1,
-            "is_send_notification": True,
-            "is_insurance_opt": 0,
-            "currency": "INR"
-        }
+        Transient gateway errors on idempotent requests are already retried
+        by the session's urllib3 Retry.
+        """
+        self.ensure_authenticated()
+        url = f"{self.base_url}{path}"
         
-        # Check if shipping is same as billing
-        if (order_payload["shipping_address"] == order_payload["billing_address"] and
-            order_payload["shipping_pincode"] == order_payload["billing_pincode"] and
-            order_payload["shipping_customer_name"] == order_payload["billing_customer_name"]):
-            order_payload["shipping_is_billing"] = 1
+        token = self.auth_token
+        response = self.session.request(method, url, headers=self.headers, **kwargs)
+        if response.status_code == 401 and self._reauthenticate(token):
+            response = self.session.request(method, url, headers=self.headers, **kwargs)
+        return response
+    
+    def _reauthenticate(self, rejected_token: Optional[str]) -> bool:
+        """Replace a token Shiprocket rejected, unless another thread already did"""
+        with self._auth_lock:
+            if self.auth_token != rejected_token:
+                return True
+            if not self.password:
+                # Leave the cached token alone; other clients may still be using it
+                self.logger.error("Shiprocket rejected the token and the client has no password to log in again")
+                return False
+            self.logger.warning("Authentication token expired, re-authenticating")
+            self._clear_cached_token()
+            return self.authenticate()
+    
+    def create_order_from_invoice(self, invoice_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Create Shiprocket order from invoice data"""
+        self.logger.info("Creating Shiprocket order from invoice data")
         
-        # Create order via API
-        url = f"{self.base_url}/orders/create/adhoc"
-        headers = {
-            "Authorization": f"Bearer {self.auth_token}",
-            "Content-Type": "application/json"
-        }
+        # Ensure we have a valid auth token
+        self.ensure_authenticated()
+        
+        order_payload = self.build_order_payload(invoice_data)
         
-        self.logger.info(f"Sending order request: {json.dumps(order_payload, indent=2)}")
+        body = orjson.dumps(order_payload)
+        if self.logger.isEnabledFor(logging.DEBUG):
+            self.logger.debug("Sending order request: %s", body.decode())
         
         try:
-            response = requests.post(url, json=order_payload, headers=headers)
+            # Create order via API
+            response = self._request_with_auth("POST", "/orders/create/adhoc", data=body)
             
             if response.status_code in [200, 201]:
                 result = response.json()
-                self.logger.info(f"Order created successfully: {result.get('order_id')}")
+                self.logger.info("Order created successfully: %s", result.get('order_id'))
                 return result
-            else:
-                # Check if token expired
-                if response.status_code == 401:
-                    self.logger.warning("Authentication token expired, re-authenticating")
-                    if self.authenticate():
-                        # Retry with new token
-                        headers["Authorization"] = f"Bearer {self.auth_token}"
-                        response = requests.post(url, json=order_payload, headers=headers)
-                        
-                        if response.status_code in [200, 201]:
-                            result = response.json()
-                            self.logger.info(f"Order created successfully after re-auth: {result.get('order_id')}")
-                            return result
-                
-                error_msg = f"Order creation failed: {response.status_code} - {response.text}"
-                self.logger.error(error_msg)
-                return {"error": error_msg, "status": "failed"}
+            
+            error_msg = f"Order creation failed: {response.status_code} - {response.text}"
+            self.logger.error(error_msg)
+            return {"error": error_msg, "status": "failed"}
                 
         except Exception as e:
             error_msg = f"Error creating order: {str(e)}"
             self.logger.error(error_msg)
             return {"error": error_msg, "status": "failed"}
     
-    def format_order_items(self, items: list) -> list:
-        """Format order items for Shiprocket API"""
-        formatted_items = []
+    def create_orders_bulk(self, invoices: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Create orders for many invoices with one bulk request per BULK_ORDER_LIMIT orders
         
-        if not items:
-            # Add a default item if none provided
-            return [{
-                "name": "Default Item",
-                "selling_price": "100",
-                "units": 1,
-                "sku": "DEFAULT001",
-                "hsn": "",
-                "weight": 0.5,
-                "category_name": None,
-                "tax": None,
-                "discount": None,
-                "product_description": "Default product when no items found in invoice"
-            }]
+        Returns one result per invoice, in input order; orders in a batch
+        that failed carry an "error" entry like create_order_from_invoice.
+        """
+        self.logger.info("Creating %s Shiprocket orders in bulk", len(invoices))
         
-        for item in items:
-            if not isinstance(item, dict):
-                continue
-                
-            # Ensure required fields
-            name = item.get('name', 'Product')
-            if not name:
-                name = "Unnamed Product"
-                
-            try:
-                selling_price = float(item.get('selling_price', 0))
-            except (ValueError, TypeError):
-                selling_price = 0
-                
-            try:
-                units = int(item.get('units', 1))
-                if units <= 0:
-                    units = 1
-            except (ValueError, TypeError):
-                units = 1
+        # Ensure we have a valid auth token
+        self.ensure_authenticated()
+        
+        results = []
+        invoice_iter = iter(invoices)
+        while batch := list(islice(invoice_iter, BULK_ORDER_LIMIT)):
+            payload = {"orders": [self.build_order_payload(invoice) for invoice in batch]}
+            results.extend(self._post_bulk_batch(payload))
+        return results
+    
+    def _post_bulk_batch(self, payload: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Send one bulk-create request and split its response into per-order results"""
+        count = len(payload["orders"])
+        try:
+            response = self._request_with_auth("POST", "/orders/create/bulk", data=orjson.dumps(payload))
             
-            # Create formatted item
-            formatted_item = {
-                "name": name,
-                "selling_price": str(selling_price),
-                "units": units,
-                "sku": item.get('sku', name.replace(' ', '_')[:15]),
-                "hsn": item.get('hsn', ''),
-                "weight": item.get('weight', 0.5),
-                "category_name": None,
-                "tax": item.get('tax_rate', None),
-                "discount": None,
-                "product_description": None
-            }
+            if response.status_code in [200, 201]:
+                return self._split_bulk_response(response.json(), count)
             
-            formatted_items.append(formatted_item)
+            error_msg = f"Bulk order creation failed: {response.status_code} - {response.text}"
+        except Exception as e:
+            error_msg = f"Error creating orders in bulk: {str(e)}"
         
-        return formatted_items
+        self.logger.error(error_msg)
+        return [{"error": error_msg, "status": "failed"} for _ in range(count)]
     
-    def calculate_total_weight(self, items: list) -> float:
-        """Calculate total weight of all items"""
-        total_weight = 0
-        
-        for item in items:
-            if not isinstance(item, dict):
-                continue
-                
-            try:
-                weight = float(item.get('weight', 0.5))
-                units = int(item.get('units', 1))
-                total_weight += weight * units
-            except (ValueError, TypeError):
-                # Default weight for invalid items
-                total_weight += 0.5
+    def _split_bulk_response(self, data: Any, count: int) -> List[Dict[str, Any]]:
+        """Map a bulk-create response back to the submitted orders by index"""
+        orders = data.get("orders", data.get("data")) if isinstance(data, dict) else data
+        if not isinstance(orders, list) or len(orders) != count:
+            error_msg = f"Unexpected bulk order response for {count} orders: {data}"
+            self.logger.error(error_msg)
+            return [{"error": error_msg, "status": "failed"} for _ in range(count)]
         
-        # Ensure minimum weight
-        return max(total_weight, 0.5)
+        results = []
+        for order in orders:
+            if isinstance(order, dict) and order.get("order_id") and not order.get("error"):
+                results.append(order)
+            else:
+                results.append({"error": f"Order creation failed: {order}", "status": "failed"})
+        self.logger.info("Bulk request created %s/%s orders", sum('error' not in r for r in results), count)
+        return results
     
     def get_order_status(self, order_id: str) -> Dict[str, Any]:
         """Get status of an order"""
-        self.logger.info(f"Getting status for order: {order_id}")
+        self.logger.info("Getting status for order: %s", order_id)
         
-        # Ensure we have an auth token
-        if not self.auth_token:
-            if not self.authenticate():
-                raise Exception("Failed to authenticate with Shiprocket")
+        # Ensure we have a valid auth token
+        self.ensure_authenticated()
         
-        url = f"{self.base_url}/orders/show/{order_id}"
-        headers = {
-            "Authorization": f"Bearer {self.auth_token}",
-            "Content-Type": "application/json"
+        try:
+            response = self._request_with_auth("GET", f"/orders/show/{order_id}")
+            
+            if response.status_code == 200:
+                self.logger.info("Order status retrieved successfully")
+                return response.json()
+            
+            error_msg = f"Failed to get order status: {response.status_code} - {response.text}"
+            self.logger.error(error_msg)
+            return {"error": error_msg, "status": "failed"}
+                
+        except Exception as e:
+            error_msg = f"Error getting order status: {str(e)}"
+            self.logger.error(error_msg)
+            return {"error": error_msg, "status": "failed"}
+
+atexit.register(ShiprocketAPI.close_sessions)
+
+class AsyncShiprocketAPI(ShiprocketClientBase):
+    """Async Shiprocket client, so several orders can be in flight at once"""
+    
+    def __init__(self, email: str, password: str):
+        """Initialize with Shiprocket credentials"""
+        self.client = httpx.AsyncClient(
+            headers={"Content-Type": "application/json"},
+            http2=HTTP2_AVAILABLE,
+            limits=httpx.Limits(max_connections=50, max_keepalive_connections=20),
+            timeout=30
+        )
+        super().__init__(email, password, self.client.headers)
+        
+        # Concurrent requests that hit an expired token log in only once
+        self._auth_lock = asyncio.Lock()
+        
+        # The token cache is read on first use rather than here, since reading
+        # it hashes the password and locks a file
+        self._token_cache_checked = False
+    
+    async def close(self) -> None:
+        """Close the pooled HTTP connections"""
+        await self.client.aclose()
+    
+    async def __aenter__(self):
+        return self
+    
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.close()
+    
+    async def authenticate(self) -> bool:
+        """Authenticate with Shiprocket API and get token"""
+        if not self.password:
+            # Clients built with from_token have no password to log in with
+            self.logger.error("Cannot authenticate with Shiprocket: client has no password")
+            return False
+        
+        self.logger.info("Authenticating with Shiprocket API")
+        
+        url = f"{self.base_url}/auth/login"
+        payload = {
+            "email": self.email,
+            "password": self.password
         }
         
         try:
-            response = requests.get(url, headers=headers)
+            response = await self.client.post(url, content=orjson.dumps(payload))
             
             if response.status_code == 200:
+                data = response.json()
+                self._set_token(data.get('token'), self._token_expiry(data.get('token')))
+                await asyncio.to_thread(self._save_cached_token)
+                self.logger.info("Authentication successful")
+                return True
+            else:
+                self.logger.error("Authentication failed: %s - %s", response.status_code, response.text)
+                return False
+                
+        except Exception as e:
+            self.logger.error("Authentication error: %s", e)
+            return False
+    
+    async def ensure_authenticated(self) -> None:
+        """Authenticate unless the cached token is still valid"""
+        if self._token_is_fresh():
+            return
+        async with self._auth_lock:
+            if not self._token_cache_checked:
+                # Reuse a token cached by an earlier process for this account
+                self._token_cache_checked = True
+                await asyncio.to_thread(self._load_cached_token)
+            if self._token_is_fresh():
+                return
+            if not await self.authenticate():
+                raise Exception("Failed to authenticate with Shiprocket")
+    
+    async def _reauthenticate(self, rejected_token: Optional[str]) -> bool:
+        """Replace a token Shiprocket rejected, unless another request already did"""
+        async with self._auth_lock:
+            if self.auth_token != rejected_token:
+                return True
+            if not self.password:
+                # Leave the cached token alone; other clients may still be using it
+                self.logger.error("Shiprocket rejected the token and the client has no password to log in again")
+                return False
+            self.logger.warning("Authentication token expired, re-authenticating")
+            await asyncio.to_thread(self._clear_cached_token)
+            return await self.authenticate()
+    
+    async def create_order_from_invoice(self, invoice_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Create Shiprocket order from invoice data"""
+        self.logger.info("Creating Shiprocket order from invoice data")
+        
+        # Ensure we have a valid auth token
+        await self.ensure_authenticated()
+        
+        order_payload = self.build_order_payload(invoice_data)
+        
+        # Create order via API
+        url = f"{self.base_url}/orders/create/adhoc"
+        
+        body = orjson.dumps(order_payload)
+        try:
+            token = self.auth_token
+            response = await self.client.post(url, content=body)
+            
+            # Retry once with a fresh token if it expired
+            if response.status_code == 401 and await self._reauthenticate(token):
+                response = await self.client.post(url, content=body)
+            
+            if response.status_code in [200, 201]:
                 result = response.json()
-                self.logger.info(f"Order status retrieved successfully")
+                self.logger.info("Order created successfully: %s", result.get('order_id'))
                 return result
-            else:
-                # Check if token expired
-                if response.status_code == 401:
-                    self.logger.warning("Authentication token expired, re-authenticating")
-                    if self.authenticate():
-                        # Retry with new token
-                        headers["Authorization"] = f"Bearer {self.auth_token}"
-                        response = requests.get(url, headers=headers)
-                        
-                        if response.status_code == 200:
-                            result = response.json()
-                            self.logger.info(f"Order status retrieved successfully after re-auth")
-                            return result
+            
+            error_msg = f"Order creation failed: {response.status_code} - {response.text}"
+            self.logger.error(error_msg)
+            return {"error": error_msg, "status": "failed"}
                 
-                error_msg = f"Failed to get order status: {response.status_code} - {response.text}"
-                self.logger.error(error_msg)
-                return {"error": error_msg, "status": "failed"}
+        except Exception as e:
+            error_msg = f"Error creating order: {str(e)}"
+            self.logger.error(error_msg)
+            return {"error": error_msg, "status": "failed"}
+    
+    async def create_orders(self, invoices: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Create orders for several invoices concurrently, in input order"""
+        await self.ensure_authenticated()
+        return list(await asyncio.gather(*(self.create_order_from_invoice(invoice) for invoice in invoices)))
+    
+    async def get_order_status(self, order_id: str) -> Dict[str, Any]:
+        """Get status of an order"""
+        self.logger.info("Getting status for order: %s", order_id)
+        
+        # Ensure we have a valid auth token
+        await self.ensure_authenticated()
+        
+        url = f"{self.base_url}/orders/show/{order_id}"
+        
+        try:
+            token = self.auth_token
+            response = await self.client.get(url)
+            
+            # Retry once with a fresh token if it expired
+            if response.status_code == 401 and await self._reauthenticate(token):
+                response = await self.client.get(url)
+            
+            if response.status_code == 200:
+                self.logger.info("Order status retrieved successfully")
+                return response.json()
+            
+            error_msg = f"Failed to get order status: {response.status_code} - {response.text}"
+            self.logger.error(error_msg)
+            return {"error": error_msg, "status": "failed"}
                 
         except Exception as e:
             error_msg = f"Error getting order status: {str(e)}"
             self.logger.error(error_msg)
-            return {"error": error_msg, "status": "failed"} 
\ No newline at end of file
+            return {"error": error_msg, "status": "failed"}
@@ -0,0 +1,31 @@
+"""
+Async file helpers for the Invoice to Order Processing System.
+Uses aiofile (caio: io_uring/libaio) on Linux when installed, and falls back
+to the thread-pool backed aiofiles everywhere else.
+"""
+import sys
+
+import aiofiles
+
+try:
+    from aiofile import async_open
+except ImportError:
+    async_open = None
+
+# Native async disk I/O is only worth it on Linux, where caio can use io_uring
+USE_NATIVE_AIO = sys.platform == "linux" and async_open is not None
+
+
+def open_for_write(path):
+    """
+    Open a file for async binary writing.
+    
+    Args:
+        path: Path of the file to create or truncate
+        
+    Returns:
+        Async context manager yielding a file object with ``await write(data)``
+    """
+    if USE_NATIVE_AIO:
+        return async_open(str(path), "wb")
+    return aiofiles.open(path, "wb")
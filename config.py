@@ -20,10 +20,6 @@ class Config:
     UPLOAD_DIR: Path = Path(os.getenv("UPLOAD_DIR", "uploads"))
     PROCESSED_DIR: Path = Path(os.getenv("PROCESSED_DIR", "processed"))
     
-    # Ensure directories exist
-    UPLOAD_DIR.mkdir(exist_ok=True)
-    PROCESSED_DIR.mkdir(exist_ok=True)
-    
     # Ollama configuration
     OLLAMA_HOST: str = os.getenv("OLLAMA_HOST", "http://localhost:11434")
     OLLAMA_MODEL: str = os.getenv("OLLAMA_MODEL", "llama3:8b")
@@ -82,6 +78,11 @@ class Config:
     CORS_ORIGINS: List[str] = os.getenv("CORS_ORIGINS", "*").split(",")
     API_KEY: Optional[str] = os.getenv("API_KEY")
     
+    def ensure_dirs(self) -> None:
+        """Create the upload and processed directories if they are missing"""
+        self.UPLOAD_DIR.mkdir(exist_ok=True)
+        self.PROCESSED_DIR.mkdir(exist_ok=True)
+    
     def as_dict(self) -> Dict[str, Any]:
         """Return configuration as a dictionary (for logging/debugging)"""
         # Convert to dict but exclude sensitive information
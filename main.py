@@ -1,4 +1,18 @@
+import os
+
 import uvicorn
 
+from app.core.config import config
+
 if __name__ == "__main__":
-    uvicorn.run("app.api.app:app", host="0.0.0.0", port=8000, reload=True)
+    # Reload mode only supports a single worker; in production spread the
+    # CPU-heavy OCR path across all cores.
+    uvicorn.run(
+        "app.api.app:app",
+        host=config.HOST,
+        port=config.PORT,
+        reload=config.DEBUG,
+        workers=None if config.DEBUG else config.WORKERS or os.cpu_count(),
+        loop="uvloop",
+        http="httptools",
+    )
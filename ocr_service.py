@@ -1,24 +1,111 @@
 import cv2
-import numpy as np
 import pytesseract
-from PIL import Image
 import logging
 import os
+import hashlib
+from collections import OrderedDict
+from pathlib import Path
 from paddleocr import PaddleOCR
 import easyocr
-from collections import Counter
+from itertools import groupby, zip_longest
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import threading
+from typing import ClassVar, Dict, Optional
 import re
 
+# Common OCR misreadings and their corrections
+_OCR_FIX_TABLE = {
+    'l\'lVOICE': 'INVOICE',
+    'lNVOlCE': 'INVOICE',
+    'lNVOICE': 'INVOICE',
+    'INV0ICE': 'INVOICE',
+    'GSTlN': 'GSTIN',
+    'GST|N': 'GSTIN',
+    'GST!N': 'GSTIN',
+    # Add more common replacements as needed
+}
+
+# One alternation over all misreadings, longest first so overlapping keys match fully
+_OCR_FIX_RE = re.compile('|'.join(map(re.escape, sorted(_OCR_FIX_TABLE, key=len, reverse=True))))
+
+# GSTIN-shaped tokens in OCR text, compiled once at import time
+_GSTIN_FMT_RE = re.compile(r'[0-9]{2}[A-Z]{5}[0-9]{4}[A-Z][1-9A-Z]Z[0-9A-Z]', re.IGNORECASE)
+
 class MultiOCRService:
-    def __init__(self):
-        # Initialize OCR engines
-        self.paddle_ocr = PaddleOCR(use_angle_cls=True, lang='en')
-        self.easy_reader = easyocr.Reader(['en'])
+    # Inference precisions callers can choose between
+    PRECISIONS = ('int8', 'fp16', 'fp32')
+    
+    # Engine models are loaded once per process and precision, and shared by every instance
+    _paddle_ocr: ClassVar[Dict[str, PaddleOCR]] = {}
+    _easy_reader: ClassVar[Dict[str, easyocr.Reader]] = {}
+    _lock: ClassVar[threading.Lock] = threading.Lock()
+    # The readers are not thread-safe, so each runs one image at a time;
+    # concurrent pages still overlap across engines and preprocessing
+    _paddle_run_lock: ClassVar[threading.Lock] = threading.Lock()
+    _easy_run_lock: ClassVar[threading.Lock] = threading.Lock()
+    
+    # Consolidated texts kept in memory per service instance
+    RESULT_CACHE_SIZE = 256
+    
+    def __init__(self, enable_tesseract=True, precision='int8', cache_dir=None, max_side=1800):
+        if precision not in self.PRECISIONS:
+            raise ValueError(f"Unsupported OCR precision: {precision}")
+        self.precision = precision
+        
+        # Longest image side preprocessing and the engines work at
+        self.max_side = max_side
+        
+        # Tesseract is the only consumer of the CLAHE-enhanced image
+        self.enable_tesseract = enable_tesseract
+        
+        # The engines release the GIL in native code, so threads overlap them
+        self.engine_executor = ThreadPoolExecutor(max_workers=3, thread_name_prefix="ocr-engine")
+        
+        # OCR results keyed by image content hash: an in-memory LRU in front
+        # of one text file per image under cache_dir. The disk cache is opt-in
+        # and unbounded: nothing evicts its files, so prune cache_dir externally
+        self.cache_dir = Path(cache_dir) if cache_dir is not None else None
+        self._result_cache = OrderedDict()
+        self._result_cache_lock = threading.Lock()
         
         # Configure logging
         logging.basicConfig(level=logging.INFO)
         self.logger = logging.getLogger(__name__)
         
+    @classmethod
+    def _get_paddle(cls, precision):
+        """Return the shared PaddleOCR instance for a precision, loading it on first use"""
+        paddle = cls._paddle_ocr.get(precision)
+        if paddle is None:
+            with cls._lock:
+                paddle = cls._paddle_ocr.get(precision)
+                if paddle is None:
+                    # int8 runs through oneDNN on CPU; fp16 needs a GPU build of Paddle
+                    paddle = PaddleOCR(
+                        use_angle_cls=True, lang='en',
+                        enable_mkldnn=True, cpu_threads=os.cpu_count() or 1,
+                        precision=precision
+                    )
+                    cls._paddle_ocr[precision] = paddle
+        return paddle
+    
+    @classmethod
+    def _get_easy(cls, precision):
+        """Return the shared EasyOCR reader for a precision, loading it on first use"""
+        reader = cls._easy_reader.get(precision)
+        if reader is None:
+            with cls._lock:
+                reader = cls._easy_reader.get(precision)
+                if reader is None:
+                    import torch
+                    # EasyOCR only quantizes (dynamic int8) on CPU; there is no
+                    # CPU fp16 path, so anything below fp32 uses the int8 weights
+                    reader = easyocr.Reader(
+                        ['en'], gpu=torch.cuda.is_available(), quantize=precision != 'fp32'
+                    )
+                    cls._easy_reader[precision] = reader
+        return reader
+    
     def preprocess_image(self, image_path):
         """Advanced image preprocessing for better OCR accuracy"""
         self.logger.info(f"Preprocessing image: {image_path}")
@@ -32,9 +119,9 @@ class MultiOCRService:
         h, w = img.shape[:2]
         
         # Resize if too large or too small (optimal size for OCR)
-        if max(h, w) > 3000:
-            scale = 3000 / max(h, w)
-            img = cv2.resize(img, (int(w * scale), int(h * scale)))
+        if max(h, w) > self.max_side:
+            scale = self.max_side / max(h, w)
+            img = cv2.resize(img, (int(w * scale), int(h * scale)), interpolation=cv2.INTER_AREA)
         elif min(h, w) < 300:
             scale = 300 / min(h, w)
             img = cv2.resize(img, (int(w * scale), int(h * scale)))
@@ -46,7 +133,7 @@ class MultiOCRService:
         _, binary = cv2.threshold(gray, 150, 255, cv2.THRESH_BINARY_INV)
         
         # Count white pixels (text)
-        text_pixel_count = np.sum(binary == 255)
+        text_pixel_count = cv2.countNonZero(binary)
         
         # If very few text pixels, adjust threshold
         if text_pixel_count < (binary.shape[0] * binary.shape[1] * 0.01):
@@ -55,18 +142,24 @@ class MultiOCRService:
                                           cv2.THRESH_BINARY_INV, 11, 2)
         
         # Invert back to black text on white background
-        binary = cv2.bitwise_not(binary)
+        cv2.bitwise_not(binary, dst=binary)
         
         # Noise removal using median blur
-        denoised = cv2.medianBlur(binary, 3)
+        denoised = cv2.medianBlur(binary, 3, dst=binary)
         
-        # Contrast enhancement using CLAHE
-        clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8, 8))
-        enhanced = clahe.apply(gray)
+        # Contrast enhancement using CLAHE, only needed for Tesseract
+        enhanced = None
+        if self.enable_tesseract:
+            clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8, 8))
+            enhanced = clahe.apply(gray)
         
-        # Deskewing if needed
+        # Deskewing if needed; the skew angle is scale-invariant, so estimate
+        # it on a quarter-size copy to keep the point set small
         try:
-            coords = np.column_stack(np.where(denoised > 0))
+            small = cv2.resize(denoised, None, fx=0.25, fy=0.25, interpolation=cv2.INTER_AREA)
+            coords = cv2.findNonZero(small)
+            if coords is None or coords.shape[0] < 50:
+                return enhanced, denoised
             angle = cv2.minAreaRect(coords)[-1]
             
             if angle < -45:
@@ -85,11 +178,7 @@ class MultiOCRService:
         except:
             self.logger.warning("Skipping deskew - not enough contours")
         
-        # Save preprocessed image temporarily
-        preprocessed_path = f"{os.path.splitext(image_path)[0]}_preprocessed.jpg"
-        cv2.imwrite(preprocessed_path, denoised)
-        
-        return preprocessed_path, enhanced, denoised
+        return enhanced, denoised
     
     def parse_paddle_result(self, result):
         """Parse PaddleOCR results into a string"""
@@ -145,7 +234,7 @@ class MultiOCRService:
             self.logger.warning("PaddleOCR failed to produce results")
         if not easy_text.strip():
             self.logger.warning("EasyOCR failed to produce results")
-        if not tess_text.strip():
+        if self.enable_tesseract and not tess_text.strip():
             self.logger.warning("Tesseract failed to produce results")
         
         # Count successful engines
@@ -159,49 +248,25 @@ class MultiOCRService:
         easy_lines = easy_text.splitlines() if easy_text else []
         tess_lines = tess_text.splitlines() if tess_text else []
         
-        # Get the maximum number of lines
-        max_lines = max(len(paddle_lines), len(easy_lines), len(tess_lines))
-        
-        # Normalize line counts
-        paddle_lines = paddle_lines + [''] * (max_lines - len(paddle_lines))
-        easy_lines = easy_lines + [''] * (max_lines - len(easy_lines))
-        tess_lines = tess_lines + [''] * (max_lines - len(tess_lines))
-        
-        # Consolidate line by line
+        # Consolidate line by line: with three engines a majority vote is just
+        # a couple of comparisons, ties going to paddle, then easy, then tesseract
         consolidated_lines = []
         
-        for i in range(max_lines):
-            line_candidates = []
+        for p, e, t in zip_longest(paddle_lines, easy_lines, tess_lines, fillvalue=''):
+            p_ok, e_ok, t_ok = bool(p.strip()), bool(e.strip()), bool(t.strip())
             
-            if paddle_lines[i].strip():
-                line_candidates.append(paddle_lines[i])
-            if easy_lines[i].strip():
-                line_candidates.append(easy_lines[i])
-            if tess_lines[i].strip():
-                line_candidates.append(tess_lines[i])
-                
-            if line_candidates:
-                # Use the most common line among engines
-                if len(line_candidates) > 1:
-                    counter = Counter(line_candidates)
-                    most_common = counter.most_common(1)[0][0]
-                    consolidated_lines.append(most_common)
-                else:
-                    consolidated_lines.append(line_candidates[0])
-        
-        # Additional cleaning of the consolidated text
-        result_text = '\n'.join(consolidated_lines)
-        
-        # Remove duplicate consecutive lines
-        clean_lines = []
-        prev_line = None
-        
-        for line in result_text.splitlines():
-            if line != prev_line:
-                clean_lines.append(line)
-                prev_line = line
-                
-        result_text = '\n'.join(clean_lines)
+            if p_ok and e_ok and t_ok and p != e and p != t and e == t:
+                consolidated_lines.append(e)
+            elif p_ok:
+                consolidated_lines.append(p)
+            elif e_ok:
+                consolidated_lines.append(e)
+            elif t_ok:
+                consolidated_lines.append(t)
+        
+        # Remove duplicate consecutive lines; the lines came from splitlines(),
+        # so they can be grouped directly without re-joining and splitting
+        result_text = '\n'.join(line for line, _ in groupby(consolidated_lines))
         
         # Some common OCR error corrections
         result_text = self.clean_ocr_text(result_text)
@@ -210,91 +275,150 @@ class MultiOCRService:
     
     def clean_ocr_text(self, text):
         """Clean common OCR errors"""
-        # Replace common OCR mistakes
-        replacements = {
-            'l\'lVOICE': 'INVOICE',
-            'lNVOlCE': 'INVOICE',
-            'lNVOICE': 'INVOICE',
-            'INV0ICE': 'INVOICE',
-            'GSTlN': 'GSTIN',
-            'GST|N': 'GSTIN',
-            'GST!N': 'GSTIN',
-            # Add more common replacements as needed
-        }
-        
-        for old, new in replacements.items():
-            text = text.replace(old, new)
+        # Replace common OCR mistakes in a single pass
+        text = _OCR_FIX_RE.sub(lambda match: _OCR_FIX_TABLE[match.group(0)], text)
             
-        # Fix common GSTIN format issues
-        gstin_pattern = r'[0-9]{2}[A-Za-z]{5}[0-9]{4}[A-Za-z]{1}[1-9A-Za-z]{1}[Zz]{1}[0-9A-Za-z]{1}'
-        gstin_matches = re.finditer(gstin_pattern, text, re.IGNORECASE)
-        
-        for match in gstin_matches:
-            original = match.group(0)
-            corrected = original.upper()  # Ensure GSTIN is uppercase
-            text = text.replace(original, corrected)
+        # Fix common GSTIN format issues; ensure GSTINs are uppercase
+        text = _GSTIN_FMT_RE.sub(lambda match: match.group(0).upper(), text)
             
         return text
     
+    def _run_paddle(self, image):
+        """Run PaddleOCR on a preprocessed image array"""
+        paddle = self._get_paddle(self.precision)
+        with self._paddle_run_lock:
+            result = paddle.ocr(image, cls=True)
+        return self.parse_paddle_result(result)
+    
+    def _run_easy(self, image):
+        """Run EasyOCR on a preprocessed image array"""
+        reader = self._get_easy(self.precision)
+        with self._easy_run_lock:
+            result = reader.readtext(image)
+        return self.parse_easy_result(result)
+    
+    def _run_tesseract(self, image):
+        """Run Tesseract on an enhanced grayscale image"""
+        # LSTM engine, single uniform block of text; no character whitelist
+        # so Tesseract's LSTM model runs unconstrained
+        return pytesseract.image_to_string(image, config=r'--oem 3 --psm 6')
+    
+    def _run_engine(self, name, label, run, source):
+        """Run one OCR engine, returning (name, text) with empty text on failure"""
+        try:
+            self.logger.info(f"Running {label}")
+            text = run(source)
+            self.logger.info(f"{label} extracted {len(text)} chars")
+            return name, text
+        except Exception as e:
+            self.logger.error(f"{label} failed: {e}")
+            return name, ""
+    
+    def _result_cache_key(self, image_path):
+        """Key OCR output by image content and the settings that affect it"""
+        with open(image_path, 'rb') as f:
+            digest = hashlib.file_digest(f, lambda: hashlib.blake2b(digest_size=16)).hexdigest()
+        engines = "pet" if self.enable_tesseract else "pe"
+        return f"{digest}-{engines}-{self.precision}-{self.max_side}"
+    
+    def _get_cached_result(self, key) -> Optional[str]:
+        """Look up OCR text in memory, then on disk"""
+        with self._result_cache_lock:
+            text = self._result_cache.get(key)
+            if text is not None:
+                self._result_cache.move_to_end(key)
+                return text
+        
+        if self.cache_dir is None:
+            return None
+        try:
+            text = (self.cache_dir / f"{key}.txt").read_text(encoding="utf-8")
+        except FileNotFoundError:
+            return None
+        self._remember_result(key, text)
+        return text
+    
+    def _remember_result(self, key, text):
+        """Add OCR text to the in-memory LRU, evicting the oldest entry when full"""
+        with self._result_cache_lock:
+            self._result_cache[key] = text
+            self._result_cache.move_to_end(key)
+            if len(self._result_cache) > self.RESULT_CACHE_SIZE:
+                self._result_cache.popitem(last=False)
+    
+    def _store_result(self, key, text):
+        """Cache OCR text in memory and, if enabled, on disk"""
+        self._remember_result(key, text)
+        if self.cache_dir is None:
+            return
+        try:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            # Write then rename so concurrent readers never see a partial file
+            temp_path = self.cache_dir / f"{key}.{threading.get_ident()}.tmp"
+            temp_path.write_text(text, encoding="utf-8")
+            os.replace(temp_path, self.cache_dir / f"{key}.txt")
+        except OSError as e:
+            self.logger.warning(f"Failed to write OCR cache entry {key}: {e}")
+    
     def extract_text_multi_ocr(self, image_path):
         """Extract text using multiple OCR engines and consolidate results"""
         self.logger.info(f"Starting multi-OCR extraction for: {image_path}")
         
         try:
-            # Preprocess the image for better OCR results
-            preprocessed_path, enhanced, denoised = self.preprocess_image(image_path)
+            # Identical images reuse earlier OCR output
+            cache_key = self._result_cache_key(image_path)
+            cached_text = self._get_cached_result(cache_key)
+            if cached_text is not None:
+                self.logger.info(f"Reusing cached OCR text for: {image_path}")
+                return cached_text
             
-            results = {}
-            
-            # PaddleOCR
-            try:
-                self.logger.info("Running PaddleOCR")
-                paddle_result = self.paddle_ocr.ocr(preprocessed_path, cls=True)
-                results['paddle'] = self.parse_paddle_result(paddle_result)
-                self.logger.info(f"PaddleOCR extracted {len(results['paddle'])} chars")
-            except Exception as e:
-                self.logger.error(f"PaddleOCR failed: {e}")
-                results['paddle'] = ""
+            # Preprocess the image for better OCR results
+            enhanced, denoised = self.preprocess_image(image_path)
             
-            # EasyOCR
-            try:
-                self.logger.info("Running EasyOCR")
-                easy_result = self.easy_reader.readtext(preprocessed_path)
-                results['easy'] = self.parse_easy_result(easy_result)
-                self.logger.info(f"EasyOCR extracted {len(results['easy'])} chars")
-            except Exception as e:
-                self.logger.error(f"EasyOCR failed: {e}")
-                results['easy'] = ""
+            # Run the engines concurrently
+            futures = [
+                self.engine_executor.submit(self._run_engine, 'paddle', "PaddleOCR", self._run_paddle, denoised),
+                self.engine_executor.submit(self._run_engine, 'easy', "EasyOCR", self._run_easy, denoised),
+            ]
+            if self.enable_tesseract:
+                futures.append(
+                    self.engine_executor.submit(self._run_engine, 'tesseract', "Tesseract", self._run_tesseract, enhanced)
+                )
+            engine_results = dict(future.result() for future in as_completed(futures))
             
-            # Tesseract
-            try:
-                self.logger.info("Running Tesseract OCR")
-                # Use different preprocessing for Tesseract
-                custom_config = r'--oem 3 --psm 6 -c tessedit_char_whitelist="ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789.,:;₹$@#%&*()+-/\|<> "'
-                tess_result = pytesseract.image_to_string(Image.fromarray(enhanced), config=custom_config)
-                results['tesseract'] = tess_result
-                self.logger.info(f"Tesseract extracted {len(results['tesseract'])} chars")
-            except Exception as e:
-                self.logger.error(f"Tesseract failed: {e}")
-                results['tesseract'] = ""
-            
-            # Clean up temp file
-            try:
-                if os.path.exists(preprocessed_path):
-                    os.remove(preprocessed_path)
-            except:
-                self.logger.warning(f"Failed to remove temporary file: {preprocessed_path}")
+            # Keep the paddle, easy, tesseract order for consolidation
+            results = {name: engine_results.get(name, '') for name in ('paddle', 'easy', 'tesseract')}
             
             # Consolidate results from all engines
             consolidated_text = self.consolidate_ocr_results(results)
             self.logger.info(f"Consolidated text length: {len(consolidated_text)} chars")
             
+            self._store_result(cache_key, consolidated_text)
             return consolidated_text
             
         except Exception as e:
             self.logger.error(f"Error in OCR processing: {str(e)}")
             raise Exception(f"OCR processing failed: {str(e)}")
     
+    def _extract_pdf_page(self, pdf_path, page_number, image, page_count):
+        """OCR a single rendered PDF page through a temporary image file"""
+        self.logger.info(f"Processing PDF page {page_number}/{page_count}")
+        
+        # Save temporary image
+        temp_img_path = f"{os.path.splitext(pdf_path)[0]}_page_{page_number}.jpg"
+        image.save(temp_img_path, 'JPEG')
+        
+        try:
+            # Extract text from the image
+            return self.extract_text_multi_ocr(temp_img_path)
+        finally:
+            # Remove temporary image
+            try:
+                if os.path.exists(temp_img_path):
+                    os.remove(temp_img_path)
+            except:
+                self.logger.warning(f"Failed to remove temporary file: {temp_img_path}")
+    
     def extract_text_from_pdf(self, pdf_path):
         """Extract text from PDF files using OCR"""
         try:
@@ -305,26 +429,14 @@ class MultiOCRService:
             # Convert PDF to images
             images = pdf2image.convert_from_path(pdf_path)
             
-            all_text = []
-            
-            # Process each page
-            for i, image in enumerate(images):
-                self.logger.info(f"Processing PDF page {i+1}/{len(images)}")
-                
-                # Save temporary image
-                temp_img_path = f"{os.path.splitext(pdf_path)[0]}_page_{i+1}.jpg"
-                image.save(temp_img_path, 'JPEG')
-                
-                # Extract text from the image
-                text = self.extract_text_multi_ocr(temp_img_path)
-                all_text.append(text)
-                
-                # Remove temporary image
-                try:
-                    if os.path.exists(temp_img_path):
-                        os.remove(temp_img_path)
-                except:
-                    self.logger.warning(f"Failed to remove temporary file: {temp_img_path}")
+            # Process pages concurrently; map keeps the page order
+            page_count = len(images)
+            workers = max(1, min(os.cpu_count() or 1, page_count))
+            with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="ocr-page") as page_executor:
+                all_text = list(page_executor.map(
+                    lambda page: self._extract_pdf_page(pdf_path, page[0], page[1], page_count),
+                    enumerate(images, 1)
+                ))
             
             return "\n\n----- PAGE BREAK -----\n\n".join(all_text)
             
@@ -10,7 +10,7 @@ mkdir -p app/uploads app/processed
 
 # Check if running in simple mode or full mode
 if [ "$1" == "simple" ]; then
-    echo "Starting simple test server on http://localhost:8080"
+    echo "Starting development server on http://localhost:8080"
     python3 app.py
 else
     echo "Starting full application on http://localhost:8000"
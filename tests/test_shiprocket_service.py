@@ -0,0 +1,76 @@
+import asyncio
+import os
+import sys
+import tempfile
+import time
+import unittest
+from pathlib import Path
+from unittest import mock
+
+# Add parent directory to path to import modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import shiprocket_service
+from shiprocket_service import ShiprocketAPI, AsyncShiprocketAPI
+
+class TestShiprocketTokenCache(unittest.TestCase):
+    """Test cases for the on-disk Shiprocket token cache"""
+
+    def setUp(self):
+        """Point the token cache at a fresh directory for each test"""
+        self.cache_dir = tempfile.TemporaryDirectory()
+        patcher = mock.patch.object(shiprocket_service, 'TOKEN_CACHE_DIR', Path(self.cache_dir.name))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(self.cache_dir.cleanup)
+
+        # Simulate a successful login by the account owner
+        owner = ShiprocketAPI(email='owner@example.com', password='correct-password')
+        owner._set_token('cached-token', time.time() + 3600)
+        owner._save_cached_token()
+
+    def test_same_password_reuses_token(self):
+        """A client with the password the token was issued for adopts it"""
+        client = ShiprocketAPI(email='owner@example.com', password='correct-password')
+
+        self.assertEqual(client.auth_token, 'cached-token')
+        self.assertEqual(client.headers['Authorization'], 'Bearer cached-token')
+
+    def test_wrong_password_does_not_reuse_token(self):
+        """A client with the right email but a wrong password must log in itself"""
+        client = ShiprocketAPI(email='owner@example.com', password='wrong-password')
+
+        self.assertIsNone(client.auth_token)
+        self.assertNotIn('Authorization', client.headers)
+        self.assertFalse(client._token_is_fresh())
+
+    def test_cache_does_not_store_password(self):
+        """The cache file holds a salted digest, never the password itself"""
+        client = ShiprocketAPI(email='owner@example.com', password='correct-password')
+
+        self.assertNotIn('correct-password', client._token_cache_path.read_text())
+
+    def test_token_only_client_does_not_log_in(self):
+        """A client built from a token keeps the shared cache and never posts an empty password"""
+        client = ShiprocketAPI.from_token('owner@example.com', 'worker-token', time.time() + 3600)
+        cache_path = client._token_cache_path
+
+        with mock.patch.object(client.session, 'post') as post:
+            self.assertFalse(client._reauthenticate('worker-token'))
+            self.assertFalse(client.authenticate())
+
+        post.assert_not_called()
+        self.assertTrue(cache_path.exists())
+
+    def test_async_client_reads_cache_on_first_use(self):
+        """The async client reads the token cache in ensure_authenticated, not in __init__"""
+        async def run():
+            async with AsyncShiprocketAPI(email='owner@example.com', password='correct-password') as client:
+                self.assertIsNone(client.auth_token)
+                await client.ensure_authenticated()
+                return client.auth_token
+
+        self.assertEqual(asyncio.run(run()), 'cached-token')
+
+if __name__ == '__main__':
+    unittest.main()
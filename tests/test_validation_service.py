@@ -0,0 +1,97 @@
+import os
+import sys
+import unittest
+
+# Add parent directory to path to import modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from validation_service import InvoiceValidator
+
+class TestInvoiceValidator(unittest.TestCase):
+    """Test cases for the InvoiceValidator class"""
+
+    @classmethod
+    def setUpClass(cls):
+        """Set up the validator once for all tests"""
+        cls.validator = InvoiceValidator()
+
+    def test_validate_gstin(self):
+        """Test GSTIN format and checksum validation"""
+        # Published GSTINs with correct checksums
+        for gstin in ('27AAPFU0939F1ZV', '29AAGCB7383J1Z4', '33AAACH7409R1Z8'):
+            self.assertTrue(self.validator.validate_gstin(gstin), gstin)
+
+        # Correct format, wrong checksum character
+        self.assertFalse(self.validator.validate_gstin('27AAPFU0939F1ZW'))
+        self.assertFalse(self.validator.validate_gstin('22AAAAA0000A1Z5'))
+
+        # Wrong format or state code
+        self.assertFalse(self.validator.validate_gstin('27aapfu0939f1zv'))
+        self.assertFalse(self.validator.validate_gstin('27AAPFU0939F1YV'))
+        self.assertFalse(self.validator.validate_gstin('00AAPFU0939F1ZV'))
+        self.assertFalse(self.validator.validate_gstin('27AAPFU0939F1Z'))
+        self.assertFalse(self.validator.validate_gstin(''))
+
+    def test_validate_pincode_and_phone(self):
+        """Test PIN code and phone number validation"""
+        self.assertTrue(self.validator.validate_pincode('560001'))
+        self.assertTrue(self.validator.validate_pincode(560001))
+        self.assertFalse(self.validator.validate_pincode('060001'))
+        self.assertFalse(self.validator.validate_pincode('56001'))
+
+        self.assertTrue(self.validator.validate_phone('+91 98765-43210'))
+        self.assertTrue(self.validator.validate_phone('(987) 654 3210'))
+        self.assertFalse(self.validator.validate_phone('5876543210'))
+
+    def test_validate_date(self):
+        """Test date validation and standardization"""
+        self.assertEqual(self.validator.validate_date('12/05/2023'), (True, '2023-05-12'))
+        self.assertEqual(self.validator.validate_date('05/13/2023'), (True, '2023-05-13'))
+        self.assertEqual(self.validator.validate_date('2023-05-12'), (True, '2023-05-12'))
+        self.assertEqual(self.validator.validate_date('2023.05.12'), (True, '2023-05-12'))
+        self.assertEqual(self.validator.validate_date('29/02/2024'), (True, '2024-02-29'))
+        self.assertEqual(self.validator.validate_date('31/04/2023'), (False, ''))
+
+    def test_validate_state(self):
+        """Test state name and code standardization"""
+        self.assertEqual(self.validator.validate_state('mh'), (True, 'Maharashtra'))
+        self.assertEqual(self.validator.validate_state(' tamil nadu '), (True, 'Tamil Nadu'))
+        self.assertEqual(self.validator.validate_state('Bengal'), (True, 'West Bengal'))
+        self.assertEqual(self.validator.validate_state('Uttar Pradesh, India'), (True, 'Uttar Pradesh'))
+        self.assertEqual(self.validator.validate_state('Atlantis'), (False, ''))
+
+    def test_validate_invoice_data(self):
+        """Test full invoice validation"""
+        data = {
+            'billing_customer_name': 'John Doe',
+            'billing_address': '1 MG Road',
+            'billing_gstin': '27AAPFU0939F1ZV',
+            'billing_pincode': '560001',
+            'billing_state': 'KA',
+            'order_date': '15/01/2023',
+            'sub_total': '500',
+            'order_items': [{'name': 'Widget', 'units': '2', 'selling_price': '250'}]
+        }
+
+        errors, warnings = self.validator.validate_invoice_data(data)
+
+        self.assertEqual(errors, [])
+        self.assertEqual(warnings, [])
+        self.assertEqual(data['billing_state'], 'Karnataka')
+        self.assertEqual(data['order_date'], '2023-01-15')
+        self.assertEqual(data['sub_total'], 500.0)
+        self.assertEqual(data['order_items'][0]['units'], 2)
+
+        errors, warnings = self.validator.validate_invoice_data({'billing_gstin': '22AAAAA0000A1Z5'})
+
+        self.assertEqual(len(errors), 2)
+        self.assertIn("Invalid GSTIN format", warnings)
+
+        # fail_fast stops at the missing required fields
+        errors, warnings = self.validator.validate_invoice_data({'billing_gstin': '22AAAAA0000A1Z5'}, fail_fast=True)
+
+        self.assertEqual(len(errors), 2)
+        self.assertEqual(warnings, [])
+
+if __name__ == '__main__':
+    unittest.main()
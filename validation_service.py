@@ -1,53 +1,266 @@
 import re
+import string
 import logging
-from typing import Dict, Any, Tuple, List
+import os
+from bisect import bisect_right
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache, partial, wraps
+from itertools import accumulate
+from types import MappingProxyType
+from typing import Dict, Any, Tuple, List, Optional
 from datetime import datetime
 
+try:
+    import ahocorasick
+except ImportError:  # optional; state names are then searched for one by one
+    ahocorasick = None
+
+# Logging is configured by the application, not by this module
+logger = logging.getLogger(__name__)
+
+# ASCII character classes for the fixed-length GSTIN, PIN code and phone
+# checks, which are plain per-position scans rather than regexes
+_DIGITS = frozenset(string.digits)
+_UPPER = frozenset(string.ascii_uppercase)
+_UPPER_ALNUM = _DIGITS | _UPPER
+_GSTIN_ENTITY = _UPPER_ALNUM - {'0'}
+_PIN_FIRST = _DIGITS - {'0'}
+_PHONE_FIRST = frozenset('6789')
+
+# GSTIN characters and their values in the mod-36 checksum
+_GSTIN_ALPHABET = string.digits + string.ascii_uppercase
+_GSTIN_VALUES = {char: value for value, char in enumerate(_GSTIN_ALPHABET)}
+
+# Checksum contribution of each character at an even (weight 1) and odd
+# (weight 2) position: the sum of the base-36 digits of value * weight
+_GSTIN_EVEN_WEIGHTS = _GSTIN_VALUES
+_GSTIN_ODD_WEIGHTS = {char: sum(divmod(value * 2, 36)) for char, value in _GSTIN_VALUES.items()}
+
+# Spaces, dashes, and parentheses stripped from phone numbers. Whitespace is
+# every character str.isspace() (and so regex \s) accepts, all below U+3001
+_PHONE_STRIP = str.maketrans('', '', ''.join(c for c in map(chr, range(0x3001)) if c.isspace()) + '-()')
+
+# Basic email validation
+_EMAIL_RE = re.compile(r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$')
+
+# Common date formats
+_DATE_RES = (
+    re.compile(r'(\d{1,2})[/.-](\d{1,2})[/.-](\d{2,4})'),  # DD/MM/YYYY or MM/DD/YYYY
+    re.compile(r'(\d{2,4})[/.-](\d{1,2})[/.-](\d{1,2})'),  # YYYY/MM/DD
+)
+
+# Longest month lengths, indexed by month; February is checked for leap years
+_DAYS_IN_MONTH = (0, 31, 29, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31)
+
+def _valid_ymd(year: int, month: int, day: int) -> bool:
+    """Whether the day exists in the given month and year"""
+    if not (1 <= month <= 12 and 1 <= day <= _DAYS_IN_MONTH[month]):
+        return False
+    if month == 2 and day == 29:
+        return (year % 4 == 0 and year % 100 != 0) or year % 400 == 0
+    return True
+
+# strptime formats for the date fallback, keyed by separator and whether the
+# string starts with a 4-digit year; no other format in the set can match
+_FALLBACK_DATE_FORMATS = {
+    ('/', False): ('%d/%m/%Y', '%m/%d/%Y'),
+    ('/', True): ('%Y/%m/%d',),
+    ('-', False): ('%d-%m-%Y', '%m-%d-%Y'),
+    ('-', True): ('%Y-%m-%d',),
+}
+
+def _fallback_date_formats(date_str: str) -> Tuple[str, ...]:
+    """strptime formats that could parse date_str, in the order they are tried"""
+    has_slash = '/' in date_str
+    if has_slash == ('-' in date_str):
+        # No separator, or both; no single-separator format can match
+        return ()
+    return _FALLBACK_DATE_FORMATS['/' if has_slash else '-', date_str[:4].isdigit()]
+
+# Indian states
+_INDIAN_STATES = (
+    'Andhra Pradesh', 'Arunachal Pradesh', 'Assam', 'Bihar', 'Chhattisgarh',
+    'Goa', 'Gujarat', 'Haryana', 'Himachal Pradesh', 'Jharkhand', 'Karnataka',
+    'Kerala', 'Madhya Pradesh', 'Maharashtra', 'Manipur', 'Meghalaya', 
+    'Mizoram', 'Nagaland', 'Odisha', 'Punjab', 'Rajasthan', 'Sikkim',
+    'Tamil Nadu', 'Telangana', 'Tripura', 'Uttar Pradesh', 'Uttarakhand', 
+    'West Bengal', 'Delhi', 'Jammu and Kashmir', 'Ladakh', 'Puducherry',
+    'Chandigarh', 'Daman and Diu', 'Dadra and Nagar Haveli', 'Lakshadweep',
+    'Andaman and Nicobar Islands'
+)
+
+# State codes
+_STATE_CODES = MappingProxyType({
+    'AP': 'Andhra Pradesh', 'AR': 'Arunachal Pradesh', 'AS': 'Assam',
+    'BR': 'Bihar', 'CT': 'Chhattisgarh', 'GA': 'Goa', 'GJ': 'Gujarat',
+    'HR': 'Haryana', 'HP': 'Himachal Pradesh', 'JH': 'Jharkhand',
+    'KA': 'Karnataka', 'KL': 'Kerala', 'MP': 'Madhya Pradesh',
+    'MH': 'Maharashtra', 'MN': 'Manipur', 'ML': 'Meghalaya',
+    'MZ': 'Mizoram', 'NL': 'Nagaland', 'OR': 'Odisha', 'PB': 'Punjab',
+    'RJ': 'Rajasthan', 'SK': 'Sikkim', 'TN': 'Tamil Nadu', 'TG': 'Telangana',
+    'TR': 'Tripura', 'UP': 'Uttar Pradesh', 'UK': 'Uttarakhand',
+    'WB': 'West Bengal', 'DL': 'Delhi', 'JK': 'Jammu and Kashmir',
+    'LA': 'Ladakh', 'PY': 'Puducherry', 'CH': 'Chandigarh',
+    'DD': 'Daman and Diu', 'DN': 'Dadra and Nagar Haveli',
+    'LD': 'Lakshadweep', 'AN': 'Andaman and Nicobar Islands'
+})
+
+# Uppercased state names mapped to their canonical spelling, in list order
+# so partial matches resolve to the same state as a scan of the list
+_STATE_UPPER = {state.upper(): state for state in _INDIAN_STATES}
+_STATE_UPPER_ITEMS = tuple(_STATE_UPPER.items())
+
+# Uppercased state names joined by NUL, with the offset each one starts at,
+# so one find() locates the first state name containing a given input
+_STATE_NAMES_JOINED = '\0'.join(_STATE_UPPER)
+_STATE_NAME_OFFSETS = tuple(accumulate((len(state_upper) + 1 for state_upper in _STATE_UPPER), initial=0))
+
+def _build_state_automaton():
+    """Build an Aho-Corasick automaton over the uppercased state names, if available"""
+    if ahocorasick is None:
+        return None
+    automaton = ahocorasick.Automaton()
+    for index, state_upper in enumerate(_STATE_UPPER):
+        automaton.add_word(state_upper, index)
+    automaton.make_automaton()
+    return automaton
+
+_STATE_AUTOMATON = _build_state_automaton()
+
+def _partial_state_index(state_clean: str) -> Optional[int]:
+    """
+    Index of the first state whose name contains, or is contained in, state_clean
+    
+    State names inside the input are found in one Aho-Corasick pass when
+    pyahocorasick is installed, otherwise by testing each name in turn. An
+    input inside a state name is found with a single search of the joined names.
+    """
+    if _STATE_AUTOMATON is not None:
+        index = min((i for _, i in _STATE_AUTOMATON.iter(state_clean)), default=None)
+    else:
+        index = next((i for i, (state_upper, _) in enumerate(_STATE_UPPER_ITEMS) if state_upper in state_clean), None)
+    
+    if '\0' not in state_clean:
+        position = _STATE_NAMES_JOINED.find(state_clean)
+        if position >= 0:
+            containing = bisect_right(_STATE_NAME_OFFSETS, position) - 1
+            index = containing if index is None else min(index, containing)
+    return index
+
+def _gstin_check_char(gstin: str) -> str:
+    """
+    Expected checksum character of a GSTIN
+    
+    Each of the first 14 characters is weighted alternately by 1 and 2, the
+    base-36 digits of each product are summed, and the check character is
+    the value that brings the total to a multiple of 36.
+    """
+    total = (sum(map(_GSTIN_EVEN_WEIGHTS.__getitem__, gstin[0:14:2])) +
+             sum(map(_GSTIN_ODD_WEIGHTS.__getitem__, gstin[1:14:2])))
+    return _GSTIN_ALPHABET[-total % 36]
+
+# (field, InvoiceValidator method, warning) for fields that are only checked
+_FIELD_CHECKS = (
+    ('billing_gstin', 'validate_gstin', "Invalid GSTIN format"),
+    ('billing_pincode', 'validate_pincode', "Invalid billing pincode format"),
+    ('shipping_pincode', 'validate_pincode', "Invalid shipping pincode format"),
+    ('billing_phone', 'validate_phone', "Invalid billing phone number format"),
+    ('shipping_phone', 'validate_phone', "Invalid shipping phone number format"),
+    ('billing_email', 'validate_email', "Invalid billing email format"),
+    ('shipping_email', 'validate_email', "Invalid shipping email format"),
+)
+
+# (field, InvoiceValidator method, warning) for fields replaced by their
+# standardized value when valid
+_FIELD_STANDARDIZERS = (
+    ('order_date', 'validate_date', "Invalid order date format"),
+    ('billing_state', 'validate_state', "Invalid billing state"),
+    ('shipping_state', 'validate_state', "Invalid shipping state"),
+)
+
+# (field, negative amount warning, unparseable amount warning)
+_AMOUNT_FIELDS = (
+    ('sub_total', "Negative subtotal amount", "Invalid subtotal amount format"),
+    ('tax_amount', "Negative tax amount", "Invalid tax amount format"),
+    ('total_amount', "Negative total amount", "Invalid total amount format"),
+)
+
+def _coerce_float(value) -> Optional[float]:
+    """float(value), or None when value is not numeric"""
+    if type(value) is float:
+        return value
+    try:
+        return float(value)
+    except (ValueError, TypeError):
+        return None
+
+# Batches smaller than this are validated in-process; starting worker
+# processes and pickling invoices costs more than it saves
+PARALLEL_VALIDATION_MIN_INVOICES = 1000
+
+def _validate_detached(validator, fail_fast: bool, data: Dict[str, Any]):
+    """Validate an invoice in a worker process, returning the standardized data with the result"""
+    errors, warnings = validator.validate_invoice_data(data, fail_fast)
+    return errors, warnings, data
+
+# Distinct values remembered per validator; invoice batches repeat the
+# same GSTINs, PIN codes, phones, emails, dates and states
+VALIDATION_CACHE_SIZE = 4096
+
+def _memoize(func):
+    """Cache a single-argument validator, calling it uncached for unhashable values"""
+    cached = lru_cache(maxsize=VALIDATION_CACHE_SIZE, typed=True)(func)
+    
+    @wraps(func)
+    def wrapper(value):
+        try:
+            return cached(value)
+        except TypeError:
+            return func(value)
+    
+    wrapper.cache_info = cached.cache_info
+    wrapper.cache_clear = cached.cache_clear
+    return wrapper
+
+@_memoize
+def _match_state(state_clean: str) -> Tuple[bool, str]:
+    """Canonical state for a stripped, uppercased state name or code"""
+    # Check if it's a state code
+    if state_clean in _STATE_CODES:
+        return True, _STATE_CODES[state_clean]
+        
+    # Check if it's a state name
+    if state_clean in _STATE_UPPER:
+        return True, _STATE_UPPER[state_clean]
+            
+    # Check partial matches
+    index = _partial_state_index(state_clean)
+    if index is not None:
+        return True, _STATE_UPPER_ITEMS[index][1]
+            
+    return False, ""
+
 class InvoiceValidator:
     """Validate invoice data extracted from OCR and LLM processing"""
     
-    def __init__(self):
-        # Configure logging
-        logging.basicConfig(level=logging.INFO)
-        self.logger = logging.getLogger(__name__)
-        
-        # Load Indian states
-        self.indian_states = [
-            'Andhra Pradesh', 'Arunachal Pradesh', 'Assam', 'Bihar', 'Chhattisgarh',
-            'Goa', 'Gujarat', 'Haryana', 'Himachal Pradesh', 'Jharkhand', 'Karnataka',
-            'Kerala', 'Madhya Pradesh', 'Maharashtra', 'Manipur', 'Meghalaya', 
-            'Mizoram', 'Nagaland', 'Odisha', 'Punjab', 'Rajasthan', 'Sikkim',
-            'Tamil Nadu', 'Telangana', 'Tripura', 'Uttar Pradesh', 'Uttarakhand', 
-            'West Bengal', 'Delhi', 'Jammu and Kashmir', 'Ladakh', 'Puducherry',
-            'Chandigarh', 'Daman and Diu', 'Dadra and Nagar Haveli', 'Lakshadweep',
-            'Andaman and Nicobar Islands'
-        ]
-        # Add state codes
-        self.state_codes = {
-            'AP': 'Andhra Pradesh', 'AR': 'Arunachal Pradesh', 'AS': 'Assam',
-            'BR': 'Bihar', 'CT': 'Chhattisgarh', 'GA': 'Goa', 'GJ': 'Gujarat',
-            'HR': 'Haryana', 'HP': 'Himachal Pradesh', 'JH': 'Jharkhand',
-            'KA': 'Karnataka', 'KL': 'Kerala', 'MP': 'Madhya Pradesh',
-            'MH': 'Maharashtra', 'MN': 'Manipur', 'ML': 'Meghalaya',
-            'MZ': 'Mizoram', 'NL': 'Nagaland', 'OR': 'Odisha', 'PB': 'Punjab',
-            'RJ': 'Rajasthan', 'SK': 'Sikkim', 'TN': 'Tamil Nadu', 'TG': 'Telangana',
-            'TR': 'Tripura', 'UP': 'Uttar Pradesh', 'UK': 'Uttarakhand',
-            'WB': 'West Bengal', 'DL': 'Delhi', 'JK': 'Jammu and Kashmir',
-            'LA': 'Ladakh', 'PY': 'Puducherry', 'CH': 'Chandigarh',
-            'DD': 'Daman and Diu', 'DN': 'Dadra and Nagar Haveli',
-            'LD': 'Lakshadweep', 'AN': 'Andaman and Nicobar Islands'
-        }
+    # Indian states and state codes, built once at import and shared
+    # read-only by every validator and the cached lookups
+    indian_states = _INDIAN_STATES
+    state_codes = _STATE_CODES
     
-    def validate_gstin(self, gstin: str) -> bool:
+    @staticmethod
+    @_memoize
+    def validate_gstin(gstin: str) -> bool:
         """Validate GSTIN format and checksum"""
         if not gstin:
             return False
             
-        # GSTIN format: 22AAAAA0000A1Z5
-        pattern = r'^[0-9]{2}[A-Z]{5}[0-9]{4}[A-Z]{1}[1-9A-Z]{1}[Z]{1}[0-9A-Z]{1}$'
-        
-        # Basic pattern check
-        if not re.match(pattern, gstin):
+        # Basic pattern check, GSTIN format: 22AAAAA0000A1Z5
+        if len(gstin) != 15 or gstin[13] != 'Z':
+            return False
+        if not (_DIGITS.issuperset(gstin[:2]) and _UPPER.issuperset(gstin[2:7]) and
+                _DIGITS.issuperset(gstin[7:11]) and gstin[11] in _UPPER and
+                gstin[12] in _GSTIN_ENTITY and gstin[14] in _UPPER_ALNUM):
             return False
             
         # State code check (first two digits)
@@ -56,12 +269,11 @@ class InvoiceValidator:
             return False
             
         # Check the checksum character (last character)
-        # For a complete implementation, a proper checksum calculation would be needed
-        # This is a simplified version
-        
-        return True
+        return gstin[14] == _gstin_check_char(gstin)
     
-    def validate_pincode(self, pincode: str) -> bool:
+    @staticmethod
+    @_memoize
+    def validate_pincode(pincode: str) -> bool:
         """Validate Indian PIN code"""
         if not pincode:
             return False
@@ -70,18 +282,17 @@ class InvoiceValidator:
         pincode_str = str(pincode).strip()
         
         # Indian PIN codes are 6 digits
-        if not re.match(r'^[1-9][0-9]{5}$', pincode_str):
-            return False
-            
-        return True
+        return len(pincode_str) == 6 and pincode_str[0] in _PIN_FIRST and _DIGITS.issuperset(pincode_str[1:])
     
-    def validate_phone(self, phone: str) -> bool:
+    @staticmethod
+    @_memoize
+    def validate_phone(phone: str) -> bool:
         """Validate Indian phone number"""
         if not phone:
             return False
             
         # Remove spaces, dashes, and parentheses
-        phone_clean = re.sub(r'[\s\-()]', '', str(phone))
+        phone_clean = str(phone).translate(_PHONE_STRIP)
         
         # Handle country code if present
         if phone_clean.startswith('+91'):
@@ -90,47 +301,43 @@ class InvoiceValidator:
             phone_clean = phone_clean[2:]
             
         # Indian phone numbers are 10 digits
-        if not re.match(r'^[6-9][0-9]{9}$', phone_clean):
-            return False
-            
-        return True
+        return len(phone_clean) == 10 and phone_clean[0] in _PHONE_FIRST and _DIGITS.issuperset(phone_clean[1:])
     
-    def validate_email(self, email: str) -> bool:
+    @staticmethod
+    @_memoize
+    def validate_email(email: str) -> bool:
         """Validate email format"""
         if not email:
             return False
             
         # Basic email validation
-        pattern = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
-        return bool(re.match(pattern, email))
+        return bool(_EMAIL_RE.match(email))
     
-    def validate_date(self, date_str: str) -> Tuple[bool, str]:
+    @staticmethod
+    @_memoize
+    def validate_date(date_str: str) -> Tuple[bool, str]:
         """Validate and standardize date format to YYYY-MM-DD"""
         if not date_str:
             return False, ""
             
-        # Common date formats
-        formats = [
-            r'(\d{1,2})[/.-](\d{1,2})[/.-](\d{2,4})',  # DD/MM/YYYY or MM/DD/YYYY
-            r'(\d{2,4})[/.-](\d{1,2})[/.-](\d{1,2})',  # YYYY/MM/DD
-        ]
-        
-        for fmt in formats:
-            match = re.match(fmt, date_str)
+        matched = False
+        for date_re in _DATE_RES:
+            match = date_re.match(date_str)
             if match:
-                parts = [match.group(1), match.group(2), match.group(3)]
+                matched = True
+                first, second, third = match.group(1, 2, 3)
                 
-                # Handle 2-digit year
-                if len(parts[2]) == 2:
-                    parts[2] = '20' + parts[2] if int(parts[2]) < 50 else '19' + parts[2]
+                # Handle 2-digit year; in YYYY/MM/DD the last field is the day
+                if len(third) == 2 and len(first) != 4:
+                    third = ('20' if int(third) < 50 else '19') + third
                     
                 # Determine date format (assume DD/MM/YYYY if first number <= 31)
-                if len(parts[0]) == 4:  # YYYY/MM/DD
-                    year, month, day = parts
-                elif int(parts[0]) <= 31 and int(parts[1]) <= 12:  # DD/MM/YYYY
-                    day, month, year = parts
+                if len(first) == 4:  # YYYY/MM/DD
+                    year, month, day = first, second, third
+                elif int(first) <= 31 and int(second) <= 12:  # DD/MM/YYYY
+                    day, month, year = first, second, third
                 else:  # Assume MM/DD/YYYY
-                    month, day, year = parts
+                    month, day, year = first, second, third
                     
                 # Validate date components
                 try:
@@ -138,16 +345,8 @@ class InvoiceValidator:
                     month_val = int(month)
                     year_val = int(year)
                     
-                    if not (1 <= month_val <= 12 and 1 <= day_val <= 31):
-                        continue
-                        
-                    if month_val in [4, 6, 9, 11] and day_val > 30:
+                    if not _valid_ymd(year_val, month_val, day_val):
                         continue
-                        
-                    if month_val == 2:
-                        leap_year = (year_val % 4 == 0 and year_val % 100 != 0) or (year_val % 400 == 0)
-                        if (leap_year and day_val > 29) or (not leap_year and day_val > 28):
-                            continue
                             
                     # Format as YYYY-MM-DD
                     standardized = f"{year_val:04d}-{month_val:02d}-{day_val:02d}"
@@ -156,45 +355,42 @@ class InvoiceValidator:
                 except ValueError:
                     continue
                     
-        # Try direct datetime parsing as a fallback
-        try:
-            for fmt in ['%d/%m/%Y', '%m/%d/%Y', '%Y/%m/%d', '%d-%m-%Y', '%m-%d-%Y', '%Y-%m-%d']:
-                try:
-                    dt = datetime.strptime(date_str, fmt)
-                    return True, dt.strftime('%Y-%m-%d')
-                except ValueError:
-                    continue
-        except:
-            pass
+        # A date the patterns matched but rejected (such as 31/04/2023) is
+        # rejected by every fallback format too
+        if matched:
+            return False, ""
+            
+        # Try direct datetime parsing as a fallback, with only the formats
+        # that can match the string's separator and leading year
+        for fmt in _fallback_date_formats(date_str):
+            try:
+                dt = datetime.strptime(date_str, fmt)
+                return True, dt.strftime('%Y-%m-%d')
+            except ValueError:
+                continue
             
         return False, ""
     
-    def validate_state(self, state: str) -> Tuple[bool, str]:
+    @staticmethod
+    def validate_state(state: str) -> Tuple[bool, str]:
         """Validate and standardize Indian state name"""
         if not state:
             return False, ""
             
-        # Clean input
-        state_clean = state.strip().upper()
-        
-        # Check if it's a state code
-        if state_clean in self.state_codes:
-            return True, self.state_codes[state_clean]
-            
-        # Check if it's a state name
-        for valid_state in self.indian_states:
-            if state_clean == valid_state.upper():
-                return True, valid_state
-                
-        # Check partial matches
-        for valid_state in self.indian_states:
-            if valid_state.upper() in state_clean or state_clean in valid_state.upper():
-                return True, valid_state
-                
-        return False, ""
+        # Clean input, so differently spelled inputs share a cache entry
+        return _match_state(state.strip().upper())
     
-    def validate_invoice_data(self, data: Dict[str, Any]) -> Tuple[List[str], List[str]]:
-        """Comprehensive validation of extracted invoice data"""
+    def validate_invoice_data(self, data: Dict[str, Any], fail_fast: bool = False) -> Tuple[List[str], List[str]]:
+        """
+        Comprehensive validation of extracted invoice data
+        
+        Args:
+            data: Extracted invoice fields; valid dates, states and amounts
+                are replaced by their standardized values
+            fail_fast: Return as soon as a required field is missing, without
+                checking the remaining fields. Batch callers that drop such
+                invoices anyway can set this to skip the field validators.
+        """
         errors = []
         warnings = []
         
@@ -204,107 +400,119 @@ class InvoiceValidator:
             if not data.get(field):
                 errors.append(f"Missing required field: {field}")
         
-        # GSTIN validation
-        if data.get('billing_gstin') and not self.validate_gstin(data['billing_gstin']):
-            warnings.append("Invalid GSTIN format")
+        if fail_fast and errors:
+            return errors, warnings
         
-        # Pincode validation
-        if data.get('billing_pincode') and not self.validate_pincode(data['billing_pincode']):
-            warnings.append("Invalid billing pincode format")
-            
-        if data.get('shipping_pincode') and not self.validate_pincode(data['shipping_pincode']):
-            warnings.append("Invalid shipping pincode format")
+        # GSTIN, pincode, phone and email validation
+        for field, validator, message in _FIELD_CHECKS:
+            value = data.get(field)
+            if value and not getattr(self, validator)(value):
+                warnings.append(message)
         
-        # Phone validation
-        if data.get('billing_phone') and not self.validate_phone(data['billing_phone']):
-            warnings.append("Invalid billing phone number format")
-            
-        if data.get('shipping_phone') and not self.validate_phone(data['shipping_phone']):
-            warnings.append("Invalid shipping phone number format")
-        
-        # Email validation
-        if data.get('billing_email') and not self.validate_email(data['billing_email']):
-            warnings.append("Invalid billing email format")
-            
-        if data.get('shipping_email') and not self.validate_email(data['shipping_email']):
-            warnings.append("Invalid shipping email format")
-            
-        # Date validation
-        if data.get('order_date'):
-            is_valid, standardized = self.validate_date(data['order_date'])
-            if not is_valid:
-                warnings.append("Invalid order date format")
-            else:
-                data['order_date'] = standardized
-                
-        # State validation
-        if data.get('billing_state'):
-            is_valid, standardized = self.validate_state(data['billing_state'])
-            if not is_valid:
-                warnings.append("Invalid billing state")
-            else:
-                data['billing_state'] = standardized
+        # Date and state validation, storing the standardized value
+        for field, validator, message in _FIELD_STANDARDIZERS:
+            value = data.get(field)
+            if value:
+                is_valid, standardized = getattr(self, validator)(value)
+                if not is_valid:
+                    warnings.append(message)
+                else:
+                    data[field] = standardized
                 
-        if data.get('shipping_state'):
-            is_valid, standardized = self.validate_state(data['shipping_state'])
-            if not is_valid:
-                warnings.append("Invalid shipping state")
-            else:
-                data['shipping_state'] = standardized
-                
-        # Amount validation
-        if data.get('sub_total') is not None:
-            try:
-                data['sub_total'] = float(data['sub_total'])
-                if data['sub_total'] < 0:
-                    warnings.append("Negative subtotal amount")
-            except (ValueError, TypeError):
-                warnings.append("Invalid subtotal amount format")
-                
-        if data.get('tax_amount') is not None:
-            try:
-                data['tax_amount'] = float(data['tax_amount'])
-                if data['tax_amount'] < 0:
-                    warnings.append("Negative tax amount")
-            except (ValueError, TypeError):
-                warnings.append("Invalid tax amount format")
-                
-        if data.get('total_amount') is not None:
-            try:
-                data['total_amount'] = float(data['total_amount'])
-                if data['total_amount'] < 0:
-                    warnings.append("Negative total amount")
-            except (ValueError, TypeError):
-                warnings.append("Invalid total amount format")
+        # Amount validation, storing amounts as floats
+        for field, negative_message, format_message in _AMOUNT_FIELDS:
+            value = data.get(field)
+            if value is None:
+                continue
+            amount = _coerce_float(value)
+            if amount is None:
+                warnings.append(format_message)
+                continue
+            data[field] = amount
+            if amount < 0:
+                warnings.append(negative_message)
                 
         # Validate order items
-        if data.get('order_items'):
-            if not isinstance(data['order_items'], list):
+        order_items = data.get('order_items')
+        if order_items:
+            if not isinstance(order_items, list):
                 warnings.append("Order items should be a list")
                 data['order_items'] = []
             else:
-                for i, item in enumerate(data['order_items']):
+                for number, item in enumerate(order_items, 1):
                     if not isinstance(item, dict):
-                        warnings.append(f"Order item {i+1} should be an object")
+                        warnings.append(f"Order item {number} should be an object")
                         continue
                         
                     if not item.get('name'):
-                        warnings.append(f"Order item {i+1} missing name")
+                        warnings.append(f"Order item {number} missing name")
                         
-                    if item.get('units') is not None:
+                    units = item.get('units')
+                    if units is not None:
                         try:
-                            item['units'] = int(item['units'])
-                            if item['units'] <= 0:
-                                warnings.append(f"Order item {i+1} has invalid quantity")
+                            units = item['units'] = int(units)
+                            if units <= 0:
+                                warnings.append(f"Order item {number} has invalid quantity")
                         except (ValueError, TypeError):
-                            warnings.append(f"Order item {i+1} has invalid quantity format")
+                            warnings.append(f"Order item {number} has invalid quantity format")
                             
-                    if item.get('selling_price') is not None:
-                        try:
-                            item['selling_price'] = float(item['selling_price'])
-                            if item['selling_price'] < 0:
-                                warnings.append(f"Order item {i+1} has negative price")
-                        except (ValueError, TypeError):
-                            warnings.append(f"Order item {i+1} has invalid price format")
+                    price = item.get('selling_price')
+                    if price is not None:
+                        price = _coerce_float(price)
+                        if price is None:
+                            warnings.append(f"Order item {number} has invalid price format")
+                        else:
+                            item['selling_price'] = price
+                            if price < 0:
+                                warnings.append(f"Order item {number} has negative price")
+        
+        return errors, warnings
+    
+    def validate_invoice_batch(
+        self,
+        invoices: List[Dict[str, Any]],
+        fail_fast: bool = False
+    ) -> List[Tuple[List[str], List[str]]]:
+        """
+        Validate several invoices, returning (errors, warnings) for each
+        
+        Field validators are memoized, so values repeated across the batch
+        (a seller's GSTIN, common PIN codes, states and dates) are checked once.
+        With fail_fast, invoices missing a required field are not checked further.
+        """
+        return [self.validate_invoice_data(data, fail_fast) for data in invoices]
+    
+    def validate_invoice_batch_parallel(
+        self,
+        invoices: List[Dict[str, Any]],
+        workers: Optional[int] = None,
+        fail_fast: bool = False
+    ) -> List[Tuple[List[str], List[str]]]:
+        """
+        Validate a large batch of invoices across worker processes
+        
+        The validators are pure Python and hold the GIL, so the batch is
+        split across processes rather than threads. Each worker validates a
+        copy of its invoices; the standardized fields are copied back into
+        the caller's dicts, as validate_invoice_data would have done in place.
+        Batches below PARALLEL_VALIDATION_MIN_INVOICES, or a single worker,
+        are validated in this process.
+        
+        Args:
+            invoices: Extracted invoice fields, one dict per invoice
+            workers: Worker processes to use; defaults to the CPU count
+            fail_fast: Passed through to validate_invoice_data
+        """
+        workers = workers or os.cpu_count() or 1
+        if workers == 1 or len(invoices) < PARALLEL_VALIDATION_MIN_INVOICES:
+            return self.validate_invoice_batch(invoices, fail_fast)
         
-        return errors, warnings 
\ No newline at end of file
+        # A few chunks per worker keeps pickling overhead low while balancing load
+        chunksize = max(1, len(invoices) // (workers * 4))
+        results = []
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            validated = executor.map(partial(_validate_detached, self, fail_fast), invoices, chunksize=chunksize)
+            for data, (errors, warnings, standardized) in zip(invoices, validated):
+                data.update(standardized)
+                results.append((errors, warnings))
+        return results 
\ No newline at end of file